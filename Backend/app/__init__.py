@@ -1,10 +1,25 @@
 import os
 import logging
+import tempfile
 from flask import Flask, jsonify
 from flask_cors import CORS
 from dotenv import load_dotenv
 from flask_migrate import Migrate
 from .models import db, bcrypt
+from .db_pool import engine_options
+from .passwords import password_hasher
+from .session_cache import session_cache
+from .sessions import session_tracker
+from .github_client import github_client
+from .jobs import jobs
+from .metrics import metrics
+from .profiler import profiler
+from .compression import compression
+from .json_provider import json_provider
+from .csrf import csrf
+from .collab import collab
+from .signaling import signaling
+from .repo_search import repo_search
 
 # Configure logging
 logging.basicConfig(
@@ -23,6 +38,124 @@ def create_app():
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     
+    # Connection pool: size against Postgres' connection limit, i.e.
+    # (DB_POOL_SIZE + DB_MAX_OVERFLOW) * workers * instances <= max_connections.
+    # Use DB_POOL_PROFILE=pgbouncer behind PgBouncer in transaction mode.
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(
+        app.config['SQLALCHEMY_DATABASE_URI'],
+        profile=os.getenv('DB_POOL_PROFILE', 'default'),
+        size=int(os.getenv('DB_POOL_SIZE', 5)),
+        max_overflow=int(os.getenv('DB_MAX_OVERFLOW', 10)),
+        timeout=float(os.getenv('DB_POOL_TIMEOUT', 10)),
+        recycle=int(os.getenv('DB_POOL_RECYCLE', 1800)),
+        pre_ping=os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    )
+
+    # Password hashing: bcrypt work factor and off-worker process pool
+    app.config['BCRYPT_LOG_ROUNDS'] = int(os.getenv('BCRYPT_LOG_ROUNDS', 12))
+    app.config['BCRYPT_WORKERS'] = int(os.getenv('BCRYPT_WORKERS', 2))
+    app.config['BCRYPT_MAX_PENDING'] = int(os.getenv('BCRYPT_MAX_PENDING', 4))
+    app.config['BCRYPT_RETRY_AFTER'] = int(os.getenv('BCRYPT_RETRY_AFTER', 1))
+
+    # Verified-session cache used by token_required
+    app.config['SESSION_CACHE_ENABLED'] = os.getenv('SESSION_CACHE_ENABLED', 'true').lower() == 'true'
+    app.config['SESSION_CACHE_TTL'] = int(os.getenv('SESSION_CACHE_TTL', 30))
+    app.config['SESSION_CACHE_SIZE'] = int(os.getenv('SESSION_CACHE_SIZE', 10000))
+    app.config['SESSION_CACHE_VERSION_FILE'] = os.getenv(
+        'SESSION_CACHE_VERSION_FILE',
+        os.path.join(tempfile.gettempdir(), 'collabvoice-session-versions')
+    )
+    
+    # Per-device sessions: last_seen_at buffered per worker, flushed every N seconds (0 = off)
+    app.config['SESSION_TOUCH_INTERVAL'] = int(os.getenv('SESSION_TOUCH_INTERVAL', 60))
+    app.config['SESSION_RETENTION_DAYS'] = int(os.getenv('SESSION_RETENTION_DAYS', 30))
+    
+    # Outbound GitHub API client
+    app.config['GITHUB_API_URL'] = os.getenv('GITHUB_API_URL', 'https://api.github.com')
+    app.config['GITHUB_TIMEOUT'] = float(os.getenv('GITHUB_TIMEOUT', 10))
+    app.config['GITHUB_POOL_SIZE'] = int(os.getenv('GITHUB_POOL_SIZE', 20))
+    app.config['GITHUB_CACHE_SIZE'] = int(os.getenv('GITHUB_CACHE_SIZE', 2048))
+    app.config['GITHUB_PAGE_WORKERS'] = int(os.getenv('GITHUB_PAGE_WORKERS', 8))
+    app.config['GITHUB_RATE_LIMIT_LOW'] = int(os.getenv('GITHUB_RATE_LIMIT_LOW', 500))
+    app.config['GITHUB_RATE_LIMIT_RESERVE'] = int(os.getenv('GITHUB_RATE_LIMIT_RESERVE', 100))
+    app.config['GITHUB_SINGLE_FLIGHT_DIR'] = os.getenv('GITHUB_SINGLE_FLIGHT_DIR')
+    app.config['GITHUB_BATCH_CONCURRENCY'] = int(os.getenv('GITHUB_BATCH_CONCURRENCY', 6))
+    app.config['GITHUB_BATCH_DEADLINE'] = float(os.getenv('GITHUB_BATCH_DEADLINE', 8))
+    app.config['GITHUB_BATCH_MAX_REPOS'] = int(os.getenv('GITHUB_BATCH_MAX_REPOS', 50))
+    app.config['REPO_INDEX_TTL'] = int(os.getenv('REPO_INDEX_TTL', 86400))
+    
+    # Repositories and recent commits prefetched after GitHub login (0 disables)
+    app.config['GITHUB_PREFETCH_TTL'] = int(os.getenv('GITHUB_PREFETCH_TTL', 120))
+    app.config['GITHUB_PREFETCH_COMMIT_REPOS'] = int(os.getenv('GITHUB_PREFETCH_COMMIT_REPOS', 5))
+    
+    # Commit mirror: upstream pages listed inline per request, and per background sync run
+    app.config['GITHUB_COMMIT_SYNC_INLINE_PAGES'] = int(os.getenv('GITHUB_COMMIT_SYNC_INLINE_PAGES', 1))
+    app.config['GITHUB_COMMIT_SYNC_PAGES'] = int(os.getenv('GITHUB_COMMIT_SYNC_PAGES', 1000))
+    
+    # GitHub webhooks (push/member/repository) keep stored data current
+    app.config['GITHUB_WEBHOOK_SECRET'] = os.getenv('GITHUB_WEBHOOK_SECRET')
+    app.config['GITHUB_WEBHOOK_SNAPSHOT_TTL'] = int(os.getenv('GITHUB_WEBHOOK_SNAPSHOT_TTL', 86400))
+    app.config['GITHUB_WEBHOOK_REFRESH_USERS'] = int(os.getenv('GITHUB_WEBHOOK_REFRESH_USERS', 20))
+    app.config['GITHUB_WEBHOOK_RETENTION'] = int(os.getenv('GITHUB_WEBHOOK_RETENTION', 7 * 86400))
+    
+    # Per-worker in-memory repository search indexes, LRU-bounded across users
+    app.config['REPO_SEARCH_TTL'] = int(os.getenv('REPO_SEARCH_TTL', 300))
+    app.config['REPO_SEARCH_MAX_USERS'] = int(os.getenv('REPO_SEARCH_MAX_USERS', 200))
+    app.config['REPO_SEARCH_MAX_REPOS'] = int(os.getenv('REPO_SEARCH_MAX_REPOS', 200000))
+    
+    # In-process background jobs, per worker
+    app.config['JOB_WORKERS'] = int(os.getenv('JOB_WORKERS', 2))
+    app.config['JOB_MAX_PENDING'] = int(os.getenv('JOB_MAX_PENDING', 100))
+    
+    # Prometheus metrics at /metrics (Authorization: Bearer METRICS_TOKEN)
+    app.config['METRICS_ENABLED'] = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN')
+    
+    # Sampled request profiler; off unless a sample rate or debug token is set
+    app.config['PROFILER_SAMPLE_RATE'] = float(os.getenv('PROFILER_SAMPLE_RATE', 0))
+    app.config['PROFILER_TOKEN'] = os.getenv('PROFILER_TOKEN')
+    app.config['PROFILER_INTERVAL'] = float(os.getenv('PROFILER_INTERVAL', 0.005))
+    app.config['PROFILER_DIR'] = os.getenv('PROFILER_DIR', os.path.join(tempfile.gettempdir(), 'collabvoice-profiles'))
+    app.config['PROFILER_MAX_FILES'] = int(os.getenv('PROFILER_MAX_FILES', 200))
+    
+    # Response encoding: JSON provider ('orjson' or 'default') and br/gzip for large bodies
+    app.config['JSON_PROVIDER'] = os.getenv('JSON_PROVIDER', 'orjson')
+    app.config['COMPRESS_ENABLED'] = os.getenv('COMPRESS_ENABLED', 'true').lower() == 'true'
+    app.config['COMPRESS_MIN_SIZE'] = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+    app.config['COMPRESS_GZIP_LEVEL'] = int(os.getenv('COMPRESS_GZIP_LEVEL', 6))
+    app.config['COMPRESS_BR_QUALITY'] = int(os.getenv('COMPRESS_BR_QUALITY', 4))
+    app.json = json_provider(app, app.config['JSON_PROVIDER'])
+    
+    # Signed double-submit CSRF tokens for mutating /api/auth routes
+    app.config['CSRF_ENABLED'] = os.getenv('CSRF_ENABLED', 'true').lower() == 'true'
+    app.config['CSRF_TOKEN_TTL'] = int(os.getenv('CSRF_TOKEN_TTL', 7 * 86400))
+    app.config['CSRF_COOKIE_SECURE'] = os.getenv('CSRF_COOKIE_SECURE', 'true').lower() == 'true'
+    
+    # Real-time collaboration WebSocket: per-document rooms, fanned out
+    # across workers with Postgres LISTEN/NOTIFY ('auto' picks it on Postgres)
+    app.config['COLLAB_BUS'] = os.getenv('COLLAB_BUS', 'auto')
+    app.config['COLLAB_CHANNEL'] = os.getenv('COLLAB_CHANNEL', 'collab')
+    app.config['COLLAB_TICK'] = float(os.getenv('COLLAB_TICK', 0.025))
+    app.config['COLLAB_SEND_QUEUE'] = int(os.getenv('COLLAB_SEND_QUEUE', 256))
+    app.config['COLLAB_MAX_MESSAGE'] = int(os.getenv('COLLAB_MAX_MESSAGE', 6000))
+    app.config['COLLAB_SEND_TIMEOUT'] = float(os.getenv('COLLAB_SEND_TIMEOUT', 10))
+    app.config['COLLAB_PING_INTERVAL'] = int(os.getenv('COLLAB_PING_INTERVAL', 25))
+    app.config['COLLAB_AUTH_TIMEOUT'] = float(os.getenv('COLLAB_AUTH_TIMEOUT', 5))
+    app.config['COLLAB_REAUTH_INTERVAL'] = int(os.getenv('COLLAB_REAUTH_INTERVAL', 60))
+    
+    # WebRTC signaling over the collaboration rooms (mesh calls, so rooms stay small).
+    # The room size is enforced per worker: peers of one room on N workers can reach N times it
+    app.config['SIGNALING_ROOM_SIZE'] = int(os.getenv('SIGNALING_ROOM_SIZE', 8))
+    app.config['SIGNALING_IDLE_TIMEOUT'] = int(os.getenv('SIGNALING_IDLE_TIMEOUT', 60))
+    app.config['SIGNALING_ICE_SERVERS'] = os.getenv('SIGNALING_ICE_SERVERS', '[{"urls": "stun:stun.l.google.com:19302"}]')
+    
+    # Collaborative documents: op log compacted into a snapshot every N versions
+    app.config['DOCUMENT_SNAPSHOT_EVERY'] = int(os.getenv('DOCUMENT_SNAPSHOT_EVERY', 200))
+    app.config['DOCUMENT_OP_RETENTION'] = int(os.getenv('DOCUMENT_OP_RETENTION', 1000))
+    app.config['DOCUMENT_MAX_BATCH'] = int(os.getenv('DOCUMENT_MAX_BATCH', 100))
+    app.config['DOCUMENT_MAX_REBASE'] = int(os.getenv('DOCUMENT_MAX_REBASE', 1000))
+    app.config['DOCUMENT_MAX_LENGTH'] = int(os.getenv('DOCUMENT_MAX_LENGTH', 1000000))
+    
     # Session/Cookie configuration for cross-origin (Vercel -> Render)
     app.config['SESSION_COOKIE_SAMESITE'] = 'None'
     app.config['SESSION_COOKIE_SECURE'] = True
@@ -32,6 +165,18 @@ def create_app():
     # Initialize extensions
     db.init_app(app)
     bcrypt.init_app(app)
+    password_hasher.init_app(app)
+    session_cache.init_app(app)
+    session_tracker.init_app(app)
+    github_client.init_app(app)
+    jobs.init_app(app)
+    metrics.init_app(app)
+    profiler.init_app(app)
+    compression.init_app(app)
+    csrf.init_app(app)
+    collab.init_app(app)
+    signaling.init_app(app)
+    repo_search.init_app(app)
     
     # CORS Configuration
     CORS(app, resources={
@@ -49,20 +194,35 @@ def create_app():
                 "X-CSRFToken", 
                 "x-csrftoken", 
                 "X-Csrftoken",
-                "X-CSRF-TOKEN"
+                "X-CSRF-TOKEN",
+                "If-None-Match"
             ],
-            "expose_headers": ["Content-Type", "Authorization", "X-CSRFToken", "x-csrftoken"],
+            "expose_headers": ["Content-Type", "Authorization", "X-CSRFToken", "x-csrftoken", "X-Data-Freshness", "ETag"],
             "supports_credentials": True
         }
     })
     
-    migrate = Migrate(app, db)
+    migrate = Migrate(app, db, directory=os.path.join(os.path.dirname(os.path.dirname(__file__)), 'migrations'))
+
+    @app.cli.command('bootstrap-db')
+    def bootstrap_db():
+        """Run pending migrations under the migration lock."""
+        from .bootstrap import bootstrap_database
+        bootstrap_database(app)
 
     # Register Blueprints
     from .routes.auth import auth_bp
     from .routes.github import github_bp
+    from .routes.internal import internal_bp
+    from .routes.collab import collab_bp
+    from .routes.documents import documents_bp
+    from .routes.signaling import signaling_bp
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(github_bp, url_prefix='/api/github')
+    app.register_blueprint(internal_bp, url_prefix='/api/internal')
+    app.register_blueprint(collab_bp, url_prefix='/api/collab')
+    app.register_blueprint(documents_bp, url_prefix='/api/documents')
+    app.register_blueprint(signaling_bp, url_prefix='/api/signaling')
 
     @app.route("/", methods=['GET'])
     def index():
@@ -0,0 +1,57 @@
+import time
+import logging
+from contextlib import contextmanager
+from flask_migrate import upgrade, stamp
+from sqlalchemy import inspect, text
+from .models import db
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary constant shared by every process that runs migrations
+MIGRATION_LOCK_ID = 804214
+
+
+@contextmanager
+def migration_lock():
+    """Hold a Postgres advisory lock so only one process migrates at a time."""
+    if db.engine.dialect.name != 'postgresql':
+        yield
+        return
+
+    with db.engine.connect() as connection:
+        connection.execute(text('SELECT pg_advisory_lock(:id)'), {'id': MIGRATION_LOCK_ID})
+        try:
+            yield
+        finally:
+            connection.execute(text('SELECT pg_advisory_unlock(:id)'), {'id': MIGRATION_LOCK_ID})
+
+
+def adopt_legacy_schema():
+    """Stamp databases created by db.create_all() before migrations existed."""
+    inspector = inspect(db.engine)
+    if inspector.has_table('alembic_version') or not inspector.has_table('users'):
+        return
+
+    columns = {column['name'] for column in inspector.get_columns('users')}
+    if 'current_session_id' not in columns:
+        logger.info("Adding users.current_session_id to legacy schema")
+        with db.engine.begin() as connection:
+            connection.execute(text('ALTER TABLE users ADD COLUMN current_session_id VARCHAR(255)'))
+
+    logger.info("Stamping legacy schema at baseline revision 0001")
+    stamp(revision='0001')
+
+
+def bootstrap_database(app):
+    """Bring the schema up to date once per deploy, before workers start.
+
+    Safe to run concurrently from several processes or instances: the
+    advisory lock serialises them and later runs find nothing to do.
+    """
+    start = time.perf_counter()
+    with app.app_context():
+        with migration_lock():
+            adopt_legacy_schema()
+            upgrade()
+        db.engine.dispose()
+    logger.info(f"Database bootstrap finished in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,290 @@
+import os
+import time
+import uuid
+import select
+import logging
+import threading
+from collections import deque
+from .models import db
+from .metrics import COLLAB_MESSAGES, COLLAB_DISCONNECTS
+
+logger = logging.getLogger(__name__)
+
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+NOTIFY_LIMIT = 7900
+
+
+class RoomFull(Exception):
+    pass
+
+
+class RoomClient:
+    """One WebSocket connection in a document room.
+
+    Messages for the client are queued as serialized JSON and written by
+    the connection's own thread once per tick as a single frame (a JSON
+    array), so a slow socket only ever blocks itself. Cursor messages
+    replace the sender's previous cursor instead of queueing behind it;
+    everything else counts against the queue bound.
+    """
+
+    def __init__(self, ws, user, doc_id, max_queue, send_timeout):
+        self.ws = ws
+        # A peer that stops reading fills the socket buffer; give up on it
+        # after send_timeout instead of blocking this connection forever
+        ws.sock.settimeout(send_timeout)
+        self.id = uuid.uuid4().hex[:12]
+        self.user = {'id': user.id, 'username': user.username, 'avatar_url': user.avatar_url}
+        self.doc_id = doc_id
+        self.max_queue = max_queue
+        self.overflowed = False
+        self._queue = deque()
+        self._cursors = {}
+        self._lock = threading.Lock()
+
+    def enqueue(self, payload, cursor_of=None):
+        with self._lock:
+            if cursor_of is not None:
+                self._cursors[cursor_of] = payload
+            elif len(self._queue) >= self.max_queue:
+                self.overflowed = True
+            else:
+                self._queue.append(payload)
+
+    def drain(self):
+        """(frame, message count) for everything pending; frame is None if nothing is."""
+        with self._lock:
+            if not self._queue and not self._cursors:
+                return None, 0
+            messages = list(self._queue)
+            messages.extend(self._cursors.values())
+            self._queue.clear()
+            self._cursors.clear()
+        return '[' + ','.join(messages) + ']', len(messages)
+
+
+class CollabHub:
+    """Per-document rooms with fan-out to every worker.
+
+    Messages reach clients in this worker directly. With the 'postgres'
+    bus they are also sent with NOTIFY, batched per tick, by one bus
+    thread per worker, which LISTENs on the same connection and delivers
+    other workers' messages to its local rooms. The 'local' bus (SQLite,
+    single worker) skips that step.
+    """
+
+    def __init__(self, app=None):
+        self.tick = 0.025
+        self.max_queue = 256
+        self.max_message = 6000
+        self.send_timeout = 10
+        self.bus = 'local'
+        self.channel = 'collab'
+        self._app = None
+        self._rooms = {}
+        self._clients = {}  # id -> client, for messages addressed to one client
+        self._outbox = deque()
+        self._lock = threading.Lock()
+        self._pid = None
+        self.worker_id = None
+        self._stats = {'connections': 0, 'messages_in': 0, 'messages_out': 0, 'frames': 0,
+                       'published': 0, 'notifies': 0, 'received_remote': 0,
+                       'too_large': 0, 'slow_disconnects': 0, 'bus_errors': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.tick = app.config.get('COLLAB_TICK', self.tick)
+        self.max_queue = app.config.get('COLLAB_SEND_QUEUE', self.max_queue)
+        self.max_message = app.config.get('COLLAB_MAX_MESSAGE', self.max_message)
+        self.send_timeout = app.config.get('COLLAB_SEND_TIMEOUT', self.send_timeout)
+        self.channel = app.config.get('COLLAB_CHANNEL', self.channel)
+        bus = app.config.get('COLLAB_BUS', 'auto')
+        if bus == 'auto':
+            uri = app.config.get('SQLALCHEMY_DATABASE_URI') or ''
+            bus = 'postgres' if uri.startswith(('postgres://', 'postgresql')) else 'local'
+        self.bus = bus
+        self._app = app
+        self._pid = None  # start a bus thread for this app on next use
+        app.config.setdefault('SOCK_SERVER_OPTIONS', {
+            'ping_interval': app.config.get('COLLAB_PING_INTERVAL', 25),
+            'max_message_size': self.max_message
+        })
+        app.extensions['collab'] = self
+
+    def _ensure_bus(self):
+        # One LISTEN connection per worker; never share it across a fork. Start
+        # it after releasing the lock: under gevent start() yields, and join()
+        # and publish() take this lock
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid == os.getpid():
+                    return
+                self._pid = os.getpid()
+                self.worker_id = uuid.uuid4().hex[:8]
+                self._outbox.clear()
+            if self.bus == 'postgres':
+                threading.Thread(target=self._bus_loop, name='collab-bus', daemon=True).start()
+
+    def join(self, client, limit=None):
+        """Add client to its room; returns the members already in this worker.
+
+        Raises RoomFull if the room already has limit members in this worker.
+        """
+        self._ensure_bus()
+        with self._lock:
+            room = self._rooms.setdefault(client.doc_id, set())
+            if limit is not None and len(room) >= limit:
+                raise RoomFull(client.doc_id)
+            members = [{'id': c.id, 'user': c.user} for c in room]
+            room.add(client)
+            self._clients[client.id] = client
+            self._stats['connections'] += 1
+        self.publish(client.doc_id, client.id, self._dumps({'type': 'join', 'from': client.id, 'user': client.user}))
+        return members
+
+    def leave(self, client, reason='closed'):
+        with self._lock:
+            room = self._rooms.get(client.doc_id)
+            if room is not None:
+                room.discard(client)
+                if not room:
+                    del self._rooms[client.doc_id]
+            self._clients.pop(client.id, None)
+        COLLAB_DISCONNECTS.labels(reason).inc()
+        self.publish(client.doc_id, client.id, self._dumps({'type': 'leave', 'from': client.id}))
+
+    def publish(self, doc_id, sender_id, payload, cursor=False, to=None):
+        """Deliver a serialized message to the room, or to client id `to` in it.
+
+        Returns True if `to` was found in this worker; otherwise the message
+        also goes to the other workers.
+        """
+        self._ensure_bus()
+        self._stats['published'] += 1
+        delivered = self._fanout(doc_id, sender_id, payload, cursor, to)
+        if not delivered and self.bus == 'postgres':
+            self._outbox.append((doc_id, sender_id, payload, cursor, to))
+        return delivered
+
+    def _fanout(self, doc_id, sender_id, payload, cursor, to=None):
+        """Queue payload for local members; True if it reached its single addressee."""
+        if to is not None:
+            client = self._clients.get(to)
+            if client is None or client.doc_id != doc_id:
+                return False
+            client.enqueue(payload)
+            return True
+
+        with self._lock:
+            room = list(self._rooms.get(doc_id, ()))
+        for client in room:
+            if client.id != sender_id:
+                client.enqueue(payload, cursor_of=sender_id if cursor else None)
+        return False
+
+    def _introduce(self, doc_id, joiner_id):
+        """Tell a client that joined in another worker who is in the room here."""
+        with self._lock:
+            room = list(self._rooms.get(doc_id, ()))
+        for client in room:
+            self.publish(doc_id, client.id, self._dumps({'type': 'here', 'from': client.id, 'user': client.user}),
+                         to=joiner_id)
+
+    def flush(self, client):
+        """Send the client's pending frame; False if the client can't keep up.
+
+        Runs on the connection's own thread.
+        """
+        if client.overflowed:
+            self._stats['slow_disconnects'] += 1
+            return False
+        frame, count = client.drain()
+        if frame is not None:
+            try:
+                client.ws.send(frame)
+            except TimeoutError:
+                self._stats['slow_disconnects'] += 1
+                return False
+            self._stats['frames'] += 1
+            self._stats['messages_out'] += count
+            COLLAB_MESSAGES.labels('out').inc(count)
+        return True
+
+    def received(self):
+        self._stats['messages_in'] += 1
+        COLLAB_MESSAGES.labels('in').inc()
+
+    def _dumps(self, obj):
+        return self._app.json.dumps(obj)
+
+    def _notify_batches(self):
+        """Drain the outbox into NOTIFY payloads under the size limit."""
+        prefix = f'["{self.worker_id}",['
+        budget = NOTIFY_LIMIT - len(prefix) - 2
+        batch, size = [], 0
+        while self._outbox:
+            doc_id, sender_id, payload, cursor, to = self._outbox.popleft()
+            entry = f'[{self._dumps(doc_id)},"{sender_id}",{payload},{self._dumps(cursor)},{self._dumps(to)}]'
+            length = len(entry.encode()) + 1
+            if length > budget:
+                self._stats['too_large'] += 1
+                logger.warning(f"Collaboration message for {doc_id} too large to NOTIFY, not sent to other workers")
+                continue
+            if size + length > budget:
+                yield prefix + ','.join(batch) + ']]'
+                batch, size = [], 0
+            batch.append(entry)
+            size += length
+        if batch:
+            yield prefix + ','.join(batch) + ']]'
+
+    def _deliver_remote(self, notify_payload):
+        worker_id, entries = self._app.json.loads(notify_payload)
+        if worker_id == self.worker_id:
+            return
+        for doc_id, sender_id, message, cursor, to in entries:
+            self._stats['received_remote'] += 1
+            COLLAB_MESSAGES.labels('remote').inc()
+            self._fanout(doc_id, sender_id, self._dumps(message), cursor, to)
+            if message.get('type') == 'join':
+                self._introduce(doc_id, sender_id)
+
+    def _bus_loop(self):
+        while self._pid == os.getpid():
+            try:
+                self._listen()
+            except Exception as e:
+                self._stats['bus_errors'] += 1
+                logger.error(f"Collaboration bus error, reconnecting: {str(e)}")
+                time.sleep(1)
+
+    def _listen(self):
+        with self._app.app_context():
+            raw = db.engine.raw_connection()
+        raw.detach()  # a long-lived autocommit connection, kept out of the pool
+        conn = raw.driver_connection
+        try:
+            conn.autocommit = True
+            cursor = conn.cursor()
+            cursor.execute(f'LISTEN "{self.channel}"')
+            logger.info(f"Collaboration bus listening on {self.channel} (worker {self.worker_id})")
+            while True:
+                if select.select([conn], [], [], self.tick)[0]:
+                    conn.poll()
+                    while conn.notifies:
+                        self._deliver_remote(conn.notifies.pop(0).payload)
+                for payload in self._notify_batches():
+                    cursor.execute('SELECT pg_notify(%s, %s)', (self.channel, payload))
+                    self._stats['notifies'] += 1
+        finally:
+            raw.close()
+
+    def stats(self):
+        with self._lock:
+            rooms = {doc_id: len(room) for doc_id, room in self._rooms.items()}
+        return {**self._stats, 'bus': self.bus, 'worker_id': self.worker_id, 'rooms': len(rooms),
+                'clients': sum(rooms.values()), 'outbox': len(self._outbox), 'tick': self.tick}
+
+
+collab = CollabHub()
@@ -0,0 +1,225 @@
+import logging
+from datetime import datetime
+from sqlalchemy import tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from .models import db, RepositoryCommit, CommitSync, release_db_connection
+from .github_client import github_client
+from .repo_index import get_repository_resource
+
+logger = logging.getLogger(__name__)
+
+# GitHub's maximum page size for /repos/{repo}/commits
+COMMIT_PAGE = 100
+
+
+class CommitSyncError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f'GitHub returned {status_code} for commits')
+        self.status_code = status_code
+
+
+def parse_date(value):
+    """GitHub's '2024-01-01T00:00:00Z' (or any ISO 8601) as a naive UTC datetime."""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = (parsed - parsed.utcoffset()).replace(tzinfo=None)
+    return parsed
+
+
+def github_date(value):
+    return value.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def commit_row(repo_id, commit):
+    detail = commit['commit']
+    author = commit.get('author') or {}
+    return {
+        'repo_id': repo_id,
+        'sha': commit['sha'],
+        'message': detail['message'],
+        'author_name': detail['author']['name'],
+        'author_email': detail['author']['email'],
+        'author_login': author.get('login'),
+        'author_avatar_url': author.get('avatar_url'),
+        'authored_at': parse_date(detail['author']['date']),
+        'committer_name': detail['committer']['name'],
+        'committed_at': parse_date(detail['committer']['date']),
+        'html_url': commit.get('html_url')
+    }
+
+
+def mirrored_shas(repo_id, shas):
+    """The subset of shas already in repo_id's mirror."""
+    if not shas:
+        return set()
+    return {sha for (sha,) in db.session.query(RepositoryCommit.sha).filter(
+        RepositoryCommit.repo_id == repo_id, RepositoryCommit.sha.in_(list(shas)))}
+
+
+def insert_commits(repo_id, commits):
+    """Bulk insert commits, skipping any already mirrored; returns rows sent."""
+    if not commits:
+        return 0
+    rows = [commit_row(repo_id, commit) for commit in commits]
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        statement = postgresql.insert(RepositoryCommit.__table__).on_conflict_do_nothing()
+    elif dialect == 'sqlite':
+        statement = sqlite.insert(RepositoryCommit.__table__).on_conflict_do_nothing()
+    else:
+        known = mirrored_shas(repo_id, [row['sha'] for row in rows])
+        rows = [row for row in rows if row['sha'] not in known]
+        statement = RepositoryCommit.__table__.insert()
+    if rows:
+        db.session.execute(statement, rows)
+    return len(rows)
+
+
+def sync_state(repo_id):
+    return db.session.get(CommitSync, repo_id) or CommitSync(repo_id=repo_id, complete=False)
+
+
+def _list_commits(full_name, token, params):
+    response = github_client.get(f'/repos/{full_name}/commits', token, params=params)
+    if response.status_code != 200:
+        raise CommitSyncError(response.status_code)
+    return response.json()
+
+
+def sync_recent(token, repo_id, max_pages=1):
+    """Mirror the commits the default branch gained; returns (repository, caught_up, fetched_at).
+
+    Lists the branch from its tip, then from each parent of a listed
+    commit that isn't mirrored yet, until none is left. Merged branches
+    keep their original (older) dates, so neither the previous head's date
+    nor its SHA bounds what a push added. An up-to-date mirror costs one
+    (usually 304) upstream call. While the backfill is incomplete, parents
+    older than the oldest mirrored commit are left to it. The head only
+    moves once nothing is missing; a delta needing more than max_pages
+    listings is left for the background sync. fetched_at is when the tip
+    listing was fetched, for save_snapshot. Returns (None, False, None) if
+    the repository can't be resolved, and raises CommitSyncError when
+    GitHub refuses a listing (e.g. the user lost access).
+    """
+    state = sync_state(repo_id)
+    head_sha, oldest_at, complete = state.head_sha, state.oldest_at, state.complete
+    params = {'per_page': COMMIT_PAGE}
+
+    repository, response = get_repository_resource(token, repo_id, 'commits', params=params)
+    if repository is None:
+        return None, False, None
+    if response.status_code != 200:
+        raise CommitSyncError(response.status_code)
+
+    first_page = response.json()
+    commits, seen, missing = first_page, set(), set()
+    caught_up = head_sha is None or not first_page or first_page[0]['sha'] == head_sha
+    for page in range(1, max_pages + 1):
+        if caught_up:
+            break
+        if page > 1:
+            release_db_connection()
+            # History below a commit never changes, so these listings may come from the cache
+            commits = _list_commits(repository.full_name, token, dict(params, sha=missing.pop()))
+        shas = [commit['sha'] for commit in commits]
+        known = mirrored_shas(repo_id, shas)
+        fresh = [commit for commit in commits if commit['sha'] not in known]
+        seen.update(shas)
+        # Mirrored commits count too: an earlier sync may have stopped short of their parents
+        for commit in commits:
+            if complete or oldest_at is None or parse_date(commit['commit']['committer']['date']) >= oldest_at:
+                missing.update(parent['sha'] for parent in commit.get('parents', ()))
+        missing -= seen
+        missing -= mirrored_shas(repo_id, missing)
+        if fresh:
+            insert_commits(repo_id, fresh)
+            db.session.commit()
+        caught_up = not missing
+
+    if head_sha is None and first_page:
+        # On the first sync, page one is the delta; backfill takes the rest
+        insert_commits(repo_id, first_page)
+
+    state = db.session.merge(sync_state(repo_id))
+    if caught_up and first_page:
+        state.head_sha = first_page[0]['sha']
+        state.head_at = parse_date(first_page[0]['commit']['committer']['date'])
+        if state.base_sha is None:
+            state.base_sha = state.head_sha
+            state.oldest_at = parse_date(first_page[-1]['commit']['committer']['date'])
+            state.complete = len(first_page) < COMMIT_PAGE
+    elif caught_up:
+        state.complete = True  # empty repository
+    state.synced_at = datetime.utcnow()
+    db.session.commit()
+    return repository, caught_up, response.fetched_at
+
+
+def backfill(token, repo_id, full_name, max_pages):
+    """Mirror older history, walking back from the mirrored head by commit date.
+
+    Each page lists commits reachable from head_sha with until=<oldest
+    mirrored date>, so branches merged since the first sync are covered
+    too. The next page is requested while the current one is being
+    inserted. Returns the number of commits sent to the database.
+    """
+    state = sync_state(repo_id)
+    if state.complete or state.head_sha is None:
+        return 0
+
+    head_sha, until, page = state.head_sha, state.oldest_at, 1
+
+    def fetch_page():
+        params = {'per_page': COMMIT_PAGE, 'sha': head_sha, 'until': github_date(until), 'page': page}
+        return github_client.executor.submit(_list_commits, full_name, token, params)
+
+    release_db_connection()
+    pending = fetch_page()
+    inserted, complete = 0, False
+    for _ in range(max_pages):
+        commits = pending.result()
+        pending = None
+        if len(commits) < COMMIT_PAGE:
+            complete = True
+        else:
+            oldest = parse_date(commits[-1]['commit']['committer']['date'])
+            # A whole page at one timestamp would repeat forever; page within it instead
+            page = page + 1 if oldest == until else 1
+            until = oldest
+            pending = fetch_page()
+        inserted += insert_commits(repo_id, commits)
+        state = db.session.merge(sync_state(repo_id))
+        state.oldest_at = min(state.oldest_at or until, until)
+        state.complete = complete
+        db.session.commit()
+        if complete:
+            break
+    if pending is not None:
+        pending.cancel()
+    return inserted
+
+
+def query_commits(repo_id, limit, after=None, author=None, since=None, until=None):
+    """Mirrored commits newest first; returns (commits, (date, sha) of the last or None).
+
+    after is the (committed_at, sha) keyset of the previous page's last
+    commit. author matches an email if it contains '@', else a login.
+    """
+    query = RepositoryCommit.query.filter(RepositoryCommit.repo_id == repo_id)
+    if author:
+        if '@' in author:
+            query = query.filter(RepositoryCommit.author_email == author)
+        else:
+            query = query.filter(RepositoryCommit.author_login == author)
+    if since is not None:
+        query = query.filter(RepositoryCommit.committed_at >= since)
+    if until is not None:
+        query = query.filter(RepositoryCommit.committed_at <= until)
+    if after is not None:
+        query = query.filter(tuple_(RepositoryCommit.committed_at, RepositoryCommit.sha) < tuple_(*after))
+
+    rows = (query.order_by(RepositoryCommit.committed_at.desc(), RepositoryCommit.sha.desc())
+            .limit(limit + 1).all())
+    more = len(rows) > limit
+    rows = rows[:limit]
+    return rows, (rows[-1].committed_at, rows[-1].sha) if more else None
@@ -0,0 +1,67 @@
+import gzip
+import logging
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/plain', 'text/html')
+
+
+class Compression:
+    """Compresses large text responses with br or gzip per Accept-Encoding.
+
+    Bodies under COMPRESS_MIN_SIZE bytes are sent as they are: below
+    about a kilobyte the saving doesn't pay for the CPU or the extra
+    header. Streamed and already-encoded responses are left alone.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.min_size = app.config.get('COMPRESS_MIN_SIZE', 1024)
+        self.gzip_level = app.config.get('COMPRESS_GZIP_LEVEL', 6)
+        self.br_quality = app.config.get('COMPRESS_BR_QUALITY', 4)
+        if not app.config.get('COMPRESS_ENABLED', True):
+            return
+        app.after_request(self._compress)
+        app.extensions['compression'] = self
+
+    def _choose(self):
+        offered = ['br', 'gzip'] if brotli is not None else ['gzip']
+        return request.accept_encodings.best_match(offered)
+
+    def _compress(self, response):
+        if (response.direct_passthrough or response.status_code < 200 or response.status_code in (204, 304)
+                or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_TYPES):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = self._choose()
+        if encoding is None:
+            return response
+
+        body = response.get_data()
+        if len(body) < self.min_size:
+            return response
+
+        if encoding == 'br':
+            compressed = brotli.compress(body, quality=self.br_quality)
+        else:
+            compressed = gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            # A strong tag names exact bytes, so each encoding needs its own
+            response.set_etag(f'{etag}-{encoding}')
+        return response
+
+
+compression = Compression()
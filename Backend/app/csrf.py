@@ -0,0 +1,75 @@
+import hmac
+import secrets
+import logging
+from flask import request, jsonify, make_response
+from itsdangerous import URLSafeTimedSerializer, BadSignature
+
+logger = logging.getLogger(__name__)
+
+CSRF_COOKIE = 'csrf_token'
+CSRF_HEADER = 'X-CSRFToken'
+MUTATING_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+
+class DoubleSubmitCSRF:
+    """Stateless signed double-submit CSRF protection.
+
+    A token is a random nonce signed with SECRET_KEY and timestamped. The
+    token endpoint returns it in the body and in an HttpOnly cookie;
+    mutating requests must echo it in X-CSRFToken, and the header must
+    match the cookie and carry a valid, unexpired signature. Nothing is
+    stored on the server, and the same token is handed back while the
+    cookie is valid, so clients fetch it once per session.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self.ttl = 7 * 86400
+        self.cookie_secure = True
+        self._serializer = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('CSRF_ENABLED', self.enabled)
+        self.ttl = app.config.get('CSRF_TOKEN_TTL', self.ttl)
+        self.cookie_secure = app.config.get('CSRF_COOKIE_SECURE', self.cookie_secure)
+        self._serializer = URLSafeTimedSerializer(app.config['SECRET_KEY'], salt='csrf-token')
+        app.extensions['csrf'] = self
+
+    def _valid(self, token):
+        try:
+            self._serializer.loads(token, max_age=self.ttl)
+            return True
+        except BadSignature:  # includes SignatureExpired
+            return False
+
+    def token_response(self):
+        """Response for GET /csrf-token: the caller's current token, or a new one."""
+        token = request.cookies.get(CSRF_COOKIE)
+        if not token or not self._valid(token):
+            token = self._serializer.dumps(secrets.token_urlsafe(16))
+
+        response = make_response(jsonify({'csrfToken': token, 'expiresIn': self.ttl}))
+        response.set_cookie(CSRF_COOKIE, token, max_age=self.ttl, httponly=True,
+                            samesite='None', secure=self.cookie_secure)
+        # Cache well inside the token's lifetime; a cached copy is only valid with its cookie
+        response.headers['Cache-Control'] = f'private, max-age={self.ttl // 2}'
+        response.vary.add('Cookie')
+        return response
+
+    def protect(self):
+        """before_request hook: reject mutating requests without a matching token."""
+        if not self.enabled or request.method not in MUTATING_METHODS:
+            return None
+
+        header = request.headers.get(CSRF_HEADER, '')
+        cookie = request.cookies.get(CSRF_COOKIE, '')
+        if header and cookie and hmac.compare_digest(header.encode(), cookie.encode()) and self._valid(header):
+            return None
+
+        logger.warning(f"CSRF check failed for {request.method} {request.path}")
+        return jsonify({'error': 'CSRF token missing or invalid', 'code': 'csrf_failed'}), 403
+
+
+csrf = DoubleSubmitCSRF()
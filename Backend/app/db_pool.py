@@ -0,0 +1,128 @@
+import time
+import logging
+import threading
+from collections import deque
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import Pool, QueuePool, NullPool
+
+logger = logging.getLogger(__name__)
+
+
+class PoolStats:
+    """Connection pool counters fed by pool events, per worker process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=1000)
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._waits.clear()
+            self.checkouts = 0
+            self.checked_out = 0
+            self.connects = 0
+            self.invalidations = 0
+            self.timeouts = 0
+            self.waits = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+
+    def record_wait(self, seconds, timed_out=False):
+        with self._lock:
+            self._waits.append(seconds)
+            self.waits += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+
+    def on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.checked_out -= 1
+
+    def on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+
+    def on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidations += 1
+
+    def snapshot(self, pool=None):
+        with self._lock:
+            waits = sorted(self._waits)
+            stats = {
+                'checkouts': self.checkouts,
+                'in_use': self.checked_out,
+                'connects': self.connects,
+                'invalidations': self.invalidations,
+                'timeouts': self.timeouts,
+                # Lifetime average; p99 is over the last 1000 waits only
+                'wait_avg_ms': round(self.wait_total / self.waits * 1000, 3) if self.waits else 0.0,
+                'wait_p99_ms': round(waits[min(len(waits) - 1, int(len(waits) * 0.99))] * 1000, 3) if waits else 0.0,
+                'wait_max_ms': round(self.wait_max * 1000, 3)
+            }
+        if isinstance(pool, QueuePool):
+            stats.update({
+                'pool_size': pool.size(),
+                'checked_in': pool.checkedin(),
+                'overflow': max(pool.overflow(), 0)
+            })
+        return stats
+
+
+pool_stats = PoolStats()
+
+event.listen(Pool, 'checkout', pool_stats.on_checkout)
+event.listen(Pool, 'checkin', pool_stats.on_checkin)
+event.listen(Pool, 'connect', pool_stats.on_connect)
+event.listen(Pool, 'invalidate', pool_stats.on_invalidate)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait for a connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_stats.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        pool_stats.record_wait(time.perf_counter() - start)
+        return connection
+
+
+def engine_options(database_url, profile='default', size=5, max_overflow=10,
+                   timeout=10, recycle=1800, pre_ping=True):
+    """Build SQLALCHEMY_ENGINE_OPTIONS for a pool profile.
+
+    'default' keeps a local QueuePool per worker. 'pgbouncer' is for
+    PgBouncer in transaction mode: PgBouncer does the pooling, so each
+    checkout opens a fresh client connection to it (NullPool).
+    """
+    # In-memory SQLite needs its default single-connection pool
+    if not database_url or database_url in ('sqlite://', 'sqlite:///:memory:'):
+        return {}
+
+    if profile == 'pgbouncer':
+        return {'poolclass': NullPool, 'pool_pre_ping': False}
+
+    if profile != 'default':
+        logger.warning(f"Unknown DB_POOL_PROFILE '{profile}', using default")
+
+    return {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': size,
+        'max_overflow': max_overflow,
+        'pool_timeout': timeout,
+        'pool_recycle': recycle,
+        'pool_pre_ping': pre_ping
+    }
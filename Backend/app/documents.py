@@ -0,0 +1,184 @@
+import re
+import logging
+from datetime import datetime
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from . import ot
+from .models import db, Document, DocumentMember, DocumentOperation, DocumentSnapshot
+
+logger = logging.getLogger(__name__)
+
+# Collaboration rooms backed by a stored document; only members may join
+DOCUMENT_ROOM = re.compile(r'^documents/(\d+)$')
+
+
+class DocumentConflict(Exception):
+    """The client is too far behind to rebase; it must reload the document."""
+
+
+def document_room(document_id):
+    return f'documents/{document_id}'
+
+
+def member_document(document_id, user_id):
+    """The document if user_id is a member of it, else None."""
+    return (Document.query
+            .join(DocumentMember, DocumentMember.document_id == Document.id)
+            .filter(Document.id == document_id, DocumentMember.user_id == user_id)
+            .first())
+
+
+def member_documents(user_id):
+    return (Document.query
+            .join(DocumentMember, DocumentMember.document_id == Document.id)
+            .filter(DocumentMember.user_id == user_id)
+            .order_by(Document.updated_at.desc())
+            .all())
+
+
+def room_allowed(user_id, room):
+    match = DOCUMENT_ROOM.match(room)
+    return match is None or member_document(int(match.group(1)), user_id) is not None
+
+
+def voice_room_allowed(user_id, room):
+    """Voice rooms are a document's call, so only its members may join."""
+    match = DOCUMENT_ROOM.match(room)
+    return match is not None and member_document(int(match.group(1)), user_id) is not None
+
+
+def create_document(owner_id, title, content=''):
+    document = Document(owner_id=owner_id, title=title, version=0, length=len(content), snapshot_version=0)
+    db.session.add(document)
+    db.session.flush()
+    db.session.add(DocumentMember(document_id=document.id, user_id=owner_id))
+    db.session.add(DocumentSnapshot(document_id=document.id, version=0, content=content))
+    db.session.commit()
+    return document
+
+
+def _tail(document_id, after, upto):
+    return (DocumentOperation.query
+            .filter(DocumentOperation.document_id == document_id,
+                    DocumentOperation.version > after,
+                    DocumentOperation.version <= upto)
+            .order_by(DocumentOperation.version)
+            .all())
+
+
+def load_content(document):
+    """(content, tail length) at document.version: latest snapshot plus the ops after it."""
+    for _ in range(2):
+        snapshot = (DocumentSnapshot.query
+                    .filter(DocumentSnapshot.document_id == document.id,
+                            DocumentSnapshot.version <= document.version)
+                    .order_by(DocumentSnapshot.version.desc())
+                    .first())
+        tail = _tail(document.id, snapshot.version, document.version)
+        if len(tail) == document.version - snapshot.version:
+            break
+        # Compaction replaced the snapshot and trimmed its ops between our two queries
+    else:
+        raise DocumentConflict('Document history changed while loading, retry')
+
+    content = snapshot.content
+    for row in tail:
+        content = ot.apply(content, current_app.json.loads(row.operation))
+    return content, len(tail)
+
+
+def operations_since(document, since):
+    """Ops after version since, or None if they have been compacted away."""
+    if since >= document.version:
+        return []
+    tail = _tail(document.id, since, min(document.version, since + current_app.config['DOCUMENT_MAX_REBASE']))
+    if not tail or tail[0].version != since + 1:
+        return None
+    return [{'version': row.version, 'operation': current_app.json.loads(row.operation), 'user_id': row.user_id}
+            for row in tail]
+
+
+def submit_operations(document_id, user_id, base_version, operations):
+    """Rebase a batch of ops made at base_version onto the head and append it.
+
+    The batch is composed into one op, transformed over every op committed
+    since base_version (the submitted op's inserts win ties) and stored as
+    a single new version. Returns (document, op as stored, ops the client
+    missed). Raises ot.OperationError for invalid ops and DocumentConflict
+    when the client must reload.
+    """
+    op = []
+    for index, component in enumerate(operations):
+        step = ot.validate(component)
+        op = step if index == 0 else ot.compose(op, step)
+
+    max_rebase = current_app.config['DOCUMENT_MAX_REBASE']
+    for _ in range(3):
+        # Row lock on Postgres; elsewhere the (document_id, version) key catches the race
+        document = db.session.get(Document, document_id, with_for_update=True)
+        if base_version < 0 or base_version > document.version:
+            raise ot.OperationError(f'base_version must be between 0 and {document.version}')
+        if document.version - base_version > max_rebase:
+            raise DocumentConflict('Too far behind to rebase, reload the document')
+
+        concurrent = _tail(document_id, base_version, document.version)
+        if len(concurrent) != document.version - base_version:
+            raise DocumentConflict('History since base_version was compacted, reload the document')
+
+        rebased = op
+        missed = []
+        for row in concurrent:
+            server_op = current_app.json.loads(row.operation)
+            rebased, _ = ot.transform(rebased, server_op)
+            missed.append({'version': row.version, 'operation': server_op, 'user_id': row.user_id})
+
+        if ot.base_length(rebased) != document.length:
+            raise ot.OperationError(f'Operation expects length {ot.base_length(rebased)}, document has {document.length}')
+        length = ot.target_length(rebased)
+        if length > current_app.config['DOCUMENT_MAX_LENGTH']:
+            raise ot.OperationError('Document too large')
+
+        document.version += 1
+        document.length = length
+        document.updated_at = datetime.utcnow()
+        db.session.add(DocumentOperation(document_id=document_id, version=document.version, user_id=user_id,
+                                         operation=current_app.json.dumps(rebased)))
+        try:
+            db.session.commit()
+            return document, rebased, missed
+        except IntegrityError:
+            # Another writer took this version first; rebase over it too
+            db.session.rollback()
+    raise DocumentConflict('Document is busy, retry')
+
+
+def compact(document_id):
+    """Snapshot the head and trim history that no reader or rebase needs.
+
+    The previous snapshot is kept for readers that picked it just before
+    this one landed, and DOCUMENT_OP_RETENTION ops stay behind the new
+    snapshot so lagging clients can still rebase or catch up.
+    """
+    document = db.session.get(Document, document_id)
+    if document is None or document.version <= document.snapshot_version:
+        return None
+
+    content, _ = load_content(document)
+    version, previous = document.version, document.snapshot_version
+    db.session.merge(DocumentSnapshot(document_id=document_id, version=version, content=content))
+    document.snapshot_version = version
+    DocumentSnapshot.query.filter(DocumentSnapshot.document_id == document_id,
+                                  DocumentSnapshot.version < previous).delete(synchronize_session=False)
+    trimmed = DocumentOperation.query.filter(
+        DocumentOperation.document_id == document_id,
+        DocumentOperation.version <= min(previous, version - current_app.config['DOCUMENT_OP_RETENTION'])
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return {'version': version, 'ops_trimmed': trimmed}
+
+
+def needs_compaction(document, tail=None):
+    every = current_app.config['DOCUMENT_SNAPSHOT_EVERY']
+    if tail is None:
+        tail = document.version - document.snapshot_version
+    return every > 0 and tail >= every
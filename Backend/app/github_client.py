@@ -0,0 +1,353 @@
+import os
+import re
+import time
+import json
+import hashlib
+import logging
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, parse_qs
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import parse_header_links
+from flask import g, has_app_context
+from .metrics import record_upstream
+from .single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+MAX_AGE_RE = re.compile(r'max-age=(\d+)')
+
+
+class GitHubResponse:
+    """Minimal response object shared by live and cached GitHub replies."""
+
+    def __init__(self, status_code, content, headers, cache_status='miss', fetched_at=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.cache_status = cache_status
+        # When GitHub last vouched for this body (epoch seconds), even if served from cache
+        self.fetched_at = fetched_at if fetched_at is not None else time.time()
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+    def dumps(self):
+        meta = {'status_code': self.status_code, 'headers': dict(self.headers), 'cache_status': self.cache_status,
+                'fetched_at': self.fetched_at}
+        return json.dumps(meta).encode() + b'\n' + self.content
+
+    @classmethod
+    def loads(cls, data):
+        meta, content = data.split(b'\n', 1)
+        meta = json.loads(meta)
+        return cls(meta['status_code'], content, CaseInsensitiveDict(meta['headers']), meta['cache_status'],
+                   meta['fetched_at'])
+
+
+class GitHubClient:
+    """Pooled, conditional-request aware client for api.github.com.
+
+    Keeps one keep-alive requests.Session per worker process and remembers
+    ETag/Last-Modified per (token, URL). Revalidations that come back as 304
+    don't count against the rate limit and reuse the cached body.
+
+    It also tracks X-RateLimit-Remaining/Reset per token. Once a token is
+    down to GITHUB_RATE_LIMIT_LOW requests, cached entries are served stale
+    and revalidated by a single background thread, which stops at
+    GITHUB_RATE_LIMIT_RESERVE so the rest of the window is left for
+    interactive calls.
+
+    Concurrent identical GETs for one token share a single upstream call
+    (see SingleFlight), across workers too when GITHUB_SINGLE_FLIGHT_DIR
+    is set.
+    """
+
+    def __init__(self, app=None):
+        self.api_url = 'https://api.github.com'
+        self.timeout = 10
+        self.pool_size = 20
+        self.cache_size = 2048
+        self.page_workers = 8
+        self.rate_limit_low = 500
+        self.rate_limit_reserve = 100
+        self._session = None
+        self._executor = None
+        self._pid = None
+        self._flights = SingleFlight()
+        self._refresh_queue = None
+        self._refreshing = set()
+        self._cache = OrderedDict()
+        self._limits = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'not_modified': 0, 'misses': 0, 'errors': 0,
+                       'stale': 0, 'rate_limited': 0, 'refreshes': 0, 'refreshes_deferred': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.api_url = app.config.get('GITHUB_API_URL', self.api_url).rstrip('/')
+        self.timeout = app.config.get('GITHUB_TIMEOUT', self.timeout)
+        self.pool_size = app.config.get('GITHUB_POOL_SIZE', self.pool_size)
+        self.cache_size = app.config.get('GITHUB_CACHE_SIZE', self.cache_size)
+        self.page_workers = app.config.get('GITHUB_PAGE_WORKERS', self.page_workers)
+        self.rate_limit_low = app.config.get('GITHUB_RATE_LIMIT_LOW', self.rate_limit_low)
+        self.rate_limit_reserve = app.config.get('GITHUB_RATE_LIMIT_RESERVE', self.rate_limit_reserve)
+        self._flights.configure(app.config.get('GITHUB_SINGLE_FLIGHT_DIR'), self.timeout)
+        self._pid = None  # rebuild pools with the new settings on next use
+        self.reset()
+        app.extensions['github_client'] = self
+
+    def _ensure_pools(self):
+        # Pools must not be shared across a fork (gunicorn --preload)
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid == os.getpid():
+                    return
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                session.hooks['response'].append(record_upstream)
+                self._session = session
+                self._executor = ThreadPoolExecutor(max_workers=self.page_workers,
+                                                    thread_name_prefix='github')
+                self._refresh_queue = refresh_queue = queue.Queue()
+                self._refreshing.clear()
+                self._pid = os.getpid()
+            # Outside the lock: under gevent start() yields, and get() takes the lock
+            threading.Thread(target=self._refresh_loop, args=(refresh_queue,),
+                             name='github-refresh', daemon=True).start()
+
+    @property
+    def session(self):
+        self._ensure_pools()
+        return self._session
+
+    @property
+    def executor(self):
+        """Bounded per-process pool for concurrent upstream calls."""
+        self._ensure_pools()
+        return self._executor
+
+    def url(self, path):
+        return f'{self.api_url}{path}'
+
+    def _cache_key(self, token, url, params):
+        token_hash = hashlib.sha256((token or '').encode()).hexdigest()
+        query = tuple(sorted((params or {}).items()))
+        return (token_hash, url, query)
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def get(self, path, token, params=None, headers=None, allow_redirects=True, fresh_after=None):
+        """GET an API path (or absolute URL) on behalf of a user token.
+
+        fresh_after (epoch seconds) is when the caller learned the resource
+        changed, e.g. a webhook delivery: a cached body fetched before then
+        is revalidated even if its max-age hasn't run out.
+        """
+        url = path if path.startswith('http') else self.url(path)
+        key = self._cache_key(token, url, params)
+
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+
+        if entry is not None:
+            if entry['fresh_until'] > time.monotonic() and (fresh_after is None or entry['fetched_at'] >= fresh_after):
+                self._count('hits')
+                return GitHubResponse(200, entry['content'], entry['headers'], 'hit', entry['fetched_at'])
+            if self._quota_below(key[0], self.rate_limit_low):
+                self._schedule_refresh(key, (url, token, params, headers, allow_redirects))
+                return self._serve_stale(entry)
+
+        return self._fetch_once(key, entry, url, token, params, headers, allow_redirects)
+
+    def _fetch_once(self, key, entry, url, token, params, headers, allow_redirects):
+        flight_key = ('GET', *key, tuple(sorted((headers or {}).items())), allow_redirects)
+        result = self._flights.do(
+            flight_key,
+            lambda: self._fetch(key, entry, url, token, params, headers, allow_redirects),
+            GitHubResponse.dumps, GitHubResponse.loads
+        )
+        if result.cache_status == 'stale' and has_app_context():
+            g.github_data_stale = True  # the leader may have been another request
+        return result
+
+    def _fetch(self, key, entry, url, token, params, headers, allow_redirects):
+        request_headers = {
+            'Authorization': f'token {token}',
+            'Accept': 'application/vnd.github.v3+json'
+        }
+        request_headers.update(headers or {})
+        if entry is not None:
+            if entry['etag']:
+                request_headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                request_headers['If-Modified-Since'] = entry['last_modified']
+
+        started = time.time()
+        try:
+            response = self.session.get(url, headers=request_headers, params=params,
+                                        timeout=self.timeout, allow_redirects=allow_redirects)
+        except requests.RequestException:
+            self._count('errors')
+            raise
+        self._note_rate_limit(key[0], response.headers)
+
+        if response.status_code == 304 and entry is not None:
+            self._count('not_modified')
+            entry['fresh_until'] = time.monotonic() + self._max_age(response.headers)
+            entry['fetched_at'] = started
+            return GitHubResponse(200, entry['content'], entry['headers'], 'not_modified', started)
+
+        if response.status_code in (403, 429) and self._is_rate_limited(response):
+            self._count('rate_limited')
+            if entry is not None:
+                return self._serve_stale(entry)
+
+        self._count('misses')
+        result = GitHubResponse(response.status_code, response.content, response.headers, fetched_at=started)
+        if response.status_code == 200:
+            self._store(key, response, started)
+        return result
+
+    def _serve_stale(self, entry):
+        self._count('stale')
+        if has_app_context():
+            g.github_data_stale = True
+        return GitHubResponse(200, entry['content'], entry['headers'], 'stale', entry['fetched_at'])
+
+    def _is_rate_limited(self, response):
+        # Secondary limits send Retry-After; primary ones exhaust Remaining
+        return (response.headers.get('X-RateLimit-Remaining') == '0'
+                or 'Retry-After' in response.headers)
+
+    def _note_rate_limit(self, token_hash, headers):
+        try:
+            remaining = int(headers['X-RateLimit-Remaining'])
+            reset = int(headers['X-RateLimit-Reset'])
+        except (KeyError, ValueError):
+            return
+        with self._lock:
+            self._limits[token_hash] = (remaining, reset)
+            if len(self._limits) > self.cache_size:
+                now = time.time()
+                self._limits = {k: v for k, v in self._limits.items() if v[1] > now}
+
+    def _quota_below(self, token_hash, threshold):
+        with self._lock:
+            limit = self._limits.get(token_hash)
+        return limit is not None and limit[1] > time.time() and limit[0] <= threshold
+
+    def _schedule_refresh(self, key, call):
+        self._ensure_pools()
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        self._refresh_queue.put((key, call))
+
+    def _refresh_loop(self, refresh_queue):
+        # One thread per process, so background revalidation never competes
+        # with interactive calls for more than a single connection
+        while True:
+            key, (url, token, params, headers, allow_redirects) = refresh_queue.get()
+            try:
+                if self._quota_below(key[0], self.rate_limit_reserve):
+                    self._count('refreshes_deferred')
+                    continue
+                with self._lock:
+                    entry = self._cache.get(key)
+                self._count('refreshes')
+                self._fetch_once(key, entry, url, token, params, headers, allow_redirects)
+            except Exception as e:
+                logger.warning(f"Background GitHub refresh failed: {e.__class__.__name__}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+    def last_page(self, response):
+        """Page number of the rel="last" Link, or 1 when there is only one page."""
+        for link in parse_header_links(response.headers.get('Link', '')):
+            if link.get('rel') == 'last':
+                page = parse_qs(urlparse(link['url']).query).get('page', ['1'])[0]
+                return int(page)
+        return 1
+
+    def get_all(self, path, token, params=None, per_page=100):
+        """GET every page of a list endpoint.
+
+        Reads the rel="last" Link of page one, then fetches the remaining
+        pages concurrently on the bounded page pool. Returns (response, items)
+        where response is page one, or the first failed page.
+        """
+        params = dict(params or {}, per_page=per_page)
+        first = self.get(path, token, params=dict(params, page=1))
+        if first.status_code != 200:
+            return first, None
+
+        pages = [first.json()]
+        rest = range(2, self.last_page(first) + 1)
+        futures = [self.executor.submit(self.get, path, token, dict(params, page=page)) for page in rest]
+        for future in futures:
+            response = future.result()
+            if response.status_code != 200:
+                return response, None
+            if response.cache_status == 'stale' and has_app_context():
+                g.github_data_stale = True  # served on a pool thread, outside this context
+            pages.append(response.json())
+
+        return first, [item for page in pages for item in page]
+
+    def _max_age(self, headers):
+        match = MAX_AGE_RE.search(headers.get('Cache-Control', ''))
+        return int(match.group(1)) if match else 0
+
+    def _store(self, key, response, fetched_at):
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        max_age = self._max_age(response.headers)
+        if not (etag or last_modified or max_age):
+            return
+
+        entry = {
+            'etag': etag,
+            'last_modified': last_modified,
+            'content': response.content,
+            'headers': dict(response.headers),
+            'fetched_at': fetched_at,
+            'fresh_until': time.monotonic() + max_age
+        }
+        with self._lock:
+            self._cache[key] = entry
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def reset(self):
+        with self._lock:
+            self._cache.clear()
+            self._limits.clear()
+            self._stats = dict.fromkeys(self._stats, 0)
+
+    def stats(self):
+        with self._lock:
+            return {'cache_size': len(self._cache), 'tracked_tokens': len(self._limits),
+                    'refresh_queue': len(self._refreshing), **self._stats,
+                    'single_flight': self._flights.stats()}
+
+
+github_client = GitHubClient()
@@ -0,0 +1,35 @@
+import hashlib
+from functools import wraps
+from flask import request, make_response
+
+# Suffixes the compression hook appends so each encoding keeps a distinct strong ETag
+ENCODING_SUFFIXES = ('', '-br', '-gzip')
+
+
+def etagged(f):
+    """Give successful GET responses a strong ETag and answer If-None-Match with 304.
+
+    The tag is a hash of the body, so it changes exactly when the JSON
+    does. Responses are per user, hence Vary: Authorization and
+    Cache-Control: private, no-cache (store, but revalidate every time).
+    Put it below token_required so unauthenticated calls never get a tag.
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        response = make_response(f(*args, **kwargs))
+        if request.method not in ('GET', 'HEAD') or response.status_code != 200 or response.direct_passthrough:
+            return response
+
+        response.vary.add('Authorization')
+        response.headers['Cache-Control'] = 'private, no-cache'
+        etag = hashlib.blake2b(response.get_data(), digest_size=16).hexdigest()
+        response.set_etag(etag)
+
+        if any(request.if_none_match.contains_weak(etag + suffix) for suffix in ENCODING_SUFFIXES):
+            not_modified = make_response('', 304)
+            not_modified.set_etag(etag)
+            not_modified.vary.update(response.vary)
+            not_modified.headers['Cache-Control'] = response.headers['Cache-Control']
+            return not_modified
+        return response
+    return decorated
@@ -0,0 +1,103 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .metrics import JOBS
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueue:
+    """In-process background jobs, run on a small pool in each worker.
+
+    Jobs are registered by name and enqueued with their arguments; an
+    identical job that is already queued or running is not enqueued again,
+    and at most JOB_MAX_PENDING jobs wait per worker. Jobs are lost if the
+    worker exits, so only use it for work that can be redone on demand.
+    """
+
+    def __init__(self, app=None):
+        self.workers = 2
+        self.max_pending = 100
+        self._app = None
+        self._handlers = {}
+        self._executor = None
+        self._pid = None
+        self._active = set()
+        self._lock = threading.Lock()
+        self._stats = {'enqueued': 0, 'duplicates': 0, 'rejected': 0,
+                       'succeeded': 0, 'failed': 0, 'run_time': 0.0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.workers = app.config.get('JOB_WORKERS', self.workers)
+        self.max_pending = app.config.get('JOB_MAX_PENDING', self.max_pending)
+        self._app = app
+        self._pid = None  # rebuild the pool with the new settings on next use
+        app.extensions['jobs'] = self
+
+    def register(self, name):
+        """Decorator registering a job function under name."""
+        def decorator(fn):
+            self._handlers[name] = fn
+            return fn
+        return decorator
+
+    def _ensure_pool(self):
+        # The pool must not be shared across a fork (gunicorn --preload)
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='jobs')
+                    self._active.clear()
+                    self._pid = os.getpid()
+
+    def enqueue(self, name, *args):
+        """Queue handler(*args); returns False if it was a duplicate or the queue is full."""
+        if name not in self._handlers:
+            raise KeyError(f'Unknown job {name}')
+
+        self._ensure_pool()
+        key = (name, *args)
+        with self._lock:
+            if key in self._active:
+                self._stats['duplicates'] += 1
+                JOBS.labels(name, 'duplicate').inc()
+                return False
+            if len(self._active) >= self.max_pending:
+                self._stats['rejected'] += 1
+                JOBS.labels(name, 'rejected').inc()
+                logger.warning(f"Job queue full, dropped {name}")
+                return False
+            self._active.add(key)
+            self._stats['enqueued'] += 1
+
+        self._executor.submit(self._run, key)
+        return True
+
+    def _run(self, key):
+        name, args = key[0], key[1:]
+        start = time.perf_counter()
+        outcome = 'succeeded'
+        try:
+            with self._app.app_context():
+                self._handlers[name](*args)
+        except Exception as e:
+            outcome = 'failed'
+            logger.error(f"Job {name} failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._active.discard(key)
+                self._stats[outcome] += 1
+                self._stats['run_time'] += time.perf_counter() - start
+            JOBS.labels(name, outcome).inc()
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, 'run_time': round(self._stats['run_time'], 3),
+                    'active': len(self._active), 'workers': self.workers}
+
+
+jobs = JobQueue()
@@ -0,0 +1,62 @@
+import logging
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson.
+
+    Encodes to bytes in one C call and hands them straight to the
+    response. Anything orjson can't encode natively (datetimes, dates,
+    dataclasses, objects with __html__) goes through Flask's default, so
+    output matches DefaultJSONProvider apart from whitespace and non-ASCII
+    characters being sent as UTF-8 rather than \\u escapes.
+    """
+
+    def _options(self, indent=False, sort_keys=None):
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys if sort_keys is None else sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps(self, obj, **kwargs):
+        if kwargs.keys() - {'default', 'sort_keys'}:
+            return super().dumps(obj, **kwargs)  # indent/separators etc.
+        options = self._options(sort_keys=kwargs.get('sort_keys'))
+        return orjson.dumps(obj, default=kwargs.get('default', self.default), option=options).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        body = orjson.dumps(obj, default=self.default, option=self._options(indent)) + b'\n'
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+PROVIDERS = {
+    'default': DefaultJSONProvider,
+    'orjson': OrjsonProvider
+}
+
+
+def json_provider(app, name):
+    """Instantiate the JSON provider named by JSON_PROVIDER."""
+    if name == 'orjson' and orjson is None:
+        logger.warning("orjson is not installed, using Flask's default JSON provider")
+        name = 'default'
+    if name not in PROVIDERS:
+        logger.warning(f"Unknown JSON_PROVIDER '{name}', using default")
+        name = 'default'
+    return PROVIDERS[name](app)
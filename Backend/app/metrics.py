@@ -0,0 +1,133 @@
+import os
+import hmac
+import time
+import logging
+from urllib.parse import urlparse
+from flask import request, g, abort, has_app_context, Response
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from prometheus_client import (
+    Counter, Histogram, CollectorRegistry, generate_latest, CONTENT_TYPE_LATEST, REGISTRY
+)
+from prometheus_client import multiprocess
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+
+REQUEST_LATENCY = Histogram(
+    'collabvoice_http_request_duration_seconds', 'Request latency by route',
+    ['blueprint', 'endpoint', 'method'], buckets=LATENCY_BUCKETS
+)
+REQUEST_COUNT = Counter(
+    'collabvoice_http_requests_total', 'Requests by route and status',
+    ['blueprint', 'endpoint', 'method', 'status']
+)
+DB_QUERIES = Histogram(
+    'collabvoice_db_queries_per_request', 'SQL statements issued per request',
+    ['endpoint'], buckets=(0, 1, 2, 3, 5, 10, 20, 50)
+)
+DB_TIME = Histogram(
+    'collabvoice_db_time_per_request_seconds', 'Time spent in SQL per request',
+    ['endpoint'], buckets=LATENCY_BUCKETS
+)
+UPSTREAM_LATENCY = Histogram(
+    'collabvoice_upstream_request_duration_seconds', 'Outbound HTTP latency by host and status',
+    ['host', 'status'], buckets=LATENCY_BUCKETS
+)
+UPSTREAM_COALESCED = Counter(
+    'collabvoice_upstream_coalesced_total', 'Outbound calls answered by an identical in-flight call',
+    ['scope']
+)
+JOBS = Counter(
+    'collabvoice_jobs_total', 'Background jobs by outcome',
+    ['job', 'outcome']
+)
+COLLAB_MESSAGES = Counter(
+    'collabvoice_collab_messages_total', 'Collaboration messages received, sent and relayed from other workers',
+    ['direction']
+)
+COLLAB_DISCONNECTS = Counter(
+    'collabvoice_collab_disconnects_total', 'Collaboration WebSocket disconnects by reason',
+    ['reason']
+)
+PASSWORD_HASH_TIME = Histogram(
+    'collabvoice_password_hash_seconds', 'bcrypt time including pool queueing',
+    ['operation'], buckets=(.01, .05, .1, .25, .5, 1, 2.5, 5)
+)
+
+
+def record_upstream(response, *args, **kwargs):
+    """requests response hook: time to response headers by host and status."""
+    host = urlparse(response.url).hostname or 'unknown'
+    UPSTREAM_LATENCY.labels(host, str(response.status_code)).observe(response.elapsed.total_seconds())
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+    if has_app_context() and 'db_queries' in g:
+        g.db_queries += 1
+        g.db_time += elapsed
+
+
+class Metrics:
+    """Prometheus metrics for routes, SQL, upstream calls and bcrypt.
+
+    Under gunicorn set PROMETHEUS_MULTIPROC_DIR (gunicorn.conf.py does) so
+    every worker writes to shared files and /metrics aggregates them.
+    """
+
+    def __init__(self, app=None):
+        self.token = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get('METRICS_ENABLED', True):
+            return
+
+        self.token = app.config.get('METRICS_TOKEN')
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.add_url_rule('/metrics', 'metrics', self.export)
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        app.extensions['metrics'] = self
+
+    def _start_request(self):
+        g.request_start = time.perf_counter()
+        g.db_queries = 0
+        g.db_time = 0.0
+
+    def _finish_request(self, response):
+        if 'request_start' not in g or request.endpoint == 'metrics':
+            return response
+
+        endpoint = request.endpoint or 'unmatched'
+        blueprint = request.blueprint or 'app'
+        REQUEST_LATENCY.labels(blueprint, endpoint, request.method).observe(time.perf_counter() - g.request_start)
+        REQUEST_COUNT.labels(blueprint, endpoint, request.method, str(response.status_code)).inc()
+        DB_QUERIES.labels(endpoint).observe(g.db_queries)
+        DB_TIME.labels(endpoint).observe(g.db_time)
+        return response
+
+    def export(self):
+        """Prometheus text exposition, aggregated across workers when multiprocess."""
+        credentials = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not self.token or not hmac.compare_digest(credentials.encode(), self.token.encode()):
+            abort(404)
+
+        if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = REGISTRY
+        return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+metrics = Metrics()
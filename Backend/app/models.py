@@ -1,10 +1,20 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_bcrypt import Bcrypt
 from datetime import datetime
+from .passwords import password_hasher
 
 db = SQLAlchemy()
 bcrypt = Bcrypt()
 
+def release_db_connection():
+    """Return the session's pooled connection before slow upstream I/O.
+
+    Under gevent one worker holds hundreds of requests in flight, so a
+    connection held across a GitHub call would exhaust the pool. Objects
+    already loaded stay readable; the next query checks out a connection again.
+    """
+    db.session.close()
+
 class User(db.Model):
     __tablename__ = 'users'
     
@@ -16,16 +26,20 @@ class User(db.Model):
     google_id = db.Column(db.String(50), unique=True, nullable=True)
     avatar_url = db.Column(db.String(255), nullable=True)
     github_access_token = db.Column(db.String(255), nullable=True)  # Store GitHub token for repo access
-    current_session_id = db.Column(db.String(255), nullable=True)  # For single session enforcement
+    current_session_id = db.Column(db.String(255), nullable=True)  # Legacy single session; superseded by sessions
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def set_password(self, password):
-        self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+        # bcrypt runs on the password hasher's process pool, not the request thread
+        self.password_hash = password_hasher.hash(password)
         
     def check_password(self, password):
         if not self.password_hash:
             return False
-        return bcrypt.check_password_hash(self.password_hash, password)
+        return password_hasher.check(password, self.password_hash)
+
+    def password_needs_rehash(self):
+        return bool(self.password_hash) and password_hasher.needs_rehash(self.password_hash)
 
     def to_dict(self):
         return {
@@ -36,3 +50,161 @@ class User(db.Model):
             'has_github_access': bool(self.github_access_token),
             'created_at': self.created_at.isoformat()
         }
+
+class RepositoryIndex(db.Model):
+    __tablename__ = 'repository_index'
+    
+    # GitHub repository id -> current full_name, so follow-up calls can skip /repositories/{id}
+    repo_id = db.Column(db.BigInteger, primary_key=True, autoincrement=False)
+    name = db.Column(db.String(255), nullable=False)
+    full_name = db.Column(db.String(255), nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    hooked_at = db.Column(db.DateTime, nullable=True)  # Last webhook delivery for this repo
+
+    def to_dict(self):
+        return {
+            'id': self.repo_id,
+            'name': self.name,
+            'full_name': self.full_name
+        }
+
+class GitHubSnapshot(db.Model):
+    __tablename__ = 'github_snapshots'
+    
+    # Formatted GitHub data prefetched for a user, e.g. 'repositories' or 'commits:<repo_id>'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    resource = db.Column(db.String(64), primary_key=True, index=True)
+    payload = db.Column(db.Text, nullable=False)
+    fetched_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+class WebhookDelivery(db.Model):
+    __tablename__ = 'webhook_deliveries'
+    
+    # X-GitHub-Delivery ids already handled; GitHub redelivers on timeouts and manual retries
+    delivery_id = db.Column(db.String(64), primary_key=True)
+    event = db.Column(db.String(50), nullable=False)
+    received_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+
+class RepositoryCommit(db.Model):
+    __tablename__ = 'repository_commits'
+    __table_args__ = (
+        # Keyset pagination, newest first, and the same order per author
+        db.Index('ix_repository_commits_repo_committed', 'repo_id', 'committed_at', 'sha'),
+        db.Index('ix_repository_commits_repo_login', 'repo_id', 'author_login', 'committed_at'),
+        db.Index('ix_repository_commits_repo_email', 'repo_id', 'author_email', 'committed_at'),
+    )
+    
+    # Local mirror of a repository's default-branch history, see app/commit_mirror.py
+    # No foreign key: the index entry is dropped when one user loses access, the mirror is not
+    repo_id = db.Column(db.BigInteger, primary_key=True, autoincrement=False)
+    sha = db.Column(db.String(40), primary_key=True)
+    message = db.Column(db.Text, nullable=False)
+    author_name = db.Column(db.String(255), nullable=True)
+    author_email = db.Column(db.String(255), nullable=True)
+    author_login = db.Column(db.String(100), nullable=True)  # GitHub account, if the email maps to one
+    author_avatar_url = db.Column(db.String(255), nullable=True)
+    authored_at = db.Column(db.DateTime, nullable=True)
+    committer_name = db.Column(db.String(255), nullable=True)
+    committed_at = db.Column(db.DateTime, nullable=False)
+    html_url = db.Column(db.String(255), nullable=True)
+
+    def to_dict(self):
+        # Same shape as format_commit in routes/github.py
+        return {
+            'sha': self.sha,
+            'message': self.message,
+            'author': {
+                'name': self.author_name,
+                'email': self.author_email,
+                'date': self.authored_at.isoformat() + 'Z' if self.authored_at else None
+            },
+            'committer': {
+                'name': self.committer_name,
+                'date': self.committed_at.isoformat() + 'Z'
+            },
+            'html_url': self.html_url,
+            'author_info': {
+                'login': self.author_login,
+                'avatar_url': self.author_avatar_url
+            } if self.author_login else None
+        }
+
+class CommitSync(db.Model):
+    __tablename__ = 'commit_syncs'
+    
+    # Where a repository's mirror stands: the newest commit seen and how far back history goes
+    repo_id = db.Column(db.BigInteger, primary_key=True, autoincrement=False)
+    head_sha = db.Column(db.String(40), nullable=True)
+    head_at = db.Column(db.DateTime, nullable=True)
+    base_sha = db.Column(db.String(40), nullable=True)  # Head at the first sync
+    oldest_at = db.Column(db.DateTime, nullable=True)
+    complete = db.Column(db.Boolean, default=False, nullable=False)
+    synced_at = db.Column(db.DateTime, nullable=True)
+
+class Document(db.Model):
+    __tablename__ = 'documents'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    owner_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    title = db.Column(db.String(255), nullable=False)
+    version = db.Column(db.Integer, default=0, nullable=False)  # Last operation applied
+    length = db.Column(db.Integer, default=0, nullable=False)  # Length at version, to validate ops without loading content
+    snapshot_version = db.Column(db.Integer, default=0, nullable=False)  # Latest compacted snapshot
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'owner_id': self.owner_id,
+            'title': self.title,
+            'version': self.version,
+            'length': self.length,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat()
+        }
+
+class DocumentMember(db.Model):
+    __tablename__ = 'document_members'
+    
+    document_id = db.Column(db.Integer, db.ForeignKey('documents.id', ondelete='CASCADE'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True, index=True)
+    added_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class DocumentOperation(db.Model):
+    __tablename__ = 'document_operations'
+    
+    # Append-only; the (document_id, version) key serializes concurrent writers
+    document_id = db.Column(db.Integer, db.ForeignKey('documents.id', ondelete='CASCADE'), primary_key=True)
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    operation = db.Column(db.Text, nullable=False)  # JSON, see app/ot.py
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+class DocumentSnapshot(db.Model):
+    __tablename__ = 'document_snapshots'
+    
+    # Full content at a version; reads start from the latest and replay the op tail
+    document_id = db.Column(db.Integer, db.ForeignKey('documents.id', ondelete='CASCADE'), primary_key=True)
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    content = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+class UserSession(db.Model):
+    __tablename__ = 'sessions'
+    
+    # One row per signed-in device; the id is the token's sid claim
+    id = db.Column(db.String(36), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    device = db.Column(db.String(255), nullable=True)  # User-Agent at sign-in
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    last_seen_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)  # Written behind, see app/sessions.py
+    revoked_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'device': self.device,
+            'created_at': self.created_at.isoformat(),
+            'last_seen_at': self.last_seen_at.isoformat()
+        }
@@ -0,0 +1,180 @@
+"""Operational transformation for plain-text documents.
+
+An operation is a JSON list of components applied left to right over the
+whole document (the ot.js format):
+
+    positive int  retain that many characters
+    string        insert it
+    negative int  delete that many characters
+
+e.g. [5, "abc", -2, 10] keeps 5 characters, inserts "abc", deletes 2 and
+keeps the last 10 of a 17-character document. Lengths count Unicode
+code points.
+"""
+
+
+class OperationError(ValueError):
+    pass
+
+
+def _push(op, component):
+    """Append component to op, merging it with the last one where possible."""
+    if component == 0 or component == '':
+        return
+    if op:
+        last = op[-1]
+        if isinstance(component, str):
+            if isinstance(last, str):
+                op[-1] = last + component
+                return
+            # Keep inserts ahead of an adjacent delete so equal ops look equal
+            if isinstance(last, int) and last < 0:
+                if len(op) > 1 and isinstance(op[-2], str):
+                    op[-2] = op[-2] + component
+                else:
+                    op.insert(len(op) - 1, component)
+                return
+        elif isinstance(last, int) and (last > 0) == (component > 0):
+            op[-1] = last + component
+            return
+    op.append(component)
+
+
+def validate(op):
+    """Return op normalized, or raise OperationError if it is malformed."""
+    if not isinstance(op, list):
+        raise OperationError('Operation must be a list')
+    normalized = []
+    for component in op:
+        if isinstance(component, bool) or not isinstance(component, (int, str)):
+            raise OperationError('Operation components must be integers or strings')
+        _push(normalized, component)
+    return normalized
+
+
+def base_length(op):
+    """Length of the document op applies to."""
+    return sum(abs(c) for c in op if isinstance(c, int))
+
+
+def target_length(op):
+    """Length of the document after op."""
+    return sum(c if isinstance(c, int) and c > 0 else len(c) if isinstance(c, str) else 0 for c in op)
+
+
+def apply(text, op):
+    if len(text) != base_length(op):
+        raise OperationError(f'Operation expects length {base_length(op)}, document has {len(text)}')
+    parts, index = [], 0
+    for component in op:
+        if isinstance(component, str):
+            parts.append(component)
+        elif component > 0:
+            parts.append(text[index:index + component])
+            index += component
+        else:
+            index -= component
+    return ''.join(parts)
+
+
+def compose(a, b):
+    """One operation with the effect of a followed by b."""
+    if target_length(a) != base_length(b):
+        raise OperationError('Operations cannot be composed: lengths differ')
+    result = []
+    a, b = list(a), list(b)
+    i = j = 0
+    ca = a[0] if a else None
+    cb = b[0] if b else None
+    while ca is not None or cb is not None:
+        if isinstance(ca, int) and ca < 0:
+            _push(result, ca)
+            i += 1
+            ca = a[i] if i < len(a) else None
+            continue
+        if isinstance(cb, str):
+            _push(result, cb)
+            j += 1
+            cb = b[j] if j < len(b) else None
+            continue
+        if ca is None or cb is None:
+            raise OperationError('Operations cannot be composed: lengths differ')
+
+        if isinstance(ca, int) and isinstance(cb, int) and cb > 0:  # retain / retain
+            n = min(ca, cb)
+            _push(result, n)
+            ca, cb = ca - n, cb - n
+        elif isinstance(ca, int):  # retain / delete
+            n = min(ca, -cb)
+            _push(result, -n)
+            ca, cb = ca - n, cb + n
+        elif cb > 0:  # insert / retain
+            n = min(len(ca), cb)
+            _push(result, ca[:n])
+            ca, cb = ca[n:], cb - n
+        else:  # insert / delete: the insert never reaches the result
+            n = min(len(ca), -cb)
+            ca, cb = ca[n:], cb + n
+
+        if ca == 0 or ca == '':
+            i += 1
+            ca = a[i] if i < len(a) else None
+        if cb == 0:
+            j += 1
+            cb = b[j] if j < len(b) else None
+    return result
+
+
+def transform(a, b):
+    """Rebase two concurrent operations over each other.
+
+    Returns (a', b') with apply(apply(s, a), b') == apply(apply(s, b), a').
+    When both insert at the same position, a's text ends up first.
+    """
+    if base_length(a) != base_length(b):
+        raise OperationError('Concurrent operations must apply to the same document')
+    a_prime, b_prime = [], []
+    a, b = list(a), list(b)
+    i = j = 0
+    ca = a[0] if a else None
+    cb = b[0] if b else None
+    while ca is not None or cb is not None:
+        if isinstance(ca, str):
+            _push(a_prime, ca)
+            _push(b_prime, len(ca))
+            i += 1
+            ca = a[i] if i < len(a) else None
+            continue
+        if isinstance(cb, str):
+            _push(a_prime, len(cb))
+            _push(b_prime, cb)
+            j += 1
+            cb = b[j] if j < len(b) else None
+            continue
+        if ca is None or cb is None:
+            raise OperationError('Concurrent operations must apply to the same document')
+
+        if ca > 0 and cb > 0:  # retain / retain
+            n = min(ca, cb)
+            _push(a_prime, n)
+            _push(b_prime, n)
+            ca, cb = ca - n, cb - n
+        elif ca < 0 and cb < 0:  # both deleted the same text
+            n = min(-ca, -cb)
+            ca, cb = ca + n, cb + n
+        elif ca < 0:  # delete / retain
+            n = min(-ca, cb)
+            _push(a_prime, -n)
+            ca, cb = ca + n, cb - n
+        else:  # retain / delete
+            n = min(ca, -cb)
+            _push(b_prime, -n)
+            ca, cb = ca - n, cb + n
+
+        if ca == 0:
+            i += 1
+            ca = a[i] if i < len(a) else None
+        if cb == 0:
+            j += 1
+            cb = b[j] if j < len(b) else None
+    return a_prime, b_prime
@@ -0,0 +1,115 @@
+import os
+import time
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import bcrypt as _bcrypt
+from flask import current_app
+from .metrics import PASSWORD_HASH_TIME
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many password operations are already queued."""
+
+    def __init__(self, retry_after):
+        super().__init__('Password hasher is busy')
+        self.retry_after = retry_after
+
+
+def _hash(password, rounds):
+    return _bcrypt.hashpw(password.encode('utf-8'), _bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def _check(password, password_hash):
+    return _bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
+
+
+class PasswordHasher:
+    """Runs bcrypt on a bounded process pool instead of the request thread.
+
+    At most BCRYPT_MAX_PENDING operations may be queued or running per worker
+    process; beyond that callers get PasswordHasherBusy so the route can shed
+    load with a 503 instead of pinning the worker. BCRYPT_WORKERS=0 hashes
+    inline, which is handy for local development.
+    """
+
+    def __init__(self, app=None):
+        self.workers = 0
+        self.max_pending = 0
+        self.retry_after = 1
+        self.rejected = 0
+        self._pending = 0
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.workers = app.config.get('BCRYPT_WORKERS', 0)
+        self.max_pending = app.config.get('BCRYPT_MAX_PENDING', 16)
+        self.retry_after = app.config.get('BCRYPT_RETRY_AFTER', 1)
+        self._pid = None
+        app.extensions['password_hasher'] = self
+
+    @property
+    def pool(self):
+        # Process pools can't cross a fork, so each gunicorn worker builds its own
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    context = multiprocessing.get_context('forkserver' if os.name == 'posix' else 'spawn')
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+                    self._pid = os.getpid()
+        return self._pool
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise PasswordHasherBusy(self.retry_after)
+            self._pending += 1
+        try:
+            return self.pool.submit(fn, *args).result()
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _timed(self, operation, fn, *args):
+        start = time.perf_counter()
+        try:
+            return self._run(fn, *args)
+        finally:
+            PASSWORD_HASH_TIME.labels(operation).observe(time.perf_counter() - start)
+
+    def hash(self, password):
+        return self._timed('hash', _hash, password, current_app.config.get('BCRYPT_LOG_ROUNDS', 12))
+
+    def check(self, password, password_hash):
+        return self._timed('check', _check, password, password_hash)
+
+    def needs_rehash(self, password_hash):
+        """True if the hash was made with a different work factor than configured."""
+        try:
+            rounds = int(password_hash.split('$')[2])
+        except (IndexError, ValueError):
+            return True
+        return rounds != current_app.config.get('BCRYPT_LOG_ROUNDS', 12)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'pending': self._pending,
+                'max_pending': self.max_pending,
+                'rejected': self.rejected
+            }
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,155 @@
+import os
+import sys
+import hmac
+import time
+import random
+import logging
+from collections import Counter
+from flask import request, g
+
+try:
+    import gevent
+    from gevent import monkey
+except ImportError:
+    gevent = None
+
+logger = logging.getLogger(__name__)
+
+# The sampler must be a real OS thread: under gunicorn's gevent worker a
+# patched thread is a greenlet that only runs when the request yields
+if gevent is not None:
+    start_new_thread, allocate_lock, get_ident = monkey.get_original(
+        '_thread', ['start_new_thread', 'allocate_lock', 'get_ident'])
+    sleep = monkey.get_original('time', 'sleep')
+else:
+    from _thread import start_new_thread, allocate_lock, get_ident
+    from time import sleep
+
+
+class StackSampler:
+    """Samples the current request's Python stack at a fixed interval.
+
+    Under gevent the request is a greenlet sharing its OS thread with
+    others: while it runs, its stack is that thread's frame; while it is
+    switched out (waiting on I/O), it is the greenlet's gr_frame.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.stacks = Counter()
+        self.thread_id = get_ident()
+        patched = gevent is not None and monkey.is_module_patched('threading')
+        self.greenlet = gevent.getcurrent() if patched else None
+        self._lock = allocate_lock()
+        self._running = False
+
+    def _frame(self):
+        if self.greenlet is not None and self.greenlet.gr_frame is not None:
+            return self.greenlet.gr_frame
+        return sys._current_frames().get(self.thread_id)
+
+    def _run(self):
+        while True:
+            sleep(self.interval)
+            with self._lock:
+                if not self._running:
+                    return
+                frame = self._frame()
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                    frame = frame.f_back
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._running = True
+        start_new_thread(self._run, ())
+
+    def stop(self):
+        """Stop sampling; the thread exits on its next wake-up without taking more samples."""
+        with self._lock:
+            self._running = False
+
+
+class RequestProfiler:
+    """Statistical profiler for a sample of requests.
+
+    Profiles PROFILER_SAMPLE_RATE of requests, plus any request whose
+    X-Profile header carries PROFILER_TOKEN, and writes collapsed stacks
+    (flamegraph.pl / speedscope input) to PROFILER_DIR. With neither
+    configured no hooks are installed, so it costs nothing.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.sample_rate = app.config.get('PROFILER_SAMPLE_RATE', 0.0)
+        self.token = app.config.get('PROFILER_TOKEN')
+        self.interval = app.config.get('PROFILER_INTERVAL', 0.005)
+        self.directory = app.config.get('PROFILER_DIR')
+        self.max_files = app.config.get('PROFILER_MAX_FILES', 200)
+        if not self.sample_rate and not self.token:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._discard)
+        app.extensions['profiler'] = self
+
+    def _wanted(self):
+        header = request.headers.get('X-Profile')
+        if header and self.token and hmac.compare_digest(header.encode(), self.token.encode()):
+            return True
+        return random.random() < self.sample_rate
+
+    def _start(self):
+        if not self._wanted():
+            return
+        g.profiler = StackSampler(self.interval)
+        g.profiler_start = time.perf_counter()
+        g.profiler.start()
+
+    def _finish(self, response):
+        sampler = g.pop('profiler', None)
+        if sampler is None:
+            return response
+
+        sampler.stop()
+        duration_ms = int((time.perf_counter() - g.profiler_start) * 1000)
+        endpoint = (request.endpoint or 'unmatched').replace('.', '-')
+        name = f'{time.strftime("%Y%m%dT%H%M%S")}_{os.getpid()}_{endpoint}_{duration_ms}ms.folded'
+        try:
+            with open(os.path.join(self.directory, name), 'w') as f:
+                for stack, count in sampler.stacks.items():
+                    f.write(f'{stack} {count}\n')
+            self._rotate()
+            response.headers['X-Profile-Id'] = name
+        except OSError as e:
+            logger.warning(f"Could not write profile {name}: {str(e)}")
+        return response
+
+    def _discard(self, exc):
+        # after_request is skipped when a view raises; don't leak the sampler
+        sampler = g.pop('profiler', None)
+        if sampler is not None:
+            sampler.stop()
+
+    def _rotate(self):
+        files = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith('.folded')),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        for entry in files[:max(len(files) - self.max_files, 0)]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+
+profiler = RequestProfiler()
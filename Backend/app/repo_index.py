@@ -0,0 +1,114 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.dialects import postgresql, sqlite
+from .models import db, RepositoryIndex, release_db_connection
+from .github_client import github_client
+
+logger = logging.getLogger(__name__)
+
+
+def remember_repositories(repos):
+    """Record repo id -> full_name for every repo in a GitHub listing.
+
+    One upsert for the whole listing, so concurrent listings of the same
+    repos (pagers, prefetch, several workers) all apply instead of losing
+    their batch to a duplicate-key error.
+    """
+    if not repos:
+        return
+
+    now = datetime.utcnow()
+    by_id = {repo['id']: repo for repo in repos}
+    # Rows in key order, so overlapping upserts lock them in the same order
+    rows = [{'repo_id': repo_id, 'name': repo['name'], 'full_name': repo['full_name'], 'updated_at': now}
+            for repo_id, repo in sorted(by_id.items())]
+    table = RepositoryIndex.__table__
+    try:
+        dialect = db.engine.dialect.name
+        if dialect in ('postgresql', 'sqlite'):
+            insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+            statement = insert(table)
+            statement = statement.on_conflict_do_update(index_elements=[table.c.repo_id], set_={
+                'name': statement.excluded.name,
+                'full_name': statement.excluded.full_name,
+                'updated_at': statement.excluded.updated_at
+            })
+            db.session.execute(statement, rows)
+        else:
+            existing = RepositoryIndex.query.filter(RepositoryIndex.repo_id.in_(list(by_id))).all()
+            for entry in existing:
+                repo = by_id.pop(entry.repo_id)
+                entry.name = repo['name']
+                entry.full_name = repo['full_name']
+                entry.updated_at = now
+            db.session.add_all(RepositoryIndex(repo_id=repo_id, name=repo['name'], full_name=repo['full_name'],
+                                               updated_at=now) for repo_id, repo in by_id.items())
+        db.session.commit()
+    except SQLAlchemyError as e:
+        # e.g. a concurrent writer on a database without upserts; the next listing retries
+        db.session.rollback()
+        logger.warning(f"Repository index update skipped: {e.__class__.__name__}")
+
+
+def delivered_at(repository):
+    """Epoch of the repo's last webhook delivery, for GitHubClient.get(fresh_after=)."""
+    hooked_at = repository.hooked_at
+    return hooked_at.replace(tzinfo=timezone.utc).timestamp() if hooked_at else None
+
+
+def resolve_repository(token, repo_id, refresh=False):
+    """Return the indexed repository, looking it up on GitHub on a miss."""
+    entry = None if refresh else db.session.get(RepositoryIndex, repo_id)
+    ttl = timedelta(seconds=current_app.config.get('REPO_INDEX_TTL', 86400))
+    if entry is not None and entry.updated_at + ttl > datetime.utcnow():
+        return entry
+
+    release_db_connection()
+    response = github_client.get(f'/repositories/{repo_id}', token)
+    if response.status_code != 200:
+        return None
+
+    repo = response.json()
+    remember_repositories([repo])
+    # Fall back to an unsaved entry if a concurrent writer won the insert race
+    return db.session.get(RepositoryIndex, repo_id) or RepositoryIndex(
+        repo_id=repo['id'], name=repo['name'], full_name=repo['full_name']
+    )
+
+
+def get_repository_resource(token, repo_id, resource, params=None):
+    """GET /repos/{full_name}/{resource} for a repo id.
+
+    Returns (repository, response), or (None, None) if the repo can't be
+    resolved. A 404 or 301 from the indexed name may mean the repo was
+    renamed or moved, so it is looked up by id: if that finds a new name
+    the index entry is updated and the call retried once. A token that
+    can't see the repo gets a 404 either way, so that alone never changes
+    the shared index entry.
+    """
+    repository = resolve_repository(token, repo_id)
+    if repository is None:
+        return None, None
+
+    release_db_connection()
+    # Cached bodies from before the last webhook describe the repo before the push
+    response = github_client.get(f'/repos/{repository.full_name}/{resource}', token, params=params,
+                                 allow_redirects=False, fresh_after=delivered_at(repository))
+    if response.status_code in (301, 404):
+        lookup = github_client.get(f'/repositories/{repo_id}', token)
+        if lookup.status_code != 200:
+            return None, None
+        repo = lookup.json()
+        if repo['full_name'] == repository.full_name:
+            return repository, response
+        logger.info(f"Repository {repo_id} moved from {repository.full_name} to {repo['full_name']}, refreshing index")
+        remember_repositories([repo])
+        repository = db.session.get(RepositoryIndex, repo_id) or RepositoryIndex(
+            repo_id=repo['id'], name=repo['name'], full_name=repo['full_name']
+        )
+        response = github_client.get(f'/repos/{repository.full_name}/{resource}', token, params=params,
+                                     fresh_after=delivered_at(repository))
+
+    return repository, response
@@ -0,0 +1,235 @@
+import re
+import time
+import heapq
+import bisect
+import threading
+from collections import OrderedDict
+
+# Field weights: a hit in the name outranks the same hit in a description
+SEARCH_FIELDS = (('name', 4.0), ('full_name', 2.0), ('language', 1.5), ('description', 1.0))
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or '').lower())
+
+
+def trigrams(token):
+    """Trigrams of a token, padded at the start so a word's first letters count too."""
+    padded = '^' + token
+    if len(padded) < 3:
+        return {padded}
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def within_one_edit(a, b):
+    """True if b is a with one character inserted, dropped, changed or two swapped."""
+    if abs(len(a) - len(b)) > 1 or a == b:
+        return a == b
+    i = 0
+    while i < min(len(a), len(b)) and a[i] == b[i]:
+        i += 1
+    if len(a) == len(b):
+        swapped = i + 1 < len(a) and a[i] == b[i + 1] and a[i + 1] == b[i]
+        return a[i + 1:] == b[i + 1:] or (swapped and a[i + 2:] == b[i + 2:])
+    longer, shorter = (a, b) if len(a) > len(b) else (b, a)
+    return longer[i + 1:] == shorter[i:]
+
+
+class RepositoryIndex:
+    """Trigram and prefix index over one user's repository listing.
+
+    Built once from the formatted listing and only read afterwards, apart
+    from a small memo of per-word matches. Trigrams index the vocabulary, not the repositories:
+    a query word is matched against the (much smaller) set of distinct
+    words, then postings map each matching word to {doc: field weight}.
+    """
+
+    def __init__(self, repositories):
+        self.repositories = repositories
+        # Names with separators dropped, and their trigrams, for reordering the best candidates
+        self.names = [''.join(tokenize(repo.get('name'))) for repo in repositories]
+        self.name_grams = [trigrams(name) for name in self.names]
+        self.stars = [repo.get('stargazers_count') or 0 for repo in repositories]
+        self.postings = {}
+        for doc, repo in enumerate(repositories):
+            for field, weight in SEARCH_FIELDS:
+                for token in tokenize(repo.get(field)):
+                    posting = self.postings.setdefault(token, {})
+                    if posting.get(doc, 0) < weight:
+                        posting[doc] = weight
+        self.grams = {}
+        self.shapes = {}
+        for token in self.postings:
+            for gram in trigrams(token):
+                self.grams.setdefault(gram, []).append(token)
+            self.shapes.setdefault((token[0], len(token)), []).append(token)
+        self.vocabulary = sorted(self.postings)
+        self._matches = {}
+        self.built_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.repositories)
+
+    def _words(self, token, min_similarity):
+        """{word: similarity} for indexed words that start with or resemble token."""
+        matches = {}
+        start = bisect.bisect_left(self.vocabulary, token)
+        for word in self.vocabulary[start:]:
+            if not word.startswith(token):
+                break
+            matches[word] = 1.0 if word == token else 0.9
+        if len(token) > 2:
+            query_grams = trigrams(token)
+            shared = {}
+            for gram in query_grams:
+                for word in self.grams.get(gram, ()):
+                    shared[word] = shared.get(word, 0) + 1
+            for word, count in shared.items():
+                score = count / max(len(query_grams), len(word) - 1)
+                if word not in matches and score >= min_similarity:
+                    matches[word] = score * 0.8
+        if len(token) > 3:
+            # A swapped letter in a short word breaks most of its trigrams
+            for length in (len(token) - 1, len(token), len(token) + 1):
+                for word in self.shapes.get((token[0], length), ()):
+                    if word not in matches and within_one_edit(token, word):
+                        matches[word] = 0.6
+        return matches
+
+    def _match(self, token, min_similarity):
+        """{doc: score} for one query word; memoized, as typing repeats words."""
+        key = (token, min_similarity)
+        scores = self._matches.get(key)
+        if scores is None:
+            scores = {}
+            for word, score in self._words(token, min_similarity).items():
+                for doc, weight in self.postings[word].items():
+                    value = score * weight
+                    if scores.get(doc, 0) < value:
+                        scores[doc] = value
+            if len(self._matches) >= 256:
+                self._matches.clear()
+            self._matches[key] = scores
+        return scores
+
+    def search(self, query, limit=20, min_similarity=0.4):
+        """Repositories matching every word of query, best first.
+
+        A word matches indexed words it prefixes or shares at least
+        min_similarity of its trigrams with, so partial words and typos
+        still hit; a hit counts more in the name than in the description.
+        The best candidates are then reordered by how closely the whole
+        query resembles the name, and stars break ties.
+        """
+        query_tokens = tokenize(query)
+        if not query_tokens:
+            return []
+
+        per_token = sorted((self._match(token, min_similarity) for token in dict.fromkeys(query_tokens)), key=len)
+        scores = per_token[0]
+        if len(per_token) > 1:
+            scores = {}
+            for doc, score in per_token[0].items():
+                for other in per_token[1:]:
+                    value = other.get(doc)
+                    if value is None:
+                        break
+                    score += value
+                else:
+                    scores[doc] = score
+
+        candidates = heapq.nlargest(max(limit * 3, 50), scores, key=scores.__getitem__)
+        phrase = ''.join(query_tokens)
+        phrase_grams = trigrams(phrase)
+        ranked = []
+        for doc in candidates:
+            grams = self.name_grams[doc]
+            if self.names[doc] == phrase:
+                closeness = 2.0
+            else:
+                closeness = len(phrase_grams & grams) / max(len(phrase_grams), len(grams))
+            ranked.append((scores[doc] + 4 * closeness * len(query_tokens), self.stars[doc], doc))
+        ranked.sort(reverse=True)
+        return [self.repositories[doc] for _, _, doc in ranked[:limit]]
+
+
+class RepoSearch:
+    """Per-user repository indexes, LRU-bounded across users.
+
+    Each worker keeps at most REPO_SEARCH_MAX_USERS indexes holding at most
+    REPO_SEARCH_MAX_REPOS repositories in total; the least recently
+    searched are dropped first. An index is rebuilt from a fresh listing
+    after REPO_SEARCH_TTL seconds.
+    """
+
+    def __init__(self, app=None):
+        self.ttl = 300
+        self.max_users = 200
+        self.max_repos = 200000
+        self._indexes = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'builds': 0, 'evictions': 0, 'build_time': 0.0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = app.config.get('REPO_SEARCH_TTL', self.ttl)
+        self.max_users = app.config.get('REPO_SEARCH_MAX_USERS', self.max_users)
+        self.max_repos = app.config.get('REPO_SEARCH_MAX_REPOS', self.max_repos)
+        with self._lock:
+            self._indexes.clear()
+            self._size = 0
+            self._stats = {'hits': 0, 'misses': 0, 'builds': 0, 'evictions': 0, 'build_time': 0.0}
+        app.extensions['repo_search'] = self
+
+    def get(self, user_id):
+        """The user's index if it is still fresh, else None."""
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is not None and index.built_at + self.ttl > time.monotonic():
+                self._indexes.move_to_end(user_id)
+                self._stats['hits'] += 1
+                return index
+            self._stats['misses'] += 1
+            return None
+
+    def build(self, user_id, repositories):
+        """Index a formatted listing for user_id and keep it; returns the index."""
+        start = time.perf_counter()
+        index = RepositoryIndex(repositories)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            old = self._indexes.pop(user_id, None)
+            if old is not None:
+                self._size -= len(old)
+            self._indexes[user_id] = index
+            self._size += len(index)
+            while len(self._indexes) > 1 and (len(self._indexes) > self.max_users or self._size > self.max_repos):
+                _, evicted = self._indexes.popitem(last=False)
+                self._size -= len(evicted)
+                self._stats['evictions'] += 1
+            self._stats['builds'] += 1
+            self._stats['build_time'] += elapsed
+        return index
+
+    def invalidate(self, user_id):
+        with self._lock:
+            index = self._indexes.pop(user_id, None)
+            if index is not None:
+                self._size -= len(index)
+
+    def clear(self):
+        """Drop every index, e.g. when a webhook says listings changed."""
+        with self._lock:
+            self._indexes.clear()
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, 'build_time': round(self._stats['build_time'], 3),
+                    'users': len(self._indexes), 'repositories': self._size}
+
+
+repo_search = RepoSearch()
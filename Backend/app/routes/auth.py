@@ -2,11 +2,17 @@ import jwt
 import datetime
 import os
 import requests
-import uuid
 import logging
 from functools import wraps
-from flask import Blueprint, request, jsonify, make_response
+from flask import Blueprint, request, jsonify, make_response, current_app, g
 from ..models import db, User
+from ..session_cache import session_cache
+from ..sessions import open_session, session_active, active_sessions, revoke_sessions, session_tracker
+from ..jobs import jobs
+from ..passwords import PasswordHasherBusy
+from ..metrics import record_upstream
+from ..http_cache import etagged
+from ..csrf import csrf
 from email_validator import validate_email, EmailNotValidError
 
 auth_bp = Blueprint('auth', __name__)
@@ -22,6 +28,19 @@ GITHUB_CLIENT_ID = os.getenv('GITHUB_CLIENT_ID')
 GITHUB_CLIENT_SECRET = os.getenv('GITHUB_CLIENT_SECRET')
 GITHUB_REDIRECT_URI = os.getenv('GITHUB_REDIRECT_URI', 'https://collabvoice.vercel.app/auth/github/callback')
 
+# Provider endpoints; overridable so benchmarks can point them at local stubs
+GOOGLE_TOKEN_URL = os.getenv('GOOGLE_TOKEN_URL', 'https://oauth2.googleapis.com/token')
+GOOGLE_USERINFO_URL = os.getenv('GOOGLE_USERINFO_URL', 'https://www.googleapis.com/oauth2/v3/userinfo')
+GITHUB_OAUTH_URL = os.getenv('GITHUB_OAUTH_URL', 'https://github.com').rstrip('/')
+GITHUB_API_URL = os.getenv('GITHUB_API_URL', 'https://api.github.com').rstrip('/')
+
+# Deliverability checks cost a DNS lookup per registration
+EMAIL_CHECK_DELIVERABILITY = os.getenv('EMAIL_CHECK_DELIVERABILITY', 'true').lower() == 'true'
+
+# Keep-alive session for the OAuth providers, timed by the metrics hook
+oauth_session = requests.Session()
+oauth_session.hooks['response'].append(record_upstream)
+
 def generate_token(user_id, session_id):
     payload = {
         'exp': datetime.datetime.utcnow() + datetime.timedelta(days=7),
@@ -31,6 +50,55 @@ def generate_token(user_id, session_id):
     }
     return jwt.encode(payload, SECRET_KEY, algorithm='HS256')
 
+def busy_response(e):
+    response = make_response(jsonify({'error': 'Server is busy, please retry shortly'}), 503)
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+class AuthError(Exception):
+    pass
+
+def authenticate(token):
+    """Return the user for a valid session token, or raise AuthError.
+
+    Shared by token_required and the collaboration WebSocket, which
+    re-checks its token periodically for the life of the connection.
+    The session id is left in g.session_id.
+    """
+    try:
+        data = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
+    except jwt.ExpiredSignatureError:
+        raise AuthError('Token has expired')
+    except Exception:
+        raise AuthError('Token is invalid')
+
+    user_id, session_id = data['sub'], data.get('sid')
+    try:
+        # Sessions verified recently skip the users and sessions lookups entirely
+        current_user = session_cache.get(user_id, session_id)
+        
+        if current_user is None:
+            # Read before the DB check so a revocation racing it leaves the entry stale
+            version = session_cache.version(user_id)
+            current_user = db.session.get(User, user_id)
+            
+            if not current_user:
+                raise AuthError('User not found')
+                
+            # Session check: the token's session must exist and not be revoked
+            if not session_active(user_id, session_id):
+                raise AuthError('Session expired or signed out')
+            
+            session_cache.put(current_user, session_id, version)
+    except AuthError:
+        raise
+    except Exception:
+        raise AuthError('Token is invalid')
+    # last_seen_at is written behind in batches, not per request
+    session_tracker.touch(session_id)
+    g.session_id = session_id
+    return current_user
+
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
@@ -44,24 +112,21 @@ def token_required(f):
             return jsonify({'error': 'Token is missing'}), 401
             
         try:
-            data = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-            current_user = User.query.get(data['sub'])
-            
-            if not current_user:
-                return jsonify({'error': 'User not found'}), 401
-                
-            # Session check: Verify if the session ID in the token matches the current one in DB
-            if current_user.current_session_id != data.get('sid'):
-                return jsonify({'error': 'Session expired. Another login detected.'}), 401
-                
-        except jwt.ExpiredSignatureError:
-            return jsonify({'error': 'Token has expired'}), 401
-        except Exception:
-            return jsonify({'error': 'Token is invalid'}), 401
+            current_user = authenticate(token)
+        except AuthError as e:
+            return jsonify({'error': str(e)}), 401
             
         return f(current_user, *args, **kwargs)
     return decorated
 
+# Every mutating auth route needs the double-submit token from /csrf-token
+auth_bp.before_request(csrf.protect)
+
+@auth_bp.route('/csrf-token', methods=['GET'])
+def csrf_token():
+    """Issue the CSRF token; cacheable, so clients fetch it once per session"""
+    return csrf.token_response()
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     try:
@@ -76,7 +141,7 @@ def register():
             return jsonify({'error': 'Missing required fields'}), 400
             
         try:
-            validate_email(email)
+            validate_email(email, check_deliverability=EMAIL_CHECK_DELIVERABILITY)
         except EmailNotValidError:
             return jsonify({'error': 'Invalid email format'}), 400
             
@@ -89,11 +154,8 @@ def register():
         new_user = User(username=username, email=email)
         new_user.set_password(password)
         
-        # Generate new session ID
-        session_id = str(uuid.uuid4())
-        new_user.current_session_id = session_id
-        
         db.session.add(new_user)
+        session_id = open_session(new_user, request.headers.get('User-Agent'))
         db.session.commit()
         
         token = generate_token(new_user.id, session_id)
@@ -112,6 +174,10 @@ def register():
             secure=True
         )
         return response, 201
+    except PasswordHasherBusy as e:
+        db.session.rollback()
+        logger.warning("Registration shed: password hasher busy")
+        return busy_response(e)
     except Exception as e:
         logger.error(f"Registration error: {str(e)}")
         return jsonify({'error': 'Registration failed', 'details': str(e)}), 500
@@ -138,9 +204,12 @@ def login():
         if not user.check_password(password):
             return jsonify({'error': 'Invalid credentials'}), 401
             
-        # Generate new session ID and invalidate previous ones
-        session_id = str(uuid.uuid4())
-        user.current_session_id = session_id
+        # Transparently upgrade hashes made with an old work factor
+        if user.password_needs_rehash():
+            user.set_password(password)
+            
+        # New session for this device; the user's other devices stay signed in
+        session_id = open_session(user, request.headers.get('User-Agent'))
         db.session.commit()
         
         token = generate_token(user.id, session_id)
@@ -153,6 +222,10 @@ def login():
         
         response.set_cookie('auth_token', token, httponly=True, samesite='None', secure=True)
         return response, 200
+    except PasswordHasherBusy as e:
+        db.session.rollback()
+        logger.warning("Login shed: password hasher busy")
+        return busy_response(e)
     except Exception as e:
         logger.error(f"Login error: {str(e)}")
         return jsonify({'error': 'Login failed', 'details': str(e)}), 500
@@ -173,7 +246,7 @@ def google_oauth():
             return jsonify({'error': 'OAuth not configured on server'}), 500
             
         # Exchange code for tokens
-        token_url = 'https://oauth2.googleapis.com/token'
+        token_url = GOOGLE_TOKEN_URL
         token_data = {
             'code': code,
             'client_id': GOOGLE_CLIENT_ID,
@@ -183,7 +256,7 @@ def google_oauth():
         }
         
         logger.info(f"Exchanging code with redirect_uri: {GOOGLE_REDIRECT_URI}")
-        token_response = requests.post(token_url, data=token_data)
+        token_response = oauth_session.post(token_url, data=token_data)
         token_json = token_response.json()
         
         if 'error' in token_json:
@@ -193,8 +266,8 @@ def google_oauth():
         access_token = token_json.get('access_token')
         
         # Get user info
-        user_info_url = 'https://www.googleapis.com/oauth2/v3/userinfo'
-        user_info_response = requests.get(user_info_url, headers={'Authorization': f'Bearer {access_token}'})
+        user_info_url = GOOGLE_USERINFO_URL
+        user_info_response = oauth_session.get(user_info_url, headers={'Authorization': f'Bearer {access_token}'})
         user_info = user_info_response.json()
         
         logger.info(f"Google user info received for: {user_info.get('email')}")
@@ -231,10 +304,11 @@ def google_oauth():
             user.avatar_url = picture
             logger.info(f"Updated existing user via Google OAuth: {email}")
             
-        # Generate new session ID
-        session_id = str(uuid.uuid4())
-        user.current_session_id = session_id
+        # New session for this device; the user's other devices stay signed in
+        session_id = open_session(user, request.headers.get('User-Agent'))
         db.session.commit()
+        # Drop cached snapshots holding the old profile/token
+        session_cache.invalidate(user.id)
         
         token = generate_token(user.id, session_id)
         
@@ -266,7 +340,7 @@ def github_oauth():
             return jsonify({'error': 'OAuth not configured on server'}), 500
             
         # Exchange code for tokens
-        token_url = 'https://github.com/login/oauth/access_token'
+        token_url = f'{GITHUB_OAUTH_URL}/login/oauth/access_token'
         token_headers = {'Accept': 'application/json'}
         token_data = {
             'code': code,
@@ -277,7 +351,7 @@ def github_oauth():
         }
         
         logger.info(f"Exchanging code with redirect_uri: {GITHUB_REDIRECT_URI}")
-        token_response = requests.post(token_url, headers=token_headers, data=token_data)
+        token_response = oauth_session.post(token_url, headers=token_headers, data=token_data)
         token_json = token_response.json()
         
         if 'error' in token_json:
@@ -287,12 +361,12 @@ def github_oauth():
         access_token = token_json.get('access_token')
         
         # Get user info
-        user_url = 'https://api.github.com/user'
+        user_url = f'{GITHUB_API_URL}/user'
         user_headers = {
             'Authorization': f'token {access_token}',
             'Accept': 'application/json'
         }
-        user_response = requests.get(user_url, headers=user_headers)
+        user_response = oauth_session.get(user_url, headers=user_headers)
         user_info = user_response.json()
         
         github_id = str(user_info.get('id'))
@@ -300,8 +374,8 @@ def github_oauth():
         
         # GitHub email might be private, need to fetch emails if null
         if not email:
-            emails_url = 'https://api.github.com/user/emails'
-            emails_response = requests.get(emails_url, headers=user_headers)
+            emails_url = f'{GITHUB_API_URL}/user/emails'
+            emails_response = oauth_session.get(emails_url, headers=user_headers)
             emails_info = emails_response.json()
             primary_email = next((e['email'] for e in emails_info if e['primary']), None)
             email = primary_email or (emails_info[0]['email'] if emails_info else None)
@@ -334,10 +408,15 @@ def github_oauth():
             user.github_access_token = access_token  # Update the access token
             logger.info(f"Updated existing user via GitHub OAuth: {email}")
             
-        # Generate new session ID
-        session_id = str(uuid.uuid4())
-        user.current_session_id = session_id
+        # New session for this device; the user's other devices stay signed in
+        session_id = open_session(user, request.headers.get('User-Agent'))
         db.session.commit()
+        # Drop cached snapshots holding the old profile/token
+        session_cache.invalidate(user.id)
+        
+        # Warm the dashboard while the client is still redirecting
+        if current_app.config['GITHUB_PREFETCH_TTL']:
+            jobs.enqueue('github_prefetch', user.id)
         
         token = generate_token(user.id, session_id)
         
@@ -355,6 +434,7 @@ def github_oauth():
 
 @auth_bp.route('/verify', methods=['GET'])
 @token_required
+@etagged
 def verify_token(current_user):
     return jsonify({
         'message': 'Token is valid',
@@ -364,11 +444,9 @@ def verify_token(current_user):
 @auth_bp.route('/logout', methods=['POST'])
 @token_required
 def logout(current_user):
-    """Logout user and invalidate session"""
+    """Logout user and revoke this device's session"""
     try:
-        # Invalidate current session
-        current_user.current_session_id = None
-        db.session.commit()
+        revoke_sessions(current_user.id, [g.session_id])
         
         response = make_response(jsonify({
             'message': 'Logged out successfully'
@@ -378,29 +456,45 @@ def logout(current_user):
         response.set_cookie('auth_token', '', expires=0, httponly=True, samesite='None', secure=True)
         return response, 200
     except Exception as e:
+        db.session.rollback()
         logger.error(f"Logout error: {str(e)}")
         return jsonify({'error': 'Logout failed'}), 500
 
+@auth_bp.route('/sessions', methods=['GET'])
+@token_required
+def list_sessions(current_user):
+    """Signed-in devices, most recently active first"""
+    try:
+        sessions = [{**s.to_dict(), 'current': s.id == g.session_id} for s in active_sessions(current_user.id)]
+        return jsonify({'sessions': sessions}), 200
+    except Exception as e:
+        logger.error(f"List sessions error: {str(e)}")
+        return jsonify({'error': 'Failed to list sessions'}), 500
+
+@auth_bp.route('/sessions/<session_id>', methods=['DELETE'])
+@token_required
+def revoke_session(current_user, session_id):
+    """Sign out one of the user's devices"""
+    try:
+        if not revoke_sessions(current_user.id, [session_id]):
+            return jsonify({'error': 'Session not found'}), 404
+        return jsonify({'message': 'Session revoked', 'id': session_id}), 200
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Session revocation error: {str(e)}")
+        return jsonify({'error': 'Failed to revoke session'}), 500
+
 @auth_bp.route('/sessions/invalidate-others', methods=['POST'])
 @token_required
 def invalidate_other_sessions(current_user):
-    """Invalidate all other sessions for this user"""
+    """Revoke every session of this user except the current one"""
     try:
-        # Generate new session ID, invalidating all others
-        session_id = str(uuid.uuid4())
-        current_user.current_session_id = session_id
-        db.session.commit()
-        
-        # Generate new token
-        new_token = generate_token(current_user.id, session_id)
-        
-        response = make_response(jsonify({
+        revoked = revoke_sessions(current_user.id, keep=g.session_id)
+        return jsonify({
             'message': 'Other sessions invalidated',
-            'token': new_token
-        }))
-        
-        response.set_cookie('auth_token', new_token, httponly=True, samesite='None', secure=True)
-        return response, 200
+            'revoked': revoked
+        }), 200
     except Exception as e:
+        db.session.rollback()
         logger.error(f"Session invalidation error: {str(e)}")
         return jsonify({'error': 'Failed to invalidate sessions'}), 500
@@ -0,0 +1,166 @@
+import re
+import time
+import logging
+from flask import Blueprint, request, current_app
+from flask_sock import Sock, ConnectionClosed
+from ..models import release_db_connection
+from ..collab import collab, RoomClient
+from ..documents import room_allowed
+from .auth import authenticate, AuthError
+
+collab_bp = Blueprint('collab', __name__)
+sock = Sock()
+logger = logging.getLogger(__name__)
+
+DOC_ID_PATTERN = re.compile(r'^[A-Za-z0-9._:/-]{1,200}$')
+
+# Messages clients may send; cursor messages are coalesced per sender
+CLIENT_MESSAGES = ('edit', 'cursor', 'presence')
+
+# Close codes: 1008 policy violation, 1013 try again later, 4401 not authenticated,
+# 4408 idle, 4409 room full
+CLOSE_POLICY = 1008
+CLOSE_TOO_SLOW = 1013
+CLOSE_UNAUTHORIZED = 4401
+CLOSE_IDLE = 4408
+CLOSE_ROOM_FULL = 4409
+
+
+def close(ws, code, message):
+    try:
+        ws.close(code, message)
+    except (ConnectionClosed, OSError):  # already gone, or too slow to take the close frame
+        pass
+
+
+def bearer_token(ws):
+    """Token from the Authorization header, or from a first {"type": "auth"} message.
+
+    Browsers cannot set headers on a WebSocket handshake, and tokens in the
+    URL end up in access logs, so browser clients send the token first.
+    """
+    auth_header = request.headers.get('Authorization', '')
+    if auth_header.startswith('Bearer '):
+        return auth_header.split(' ')[1]
+
+    data = ws.receive(timeout=current_app.config['COLLAB_AUTH_TIMEOUT'])
+    try:
+        message = current_app.json.loads(data) if data else {}
+    except ValueError:
+        return None
+    if isinstance(message, dict) and message.get('type') == 'auth':
+        return message.get('token')
+    return None
+
+
+def handle_message(client, data):
+    """Stamp a client message with its sender and publish it to the room."""
+    try:
+        message = current_app.json.loads(data)
+    except ValueError:
+        message = None
+    if not isinstance(message, dict) or message.get('type') not in CLIENT_MESSAGES:
+        client.enqueue(current_app.json.dumps({'type': 'error', 'error': 'Unsupported message'}))
+        return
+
+    message['from'] = client.id
+    message['user_id'] = client.user['id']
+    message['ts'] = time.time()
+    collab.received()
+    collab.publish(client.doc_id, client.id, current_app.json.dumps(message),
+                   cursor=message['type'] == 'cursor')
+
+
+def authorize_room(ws, room, allowed_check=room_allowed):
+    """Authenticate the socket and check it may join room.
+
+    allowed_check(user_id, room) decides membership. Returns (user,
+    token), or None after closing the socket.
+    """
+    if not DOC_ID_PATTERN.match(room):
+        close(ws, CLOSE_POLICY, 'Invalid room id')
+        return None
+
+    token = bearer_token(ws)
+    try:
+        if not token:
+            raise AuthError('Token is missing')
+        user = authenticate(token)
+        allowed = allowed_check(user.id, room)
+    except AuthError as e:
+        close(ws, CLOSE_UNAUTHORIZED, str(e))
+        return None
+    finally:
+        # The connection may stay open for hours; don't pin a pooled DB connection
+        release_db_connection()
+    if not allowed:
+        close(ws, CLOSE_POLICY, 'Not a member of this document')
+        return None
+    return user, token
+
+
+def serve(ws, client, token, handle, on_tick=None, idle_timeout=None):
+    """Run a joined connection until it closes.
+
+    Feeds received messages to handle, runs on_tick and sends the client's
+    queued frame once per tick, closes idle (idle_timeout) and slow clients,
+    and re-checks the session every COLLAB_REAUTH_INTERVAL seconds.
+    """
+    reason = 'closed'
+    reauth_interval = current_app.config['COLLAB_REAUTH_INTERVAL']
+    now = time.monotonic()
+    next_flush, next_auth, last_seen = now + collab.tick, now + reauth_interval, now
+    try:
+        while True:
+            data = ws.receive(timeout=max(0, next_flush - time.monotonic()))
+            if data is not None:
+                last_seen = time.monotonic()
+                handle(client, data)
+
+            now = time.monotonic()
+            if now >= next_flush:
+                if on_tick is not None:
+                    on_tick(client)
+                if not collab.flush(client):
+                    reason = 'too_slow'
+                    close(ws, CLOSE_TOO_SLOW, 'Client too slow, reconnect and resync')
+                    break
+                next_flush = now + collab.tick
+
+            if idle_timeout and now - last_seen > idle_timeout:
+                reason = 'idle'
+                close(ws, CLOSE_IDLE, 'Idle timeout')
+                break
+
+            if now >= next_auth:
+                # Logging out or signing in elsewhere ends the connection too
+                try:
+                    authenticate(token)
+                except AuthError as e:
+                    reason = 'session_expired'
+                    close(ws, CLOSE_UNAUTHORIZED, str(e))
+                    break
+                finally:
+                    release_db_connection()
+                next_auth = now + reauth_interval
+    except ConnectionClosed:
+        pass
+    except Exception as e:
+        reason = 'error'
+        logger.error(f"Room connection error: {str(e)}")
+    finally:
+        collab.leave(client, reason)
+
+
+@sock.route('/ws/<path:doc_id>', bp=collab_bp)
+def collaborate(ws, doc_id):
+    """Join the room for doc_id and relay edits, cursors and presence."""
+    authorized = authorize_room(ws, doc_id)
+    if authorized is None:
+        return
+    user, token = authorized
+
+    client = RoomClient(ws, user, doc_id, collab.max_queue, collab.send_timeout)
+    members = collab.join(client)
+    ws.send(current_app.json.dumps([{'type': 'welcome', 'id': client.id, 'doc_id': doc_id, 'members': members}]))
+    serve(ws, client, token, handle_message)
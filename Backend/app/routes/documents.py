@@ -0,0 +1,164 @@
+import logging
+from flask import Blueprint, request, jsonify, current_app
+from ..models import db, User, DocumentMember
+from ..documents import (
+    DocumentConflict, member_document, member_documents, create_document, load_content,
+    operations_since, submit_operations, compact, needs_compaction, document_room
+)
+from ..ot import OperationError
+from ..collab import collab
+from ..jobs import jobs
+from .auth import token_required
+from ..http_cache import etagged
+
+documents_bp = Blueprint('documents', __name__)
+logger = logging.getLogger(__name__)
+
+def document_not_found():
+    return jsonify({'error': 'Document not found'}), 404
+
+@documents_bp.route('', methods=['GET'])
+@token_required
+def list_documents(current_user):
+    """Documents the user is a member of, most recently edited first"""
+    try:
+        return jsonify({'documents': [d.to_dict() for d in member_documents(current_user.id)]}), 200
+    except Exception as e:
+        logger.error(f"List documents error: {str(e)}")
+        return jsonify({'error': 'Failed to list documents'}), 500
+
+@documents_bp.route('', methods=['POST'])
+@token_required
+def new_document(current_user):
+    """Create a document owned by the user"""
+    data = request.get_json(silent=True) or {}
+    title = (data.get('title') or '').strip()
+    content = data.get('content', '')
+    if not title or len(title) > 255:
+        return jsonify({'error': 'Title is required (at most 255 characters)'}), 400
+    if not isinstance(content, str) or len(content) > current_app.config['DOCUMENT_MAX_LENGTH']:
+        return jsonify({'error': 'Content must be a string within the size limit'}), 400
+
+    try:
+        document = create_document(current_user.id, title, content)
+        return jsonify({**document.to_dict(), 'content': content}), 201
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Create document error: {str(e)}")
+        return jsonify({'error': 'Failed to create document'}), 500
+
+@documents_bp.route('/<int:document_id>', methods=['GET'])
+@token_required
+@etagged
+def get_document(current_user, document_id):
+    """Content at the head version: latest snapshot plus the op tail"""
+    try:
+        document = member_document(document_id, current_user.id)
+        if document is None:
+            return document_not_found()
+
+        content, tail = load_content(document)
+        if needs_compaction(document, tail):
+            # Normally queued on write; catches up after a restart lost the job
+            jobs.enqueue('document_compact', document.id)
+        return jsonify({**document.to_dict(), 'content': content}), 200
+    except DocumentConflict as e:
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        logger.error(f"Get document error: {str(e)}")
+        return jsonify({'error': 'Failed to load document'}), 500
+
+@documents_bp.route('/<int:document_id>/operations', methods=['GET'])
+@token_required
+def get_operations(current_user, document_id):
+    """Operations after ?since=<version>, for clients catching up"""
+    try:
+        document = member_document(document_id, current_user.id)
+        if document is None:
+            return document_not_found()
+
+        since = request.args.get('since', type=int)
+        if since is None or since < 0:
+            return jsonify({'error': 'since must be a version number'}), 400
+
+        operations = operations_since(document, since)
+        if operations is None:
+            return jsonify({'error': 'History before this version was compacted, reload the document'}), 410
+        return jsonify({'version': document.version, 'operations': operations}), 200
+    except Exception as e:
+        logger.error(f"Get operations error: {str(e)}")
+        return jsonify({'error': 'Failed to load operations'}), 500
+
+@documents_bp.route('/<int:document_id>/operations', methods=['POST'])
+@token_required
+def post_operations(current_user, document_id):
+    """Apply a batch of operations made at base_version.
+
+    Body: {"base_version": n, "operations": [op, ...], "client_id": "..."}.
+    The batch is rebased over anything committed since base_version and
+    stored as one version. The response carries the op as stored and the
+    ops the client missed, so it can transform its pending edits; the op
+    is also relayed to the document's collaboration room, skipping
+    client_id (the sender's WebSocket id).
+    """
+    data = request.get_json(silent=True) or {}
+    base_version = data.get('base_version')
+    operations = data.get('operations')
+    if not isinstance(base_version, int) or not isinstance(operations, list) or not operations:
+        return jsonify({'error': 'base_version and a non-empty operations list are required'}), 400
+    if len(operations) > current_app.config['DOCUMENT_MAX_BATCH']:
+        return jsonify({'error': f"At most {current_app.config['DOCUMENT_MAX_BATCH']} operations per batch"}), 400
+
+    try:
+        if member_document(document_id, current_user.id) is None:
+            return document_not_found()
+
+        document, operation, missed = submit_operations(document_id, current_user.id, base_version, operations)
+        version = document.version
+        if needs_compaction(document):
+            jobs.enqueue('document_compact', document_id)
+
+        collab.publish(document_room(document_id), data.get('client_id'), current_app.json.dumps({
+            'type': 'operation', 'version': version, 'operation': operation, 'user_id': current_user.id
+        }))
+        return jsonify({'version': version, 'operation': operation, 'missed': missed}), 200
+    except OperationError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except DocumentConflict as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Post operations error: {str(e)}")
+        return jsonify({'error': 'Failed to apply operations'}), 500
+
+@documents_bp.route('/<int:document_id>/members', methods=['POST'])
+@token_required
+def add_member(current_user, document_id):
+    """Let another user open and edit the document (owner only)"""
+    data = request.get_json(silent=True) or {}
+    try:
+        document = member_document(document_id, current_user.id)
+        if document is None:
+            return document_not_found()
+        if document.owner_id != current_user.id:
+            return jsonify({'error': 'Only the owner can add members'}), 403
+
+        user = User.query.filter_by(username=data.get('username')).first()
+        if user is None:
+            return jsonify({'error': 'User not found'}), 404
+        db.session.merge(DocumentMember(document_id=document_id, user_id=user.id))
+        db.session.commit()
+        return jsonify({'document_id': document_id, 'user_id': user.id}), 201
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Add member error: {str(e)}")
+        return jsonify({'error': 'Failed to add member'}), 500
+
+@jobs.register('document_compact')
+def compact_document(document_id):
+    """Snapshot a document's head so loads replay a short op tail."""
+    result = compact(document_id)
+    if result:
+        logger.info(f"Compacted document {document_id} at version {result['version']}, trimmed {result['ops_trimmed']} ops")
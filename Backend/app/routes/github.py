@@ -1,122 +1,307 @@
-import requests
+import json
+import time
+import base64
+import binascii
 import logging
-from flask import Blueprint, jsonify
-from ..models import User
+from concurrent.futures import ThreadPoolExecutor, wait
+from flask import Blueprint, request, jsonify, current_app, g
+from ..models import db, User, RepositoryIndex, release_db_connection
+from ..github_client import github_client
+from ..repo_index import remember_repositories, get_repository_resource, delivered_at
+from ..commit_mirror import CommitSyncError, sync_recent, sync_state, backfill, query_commits, parse_date
+from ..snapshots import save_snapshot, load_snapshot, repository_snapshot_ttl
+from ..webhooks import INVALIDATES, verify_signature, apply_delivery, prune_deliveries
+from ..jobs import jobs
+from ..repo_search import repo_search
 from .auth import token_required
+from ..http_cache import etagged
 
 github_bp = Blueprint('github', __name__)
 logger = logging.getLogger(__name__)
 
+# GitHub's maximum page size for list endpoints
+MAX_PER_PAGE = 100
+
+REPOSITORY_PARAMS = {'sort': 'updated', 'type': 'all'}
+RECENT_COMMITS_PARAMS = {'per_page': 10}
+
+@github_bp.after_request
+def add_freshness_header(response):
+    """Tell clients whether GitHub data was served stale to save rate limit."""
+    response.headers['X-Data-Freshness'] = 'stale' if g.get('github_data_stale') else 'fresh'
+    return response
+
+def format_repository(repo):
+    return {
+        'id': repo['id'],
+        'name': repo['name'],
+        'full_name': repo['full_name'],
+        'description': repo['description'],
+        'private': repo['private'],
+        'html_url': repo['html_url'],
+        'clone_url': repo['clone_url'],
+        'ssh_url': repo['ssh_url'],
+        'language': repo['language'],
+        'stargazers_count': repo['stargazers_count'],
+        'forks_count': repo['forks_count'],
+        'updated_at': repo['updated_at'],
+        'created_at': repo['created_at'],
+        'owner': {
+            'login': repo['owner']['login'],
+            'avatar_url': repo['owner']['avatar_url']
+        }
+    }
+
+def format_collaborator(collab):
+    return {
+        'id': collab['id'],
+        'login': collab['login'],
+        'avatar_url': collab['avatar_url'],
+        'html_url': collab['html_url'],
+        'permissions': collab.get('permissions', {})
+    }
+
+def format_commit(commit):
+    return {
+        'sha': commit['sha'],
+        'message': commit['commit']['message'],
+        'author': {
+            'name': commit['commit']['author']['name'],
+            'email': commit['commit']['author']['email'],
+            'date': commit['commit']['author']['date']
+        },
+        'committer': {
+            'name': commit['commit']['committer']['name'],
+            'date': commit['commit']['committer']['date']
+        },
+        'html_url': commit['html_url'],
+        'author_info': {
+            'login': commit['author']['login'] if commit['author'] else None,
+            'avatar_url': commit['author']['avatar_url'] if commit['author'] else None
+        } if commit['author'] else None
+    }
+
+def encode_cursor(page, per_page):
+    raw = json.dumps({'page': page, 'per_page': per_page}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Return (page, per_page) for an opaque cursor, or raise ValueError."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded))
+        page, per_page = int(data['page']), int(data['per_page'])
+    except (binascii.Error, KeyError, TypeError, ValueError) as e:
+        raise ValueError('Invalid cursor') from e
+    if page < 1 or not 1 <= per_page <= MAX_PER_PAGE:
+        raise ValueError('Invalid cursor')
+    return page, per_page
+
+def encode_commit_cursor(keyset):
+    committed_at, sha = keyset
+    raw = json.dumps({'at': committed_at.isoformat(), 'sha': sha}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_commit_cursor(cursor):
+    """Return the (committed_at, sha) keyset for a commits cursor, or raise ValueError."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded))
+        return parse_date(data['at']), str(data['sha'])
+    except (binascii.Error, KeyError, TypeError, ValueError) as e:
+        raise ValueError('Invalid cursor') from e
+
+def parse_fields(spec):
+    """'id,name,owner.login' -> {'id': None, 'name': None, 'owner': {'login': None}}"""
+    tree = {}
+    for field in filter(None, (f.strip() for f in spec.split(','))):
+        node = tree
+        *parents, leaf = field.split('.')
+        for part in parents:
+            if part in node and node[part] is None:
+                break  # the whole parent is already requested
+            node = node.setdefault(part, {})
+        else:
+            node[leaf] = None
+    return tree
+
+def project(value, tree):
+    if tree is None or not isinstance(value, dict):
+        return value
+    return {key: project(value[key], sub) for key, sub in tree.items() if key in value}
+
+def project_items(items):
+    """Apply ?fields= to a list of formatted items, so clients get only what they render."""
+    spec = request.args.get('fields')
+    if not spec:
+        return items
+    tree = parse_fields(spec)
+    return [project(item, tree) for item in items]
+
+def load_repository_snapshot(user_id, repo_id, resource):
+    """Stored collaborators/commits for this user, if still servable."""
+    return load_snapshot(user_id, f'{resource}:{repo_id}', repository_snapshot_ttl(repo_id))
+
+def keep_repository_snapshot(user_id, repository, resource, items, fetched_at, **extra):
+    """Keep a live result while the repo's webhook will tell us when it changes."""
+    if repository.hooked_at:
+        save_snapshot(user_id, f'{resource}:{repository.repo_id}', {
+            resource: items,
+            'repository': repository.to_dict(),
+            **extra
+        }, fetched_at)
+
 @github_bp.route('/repositories', methods=['GET'])
 @token_required
+@etagged
 def get_repositories(current_user):
-    """Get user's GitHub repositories"""
+    """Get user's GitHub repositories
+
+    Without parameters every page is returned. With ?limit= and/or ?cursor=
+    one page is returned along with a next_cursor, so clients can render the
+    first page while fetching the rest. ?fields=id,name,owner.login trims
+    each repository to those keys.
+    """
     try:
         if not current_user.github_access_token:
             return jsonify({'error': 'GitHub access not available. Please connect your GitHub account.'}), 400
         
-        headers = {
-            'Authorization': f'token {current_user.github_access_token}',
-            'Accept': 'application/vnd.github.v3+json'
-        }
+        token = current_user.github_access_token
+        params = REPOSITORY_PARAMS
         
-        # Get user's repositories
-        repos_url = 'https://api.github.com/user/repos'
-        params = {
-            'sort': 'updated',
-            'per_page': 50,
-            'type': 'all'
-        }
+        cursor = request.args.get('cursor')
+        limit = request.args.get('limit', type=int)
+        paged = cursor is not None or limit is not None
+        if paged:
+            try:
+                page, per_page = decode_cursor(cursor) if cursor else (1, min(max(limit, 1), MAX_PER_PAGE))
+            except ValueError:
+                return jsonify({'error': 'Invalid cursor'}), 400
         
-        response = requests.get(repos_url, headers=headers, params=params)
+        # Right after a GitHub login the prefetch job has usually stored the listing
+        prefetched = load_snapshot(current_user.id, 'repositories', current_app.config['GITHUB_PREFETCH_TTL'])
+        if prefetched is not None:
+            next_cursor = None
+            if paged:
+                start = (page - 1) * per_page
+                if start + per_page < len(prefetched):
+                    next_cursor = encode_cursor(page + 1, per_page)
+                prefetched = prefetched[start:start + per_page]
+            return jsonify({
+                'repositories': project_items(prefetched),
+                'total_count': len(prefetched),
+                'next_cursor': next_cursor
+            }), 200
         
-        if response.status_code != 200:
+        release_db_connection()
+        
+        if not paged:
+            # Page one tells us how many pages there are; the rest are fetched concurrently
+            response, repos = github_client.get_all('/user/repos', token, params=params, per_page=MAX_PER_PAGE)
+            next_cursor = None
+        else:
+            response = github_client.get('/user/repos', token, params=dict(params, per_page=per_page, page=page))
+            repos = response.json() if response.status_code == 200 else None
+            next_cursor = None
+            if repos is not None and page < github_client.last_page(response):
+                next_cursor = encode_cursor(page + 1, per_page)
+        
+        if repos is None:
             logger.error(f"GitHub API error: {response.status_code} - {response.text}")
             return jsonify({'error': 'Failed to fetch repositories'}), 500
         
-        repos = response.json()
-        
-        # Format repository data
-        formatted_repos = []
-        for repo in repos:
-            formatted_repos.append({
-                'id': repo['id'],
-                'name': repo['name'],
-                'full_name': repo['full_name'],
-                'description': repo['description'],
-                'private': repo['private'],
-                'html_url': repo['html_url'],
-                'clone_url': repo['clone_url'],
-                'ssh_url': repo['ssh_url'],
-                'language': repo['language'],
-                'stargazers_count': repo['stargazers_count'],
-                'forks_count': repo['forks_count'],
-                'updated_at': repo['updated_at'],
-                'created_at': repo['created_at'],
-                'owner': {
-                    'login': repo['owner']['login'],
-                    'avatar_url': repo['owner']['avatar_url']
-                }
-            })
+        # Index id -> full_name so follow-up calls skip the /repositories/{id} lookup
+        remember_repositories(repos)
+        
+        formatted_repos = [format_repository(repo) for repo in repos]
         
         return jsonify({
-            'repositories': formatted_repos,
-            'total_count': len(formatted_repos)
+            'repositories': project_items(formatted_repos),
+            'total_count': len(formatted_repos),
+            'next_cursor': next_cursor
         }), 200
         
     except Exception as e:
         logger.error(f"Error fetching repositories: {str(e)}")
         return jsonify({'error': 'Failed to fetch repositories'}), 500
 
+@github_bp.route('/repositories/search', methods=['GET'])
+@token_required
+@etagged
+def search_repositories(current_user):
+    """Search user's GitHub repositories by name, description and language
+
+    ?q= is matched fuzzily (typos and partial words still hit) against an
+    in-memory index of the user's listing, built on first use from the
+    prefetched snapshot or GitHub and kept for REPO_SEARCH_TTL seconds.
+    ?limit= caps the results (default 20) and ?fields= trims them.
+    """
+    try:
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({'error': 'Query parameter q is required'}), 400
+        limit = min(max(request.args.get('limit', 20, type=int), 1), MAX_PER_PAGE)
+
+        index = repo_search.get(current_user.id)
+        if index is None:
+            if not current_user.github_access_token:
+                return jsonify({'error': 'GitHub access not available. Please connect your GitHub account.'}), 400
+
+            repositories = load_snapshot(current_user.id, 'repositories', current_app.config['GITHUB_PREFETCH_TTL'])
+            if repositories is None:
+                token = current_user.github_access_token
+                release_db_connection()
+                response, repos = github_client.get_all('/user/repos', token, params=REPOSITORY_PARAMS, per_page=MAX_PER_PAGE)
+                if repos is None:
+                    logger.error(f"GitHub API error: {response.status_code} - {response.text}")
+                    return jsonify({'error': 'Failed to search repositories'}), 500
+                remember_repositories(repos)
+                repositories = [format_repository(repo) for repo in repos]
+            index = repo_search.build(current_user.id, repositories)
+
+        results = index.search(query, limit)
+        return jsonify({
+            'repositories': project_items(results),
+            'total_count': len(results)
+        }), 200
+
+    except Exception as e:
+        logger.error(f"Error searching repositories: {str(e)}")
+        return jsonify({'error': 'Failed to search repositories'}), 500
+
 @github_bp.route('/repository/<int:repo_id>/collaborators', methods=['GET'])
 @token_required
+@etagged
 def get_collaborators(current_user, repo_id):
     """Get collaborators for a specific repository"""
     try:
         if not current_user.github_access_token:
             return jsonify({'error': 'GitHub access not available'}), 400
         
-        headers = {
-            'Authorization': f'token {current_user.github_access_token}',
-            'Accept': 'application/vnd.github.v3+json'
-        }
-        
-        # First get the repository details to get the full name
-        repo_url = f'https://api.github.com/repositories/{repo_id}'
-        repo_response = requests.get(repo_url, headers=headers)
+        token = current_user.github_access_token
         
-        if repo_response.status_code != 200:
-            return jsonify({'error': 'Repository not found'}), 404
+        stored = load_repository_snapshot(current_user.id, repo_id, 'collaborators')
+        if stored is not None:
+            return jsonify(dict(stored, collaborators=project_items(stored['collaborators']))), 200
         
-        repo_data = repo_response.json()
-        repo_full_name = repo_data['full_name']
+        # Get collaborators, resolving the full name through the repository index
+        repository, response = get_repository_resource(token, repo_id, 'collaborators')
         
-        # Get collaborators
-        collaborators_url = f'https://api.github.com/repos/{repo_full_name}/collaborators'
-        response = requests.get(collaborators_url, headers=headers)
+        if repository is None:
+            return jsonify({'error': 'Repository not found'}), 404
         
         if response.status_code != 200:
             return jsonify({'error': 'Failed to fetch collaborators'}), 500
         
         collaborators = response.json()
         
-        formatted_collaborators = []
-        for collab in collaborators:
-            formatted_collaborators.append({
-                'id': collab['id'],
-                'login': collab['login'],
-                'avatar_url': collab['avatar_url'],
-                'html_url': collab['html_url'],
-                'permissions': collab.get('permissions', {})
-            })
+        formatted_collaborators = [format_collaborator(collab) for collab in collaborators]
+        keep_repository_snapshot(current_user.id, repository, 'collaborators', formatted_collaborators,
+                                 response.fetched_at)
         
         return jsonify({
-            'collaborators': formatted_collaborators,
-            'repository': {
-                'id': repo_data['id'],
-                'name': repo_data['name'],
-                'full_name': repo_data['full_name']
-            }
+            'collaborators': project_items(formatted_collaborators),
+            'repository': repository.to_dict()
         }), 200
         
     except Exception as e:
@@ -125,67 +310,275 @@ def get_collaborators(current_user, repo_id):
 
 @github_bp.route('/repository/<int:repo_id>/commits', methods=['GET'])
 @token_required
+@etagged
 def get_recent_commits(current_user, repo_id):
-    """Get recent commits for a repository"""
+    """Get a repository's commits, newest first, from the local mirror
+
+    ?limit= (default 30, at most 100) commits per page; next_cursor is
+    passed back as ?cursor= for the next page. ?author= filters by GitHub
+    login or email, ?since= and ?until= (ISO 8601) by commit date. Each
+    call first mirrors whatever the default branch gained, merged branches
+    included (one cached call when nothing changed, which also confirms the user can
+    still read the repository) unless the repo's webhook vouches that
+    nothing was pushed; older history is backfilled by a job, and complete
+    says whether it has finished.
+    """
     try:
         if not current_user.github_access_token:
             return jsonify({'error': 'GitHub access not available'}), 400
         
-        headers = {
-            'Authorization': f'token {current_user.github_access_token}',
-            'Accept': 'application/vnd.github.v3+json'
-        }
+        token = current_user.github_access_token
         
-        # Get repository details
-        repo_url = f'https://api.github.com/repositories/{repo_id}'
-        repo_response = requests.get(repo_url, headers=headers)
-        
-        if repo_response.status_code != 200:
-            return jsonify({'error': 'Repository not found'}), 404
+        try:
+            limit = min(max(request.args.get('limit', 30, type=int), 1), MAX_PER_PAGE)
+            after = decode_commit_cursor(request.args['cursor']) if request.args.get('cursor') else None
+            since = parse_date(request.args['since']) if request.args.get('since') else None
+            until = parse_date(request.args['until']) if request.args.get('until') else None
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor or date'}), 400
         
-        repo_data = repo_response.json()
-        repo_full_name = repo_data['full_name']
+        # A snapshot written after syncing this head means a webhook would have dropped it on a push
+        stored = load_repository_snapshot(current_user.id, repo_id, 'commits')
+        state = sync_state(repo_id)
+        if stored is not None and state.head_sha and stored.get('head') == state.head_sha:
+            repository, caught_up = stored['repository'], True
+        else:
+            try:
+                synced, caught_up, fetched_at = sync_recent(token, repo_id,
+                                                            current_app.config['GITHUB_COMMIT_SYNC_INLINE_PAGES'])
+            except CommitSyncError as e:
+                if e.status_code == 404:
+                    return jsonify({'error': 'Repository not found'}), 404
+                raise
+            
+            if synced is None:
+                return jsonify({'error': 'Repository not found'}), 404
+            
+            state = sync_state(repo_id)
+            if caught_up:
+                recent, _ = query_commits(repo_id, RECENT_COMMITS_PARAMS['per_page'])
+                keep_repository_snapshot(current_user.id, synced, 'commits',
+                                         [commit.to_dict() for commit in recent], fetched_at, head=state.head_sha)
+            repository = synced.to_dict()
         
-        # Get recent commits
-        commits_url = f'https://api.github.com/repos/{repo_full_name}/commits'
-        params = {'per_page': 10}
-        response = requests.get(commits_url, headers=headers, params=params)
+        complete = state.complete
+        if not caught_up or not complete:
+            jobs.enqueue('github_commit_sync', repo_id, current_user.id)
         
-        if response.status_code != 200:
-            return jsonify({'error': 'Failed to fetch commits'}), 500
-        
-        commits = response.json()
-        
-        formatted_commits = []
-        for commit in commits:
-            formatted_commits.append({
-                'sha': commit['sha'],
-                'message': commit['commit']['message'],
-                'author': {
-                    'name': commit['commit']['author']['name'],
-                    'email': commit['commit']['author']['email'],
-                    'date': commit['commit']['author']['date']
-                },
-                'committer': {
-                    'name': commit['commit']['committer']['name'],
-                    'date': commit['commit']['committer']['date']
-                },
-                'html_url': commit['html_url'],
-                'author_info': {
-                    'login': commit['author']['login'] if commit['author'] else None,
-                    'avatar_url': commit['author']['avatar_url'] if commit['author'] else None
-                } if commit['author'] else None
-            })
+        commits, last = query_commits(repo_id, limit, after, request.args.get('author'), since, until)
         
         return jsonify({
-            'commits': formatted_commits,
-            'repository': {
-                'id': repo_data['id'],
-                'name': repo_data['name'],
-                'full_name': repo_data['full_name']
-            }
+            'commits': project_items([commit.to_dict() for commit in commits]),
+            'repository': repository,
+            'next_cursor': encode_commit_cursor(last) if last else None,
+            'complete': complete
         }), 200
         
     except Exception as e:
+        db.session.rollback()
         logger.error(f"Error fetching commits: {str(e)}")
-        return jsonify({'error': 'Failed to fetch commits'}), 500
\ No newline at end of file
+        return jsonify({'error': 'Failed to fetch commits'}), 500
+
+# Per-repo resources the batch endpoint can fetch: (params, formatter, error message)
+BATCH_RESOURCES = {
+    'collaborators': (None, format_collaborator, 'Failed to fetch collaborators'),
+    'commits': (RECENT_COMMITS_PARAMS, format_commit, 'Failed to fetch commits')
+}
+
+def fetch_batch_item(app, user_id, token, repo_id, resource):
+    """Fetch one (repo, resource) pair on a batch worker thread."""
+    params, formatter, error = BATCH_RESOURCES[resource]
+    with app.app_context():
+        stored = load_repository_snapshot(user_id, repo_id, resource)
+        if stored is not None:
+            return stored['repository'], stored[resource], False
+        repository, response = get_repository_resource(token, repo_id, resource, params=params)
+        if repository is None:
+            raise LookupError('Repository not found')
+        if response.status_code != 200:
+            raise LookupError(error)
+        items = [formatter(item) for item in response.json()]
+        keep_repository_snapshot(user_id, repository, resource, items, response.fetched_at)
+        return repository.to_dict(), items, response.cache_status == 'stale'
+
+@github_bp.route('/batch', methods=['POST'])
+@token_required
+def batch(current_user):
+    """Fetch collaborators and/or commits for several repositories at once
+
+    Body: {"repo_ids": [1, 2], "resources": ["collaborators", "commits"]}.
+    Upstream calls run concurrently (capped per request) under a deadline;
+    anything that fails or misses the deadline is reported per item.
+    """
+    try:
+        if not current_user.github_access_token:
+            return jsonify({'error': 'GitHub access not available'}), 400
+        
+        data = request.get_json(silent=True) or {}
+        repo_ids = data.get('repo_ids')
+        resources = data.get('resources') or list(BATCH_RESOURCES)
+        
+        if not isinstance(repo_ids, list) or not repo_ids or not all(isinstance(r, int) for r in repo_ids):
+            return jsonify({'error': 'repo_ids must be a non-empty list of repository ids'}), 400
+        if len(repo_ids) > current_app.config['GITHUB_BATCH_MAX_REPOS']:
+            return jsonify({'error': f"At most {current_app.config['GITHUB_BATCH_MAX_REPOS']} repositories per batch"}), 400
+        if not isinstance(resources, list) or any(r not in BATCH_RESOURCES for r in resources):
+            return jsonify({'error': f"resources must be a subset of {sorted(BATCH_RESOURCES)}"}), 400
+        
+        app = current_app._get_current_object()
+        token = current_user.github_access_token
+        items = [(repo_id, resource) for repo_id in dict.fromkeys(repo_ids) for resource in dict.fromkeys(resources)]
+        
+        results = {str(repo_id): {'repository': None, 'errors': {}} for repo_id in repo_ids}
+        executor = ThreadPoolExecutor(max_workers=app.config['GITHUB_BATCH_CONCURRENCY'],
+                                      thread_name_prefix='github-batch')
+        try:
+            futures = {executor.submit(fetch_batch_item, app, current_user.id, token, repo_id, resource): (repo_id, resource)
+                       for repo_id, resource in items}
+            done, _ = wait(futures, timeout=app.config['GITHUB_BATCH_DEADLINE'])
+            
+            for future, (repo_id, resource) in futures.items():
+                result = results[str(repo_id)]
+                result[resource] = None
+                if future not in done:
+                    result['errors'][resource] = 'Deadline exceeded'
+                    continue
+                try:
+                    result['repository'], items, stale = future.result()
+                    result[resource] = project_items(items)
+                    if stale:
+                        g.github_data_stale = True
+                except LookupError as e:
+                    result['errors'][resource] = str(e)
+                except Exception as e:
+                    logger.error(f"Batch item {repo_id}/{resource} failed: {str(e)}")
+                    result['errors'][resource] = BATCH_RESOURCES[resource][2]
+        finally:
+            # Don't hold the response for stragglers past the deadline
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        return jsonify({'results': results}), 200
+        
+    except Exception as e:
+        logger.error(f"Error running batch: {str(e)}")
+        return jsonify({'error': 'Batch request failed'}), 500
+
+@jobs.register('github_prefetch')
+def prefetch_github_data(user_id):
+    """Snapshot a user's repositories and the recent commits of the most
+    recently updated ones, so the first dashboard view reads them locally."""
+    user = db.session.get(User, user_id)
+    if user is None or not user.github_access_token:
+        return
+    token = user.github_access_token
+    release_db_connection()
+    
+    response, repos = github_client.get_all('/user/repos', token, params=REPOSITORY_PARAMS, per_page=MAX_PER_PAGE)
+    if repos is None:
+        raise RuntimeError(f"GitHub returned {response.status_code} for /user/repos")
+    
+    remember_repositories(repos)
+    save_snapshot(user_id, 'repositories', [format_repository(repo) for repo in repos])
+    
+    # The listing is sorted by last update, so these are the repos most likely opened first
+    recent = repos[:current_app.config['GITHUB_PREFETCH_COMMIT_REPOS']]
+    responses = github_client.executor.map(
+        lambda repo: github_client.get(f"/repos/{repo['full_name']}/commits", token, params=RECENT_COMMITS_PARAMS),
+        recent
+    )
+    for repo, response in zip(recent, responses):
+        if response.status_code != 200:
+            continue
+        save_snapshot(user_id, f"commits:{repo['id']}", {
+            'commits': [format_commit(commit) for commit in response.json()],
+            'repository': {'id': repo['id'], 'name': repo['name'], 'full_name': repo['full_name']}
+        }, response.fetched_at)
+
+@github_bp.route('/webhook', methods=['POST'])
+def webhook():
+    """Receive GitHub push, member and repository events
+
+    Verifies X-Hub-Signature-256, ignores delivery ids already handled and
+    drops the snapshots the event makes stale before acknowledging.
+    Refetching them for affected users is left to a background job.
+    """
+    try:
+        secret = current_app.config['GITHUB_WEBHOOK_SECRET']
+        if not secret:
+            return jsonify({'error': 'Webhooks not configured'}), 404
+        
+        if not verify_signature(secret, request.get_data(), request.headers.get('X-Hub-Signature-256')):
+            return jsonify({'error': 'Invalid signature'}), 401
+        
+        event = request.headers.get('X-GitHub-Event')
+        delivery_id = request.headers.get('X-GitHub-Delivery')
+        if event == 'ping':
+            return jsonify({'status': 'pong'}), 200
+        if event not in INVALIDATES:
+            return jsonify({'status': 'ignored'}), 202
+        
+        payload = request.get_json(silent=True) or {}
+        repo = payload.get('repository') or {}
+        if not delivery_id or not isinstance(repo.get('id'), int):
+            return jsonify({'error': 'Malformed delivery'}), 400
+        
+        dropped = apply_delivery(delivery_id, event, payload.get('action'), repo)
+        if dropped is None:
+            return jsonify({'status': 'duplicate'}), 200
+        if event == 'repository':
+            # Other workers' search indexes catch up within REPO_SEARCH_TTL
+            repo_search.clear()
+        
+        limit = current_app.config['GITHUB_WEBHOOK_REFRESH_USERS']
+        if repo.get('full_name') and payload.get('action') != 'deleted':
+            for resource, user_ids in dropped.items():
+                if user_ids:
+                    jobs.enqueue('github_snapshot_refresh', repo['id'], repo['full_name'], resource,
+                                 tuple(sorted(user_ids)[:limit]))
+        jobs.enqueue('github_webhook_prune')
+        
+        return jsonify({'status': 'accepted'}), 202
+        
+    except Exception as e:
+        logger.error(f"Error handling webhook: {str(e)}")
+        return jsonify({'error': 'Webhook handling failed'}), 500
+
+@jobs.register('github_snapshot_refresh')
+def refresh_repository_snapshots(repo_id, full_name, resource, user_ids):
+    """Refetch a resource a webhook invalidated, for the users who had it stored."""
+    params, formatter, _ = BATCH_RESOURCES[resource]
+    repository = {'id': repo_id, 'name': full_name.split('/')[-1], 'full_name': full_name}
+    entry = db.session.get(RepositoryIndex, repo_id)
+    fresh_after = delivered_at(entry) if entry is not None else time.time()
+    tokens = User.query.filter(User.id.in_(user_ids), User.github_access_token.isnot(None)) \
+        .with_entities(User.id, User.github_access_token).all()
+    release_db_connection()
+    for user_id, token in tokens:
+        # This worker's cache may still hold the pre-push body within its max-age
+        response = github_client.get(f'/repos/{full_name}/{resource}', token, params=params, fresh_after=fresh_after)
+        if response.status_code != 200:
+            continue
+        save_snapshot(user_id, f'{resource}:{repo_id}', {
+            resource: [formatter(item) for item in response.json()],
+            'repository': repository
+        }, response.fetched_at)
+
+@jobs.register('github_commit_sync')
+def sync_repository_commits(repo_id, user_id):
+    """Bring a repository's commit mirror up to date with a user's token:
+    the delta since the newest stored commit, then older history."""
+    user = db.session.get(User, user_id)
+    if user is None or not user.github_access_token:
+        return
+    pages = current_app.config['GITHUB_COMMIT_SYNC_PAGES']
+    start = time.perf_counter()
+    repository, _, _ = sync_recent(user.github_access_token, repo_id, pages)
+    if repository is None:
+        return
+    inserted = backfill(user.github_access_token, repo_id, repository.full_name, pages)
+    logger.info(f"Synced commits of {repository.full_name}: {inserted} backfilled in {time.perf_counter() - start:.1f}s")
+
+@jobs.register('github_webhook_prune')
+def prune_webhook_deliveries():
+    """Forget delivery ids past the retention window."""
+    prune_deliveries(current_app.config['GITHUB_WEBHOOK_RETENTION'])
@@ -0,0 +1,48 @@
+import os
+import hmac
+import logging
+from functools import wraps
+from flask import Blueprint, request, jsonify, abort
+from ..models import db
+from ..db_pool import pool_stats
+from ..session_cache import session_cache
+from ..sessions import session_tracker
+from ..github_client import github_client
+from ..passwords import password_hasher
+from ..jobs import jobs
+from ..collab import collab
+from ..signaling import signaling
+from ..repo_search import repo_search
+
+internal_bp = Blueprint('internal', __name__)
+logger = logging.getLogger(__name__)
+
+INTERNAL_STATS_TOKEN = os.getenv('INTERNAL_STATS_TOKEN')
+
+def internal_only(f):
+    """Hide the route unless the caller presents INTERNAL_STATS_TOKEN."""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        token = request.headers.get('X-Internal-Token', '')
+        # Compare bytes: compare_digest raises TypeError on non-ASCII str
+        if not INTERNAL_STATS_TOKEN or not hmac.compare_digest(token.encode(), INTERNAL_STATS_TOKEN.encode()):
+            abort(404)
+        return f(*args, **kwargs)
+    return decorated
+
+@internal_bp.route('/stats', methods=['GET'])
+@internal_only
+def stats():
+    """Per-worker pool and cache statistics for capacity planning"""
+    return jsonify({
+        'pid': os.getpid(),
+        'db_pool': pool_stats.snapshot(db.engine.pool),
+        'session_cache': session_cache.stats(),
+        'sessions': session_tracker.stats(),
+        'github_client': github_client.stats(),
+        'password_hasher': password_hasher.stats(),
+        'jobs': jobs.stats(),
+        'collab': collab.stats(),
+        'signaling': signaling.stats(),
+        'repo_search': repo_search.stats()
+    }), 200
@@ -0,0 +1,84 @@
+import logging
+from flask import Blueprint, current_app
+from ..collab import collab, RoomFull
+from ..signaling import signaling, SignalingPeer
+from ..documents import voice_room_allowed
+from .collab import sock, authorize_room, serve, close, CLOSE_ROOM_FULL
+
+signaling_bp = Blueprint('signaling', __name__)
+logger = logging.getLogger(__name__)
+
+# Client messages: SDP to one peer, trickled ICE candidates to one peer, keepalive
+SDP_MESSAGES = ('offer', 'answer')
+
+
+def send_error(peer, error, **extra):
+    peer.enqueue(current_app.json.dumps({'type': 'error', 'error': error, **extra}))
+
+
+def relay(peer, to, message):
+    """Send message to peer id `to` in the same room, wherever it is connected."""
+    delivered = collab.publish(peer.doc_id, peer.id, current_app.json.dumps(message), to=to)
+    if not delivered and collab.bus == 'local':
+        signaling.count('undeliverable')
+        send_error(peer, 'Peer not in room', to=to)
+
+
+def handle_signal(peer, data):
+    try:
+        message = current_app.json.loads(data)
+    except ValueError:
+        message = None
+    if not isinstance(message, dict):
+        send_error(peer, 'Unsupported message')
+        return
+
+    kind, to = message.get('type'), message.get('to')
+    if kind == 'ping':
+        peer.enqueue(current_app.json.dumps({'type': 'pong'}))
+    elif not isinstance(to, str) or to == peer.id:
+        send_error(peer, 'Messages need a peer id in "to"')
+    elif kind in SDP_MESSAGES and isinstance(message.get('sdp'), (str, dict)):
+        signaling.count('sdp')
+        relay(peer, to, {'type': kind, 'from': peer.id, 'sdp': message['sdp']})
+    elif kind == 'candidate':
+        # null marks the end of gathering and is relayed like any candidate
+        signaling.count('candidates')
+        peer.add_candidate(to, message.get('candidate'))
+    else:
+        send_error(peer, 'Unsupported message')
+
+
+def relay_candidates(peer):
+    for to, candidates in peer.take_candidates().items():
+        signaling.count('candidate_messages')
+        relay(peer, to, {'type': 'candidates', 'from': peer.id, 'candidates': candidates})
+
+
+@sock.route('/ws/<path:room>', bp=signaling_bp)
+def signal(ws, room):
+    """Join a document's voice room and relay SDP and ICE candidates between its peers.
+
+    room is 'documents/<id>' and only the document's members may join.
+    Peers learn about each other from 'join', 'here' and 'leave' events,
+    then address offers, answers and candidates to a peer id. A peer that
+    sends nothing (not even {"type": "ping"}) for SIGNALING_IDLE_TIMEOUT
+    seconds is dropped.
+    """
+    authorized = authorize_room(ws, room, voice_room_allowed)
+    if authorized is None:
+        return
+    user, token = authorized
+
+    peer = SignalingPeer(ws, user, room, collab.max_queue, collab.send_timeout)
+    try:
+        peers = collab.join(peer, limit=signaling.room_size)
+    except RoomFull:
+        signaling.count('full_rooms')
+        close(ws, CLOSE_ROOM_FULL, 'Room is full')
+        return
+    signaling.count('peers')
+    ws.send(current_app.json.dumps([{
+        'type': 'welcome', 'id': peer.id, 'room': room, 'peers': peers, 'ice_servers': signaling.ice_servers
+    }]))
+    serve(ws, peer, token, handle_signal, on_tick=relay_candidates, idle_timeout=signaling.idle_timeout)
@@ -0,0 +1,169 @@
+import os
+import mmap
+import time
+import logging
+import threading
+from collections import OrderedDict
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+from .models import db, User
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to per-process versions
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+VERSION_SLOTS = 4096
+SLOT_SIZE = 8
+
+
+class SessionVersions:
+    """Per-user session version counters shared by every worker on the host.
+
+    Counters live in a small memory-mapped file, so checking one is a plain
+    memory read. Bumping a user's counter invalidates every cached session
+    for that user in all workers that map the same file.
+    """
+
+    def __init__(self, path=None):
+        self._local = [0] * VERSION_SLOTS
+        self._fd = None
+        self._map = None
+        if path and fcntl is not None:
+            try:
+                self._open(path)
+            except OSError as e:
+                logger.warning(f"Session version file unavailable ({e}), using per-process versions")
+
+    def _open(self, path):
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        size = VERSION_SLOTS * SLOT_SIZE
+        if os.fstat(fd).st_size < size:
+            os.ftruncate(fd, size)
+        self._fd = fd
+        self._map = mmap.mmap(fd, size)
+        self._slots = memoryview(self._map).cast('Q')
+
+    def _slot(self, user_id):
+        return hash(int(user_id)) % VERSION_SLOTS
+
+    def get(self, user_id):
+        slot = self._slot(user_id)
+        if self._map is None:
+            return self._local[slot]
+        return self._slots[slot]
+
+    def bump(self, user_id):
+        slot = self._slot(user_id)
+        if self._map is None:
+            self._local[slot] += 1
+            return
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            self._slots[slot] = (self._slots[slot] + 1) % (1 << 64)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+
+class SessionCache:
+    """Bounded TTL/LRU cache of verified (user_id, sid) -> user snapshot.
+
+    Lets token_required skip the users lookup for sessions it has already
+    verified. Entries are dropped when they expire, when the LRU bound is
+    hit, or when the user's shared session version changes.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.ttl = 30
+        self.maxsize = 10000
+        self.versions = SessionVersions()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('SESSION_CACHE_ENABLED', True)
+        self.ttl = app.config.get('SESSION_CACHE_TTL', 30)
+        self.maxsize = app.config.get('SESSION_CACHE_SIZE', 10000)
+        self.versions = SessionVersions(app.config.get('SESSION_CACHE_VERSION_FILE'))
+        self.clear()
+        app.extensions['session_cache'] = self
+
+    def get(self, user_id, session_id):
+        """Return an attached User for a verified session, or None on a miss."""
+        if not self.enabled or not session_id:
+            return None
+
+        key = (user_id, session_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                snapshot, version, expires_at = entry
+                if expires_at > time.monotonic() and version == self.versions.get(user_id):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                else:
+                    del self._entries[key]
+                    entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+
+        user = User(**snapshot)
+        make_transient_to_detached(user)
+        return db.session.merge(user, load=False)
+
+    def version(self, user_id):
+        """The user's session version; read it before verifying, then pass it to put()."""
+        return self.versions.get(user_id)
+
+    def put(self, user, session_id, version):
+        """Remember a user whose session was just verified against the DB.
+
+        version must be read before the DB check: a revocation that commits
+        in between bumps it, so the entry is already stale when stored.
+        """
+        if not self.enabled or not session_id:
+            return
+
+        snapshot = {attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
+        key = (user.id, session_id)
+        entry = (snapshot, version, time.monotonic() + self.ttl)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        """Drop every cached session of a user, in this and all other workers."""
+        self.versions.bump(user_id)
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == user_id]:
+                del self._entries[key]
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.invalidations = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations
+            }
+
+
+session_cache = SessionCache()
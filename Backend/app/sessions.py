@@ -0,0 +1,181 @@
+import os
+import time
+import uuid
+import atexit
+import logging
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import bindparam, or_
+from .models import db, UserSession
+from .session_cache import session_cache
+
+logger = logging.getLogger(__name__)
+
+# Rows per UPDATE round trip when flushing last-seen times
+FLUSH_BATCH = 500
+
+
+def open_session(user, device=None):
+    """Add a session row for user and return its id (the token's sid).
+
+    The caller commits, together with whatever else the sign-in changed.
+    """
+    if user.id is None:
+        db.session.flush()
+    session_id = str(uuid.uuid4())
+    db.session.add(UserSession(id=session_id, user_id=user.id, device=(device or '')[:255] or None))
+    return session_id
+
+
+def session_active(user_id, session_id):
+    """True if session_id belongs to user_id and has not been revoked."""
+    if not session_id:
+        return False
+    row = db.session.get(UserSession, session_id)
+    return row is not None and row.user_id == user_id and row.revoked_at is None
+
+
+def active_sessions(user_id):
+    return (UserSession.query
+            .filter(UserSession.user_id == user_id, UserSession.revoked_at.is_(None))
+            .order_by(UserSession.last_seen_at.desc())
+            .all())
+
+
+def revoke_sessions(user_id, session_ids=None, keep=None):
+    """Revoke some (session_ids) or all of a user's sessions, except keep.
+
+    One UPDATE whatever the count; cached verifications of the user are
+    dropped in every worker. Returns the number of sessions revoked.
+    """
+    query = UserSession.query.filter(UserSession.user_id == user_id, UserSession.revoked_at.is_(None))
+    if session_ids is not None:
+        query = query.filter(UserSession.id.in_(session_ids))
+    if keep is not None:
+        query = query.filter(UserSession.id != keep)
+    revoked = query.update({UserSession.revoked_at: datetime.utcnow()}, synchronize_session=False)
+    db.session.commit()
+    session_cache.invalidate(user_id)
+    return revoked
+
+
+class SessionTracker:
+    """Write-behind last-seen times for sessions.
+
+    Authenticated requests only record (sid -> time) in memory; a thread
+    per worker writes the latest time of every session seen since the
+    previous flush in batched UPDATEs every SESSION_TOUCH_INTERVAL
+    seconds, so request load never turns into write load (0 turns tracking
+    off). It also deletes sessions revoked or unused for
+    SESSION_RETENTION_DAYS.
+    """
+
+    def __init__(self, app=None):
+        self.interval = 60
+        self.retention = timedelta(days=30)
+        self._app = None
+        self._pid = None
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+        self._stats = {'touches': 0, 'flushes': 0, 'rows_flushed': 0, 'flush_errors': 0, 'pruned': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.interval = app.config.get('SESSION_TOUCH_INTERVAL', self.interval)
+        self.retention = timedelta(days=app.config.get('SESSION_RETENTION_DAYS', 30))
+        self._app = app
+        self._pid = None  # start a flush thread for this app on next use
+        app.extensions['session_tracker'] = self
+
+    def _ensure_flusher(self):
+        # One flush thread per worker; never share it across a fork. Start it
+        # after releasing the lock: under gevent start() yields, and every
+        # request takes this lock in touch()
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid == os.getpid():
+                    return
+                self._pid = os.getpid()
+                self._pending.clear()
+            threading.Thread(target=self._flush_loop, name='session-flush', daemon=True).start()
+            atexit.register(self._flush_at_exit)
+
+    def touch(self, session_id):
+        """Note that session_id was just used; costs a dict write."""
+        if self.interval <= 0:
+            return
+        self._ensure_flusher()
+        with self._lock:
+            self._pending[session_id] = datetime.utcnow()
+            self._stats['touches'] += 1
+
+    def flush(self):
+        """Write pending last-seen times; returns the number of sessions written."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        table = UserSession.__table__
+        # Several workers flush the same session; never move last_seen_at backwards
+        statement = (table.update()
+                     .where(table.c.id == bindparam('sid'), table.c.last_seen_at < bindparam('seen'))
+                     .values(last_seen_at=bindparam('seen')))
+        rows = [{'sid': sid, 'seen': seen} for sid, seen in pending.items()]
+        try:
+            for start in range(0, len(rows), FLUSH_BATCH):
+                db.session.execute(statement, rows[start:start + FLUSH_BATCH])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            with self._lock:
+                for sid, seen in pending.items():
+                    if self._pending.get(sid, seen) <= seen:
+                        self._pending[sid] = seen
+                self._stats['flush_errors'] += 1
+            raise
+        with self._lock:
+            self._stats['flushes'] += 1
+            self._stats['rows_flushed'] += len(rows)
+        return len(rows)
+
+    def prune(self):
+        """Delete sessions revoked, or unused, longer than the retention period."""
+        cutoff = datetime.utcnow() - self.retention
+        pruned = UserSession.query.filter(
+            or_(UserSession.revoked_at < cutoff, UserSession.last_seen_at < cutoff)
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        with self._lock:
+            self._stats['pruned'] += pruned
+        return pruned
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                with self._app.app_context():
+                    self.flush()
+                    if time.monotonic() - self._last_prune > 3600:
+                        self._last_prune = time.monotonic()
+                        self.prune()
+            except Exception as e:
+                logger.error(f"Session flush failed: {str(e)}")
+
+    def _flush_at_exit(self):
+        if self._pid != os.getpid():
+            return
+        try:
+            with self._app.app_context():
+                self.flush()
+        except Exception as e:
+            logger.warning(f"Session flush at exit failed: {str(e)}")
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, 'pending': len(self._pending), 'interval': self.interval}
+
+
+session_tracker = SessionTracker()
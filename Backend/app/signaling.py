@@ -0,0 +1,63 @@
+import logging
+from .collab import RoomClient
+
+logger = logging.getLogger(__name__)
+
+# Prefix that keeps voice rooms apart from the document rooms of the same name
+VOICE_ROOM_PREFIX = 'voice/'
+
+
+class SignalingPeer(RoomClient):
+    """A WebRTC peer in a voice room.
+
+    ICE candidates the peer trickles are held per target and relayed once
+    per tick as a single 'candidates' message, instead of one message per
+    candidate across the room and bus.
+    """
+
+    def __init__(self, ws, user, room, max_queue, send_timeout):
+        super().__init__(ws, user, VOICE_ROOM_PREFIX + room, max_queue, send_timeout)
+        self.room = room
+        self._candidates = {}
+
+    def add_candidate(self, to, candidate):
+        # Only the peer's own connection thread touches the buffer
+        self._candidates.setdefault(to, []).append(candidate)
+
+    def take_candidates(self):
+        pending, self._candidates = self._candidates, {}
+        return pending
+
+
+class Signaling:
+    """Settings and counters for WebRTC signaling.
+
+    Rooms, addressing and cross-worker delivery are the collaboration hub's
+    (app/collab.py); this adds the room size cap, idle expiry and ICE
+    servers handed to peers. The cap counts the peers connected to this
+    worker only, like every other piece of room state the hub keeps.
+    """
+
+    def __init__(self, app=None):
+        self.room_size = 8
+        self.idle_timeout = 60
+        self.ice_servers = []
+        self._stats = {'peers': 0, 'full_rooms': 0, 'sdp': 0, 'candidates': 0,
+                       'candidate_messages': 0, 'undeliverable': 0}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.room_size = app.config.get('SIGNALING_ROOM_SIZE', self.room_size)
+        self.idle_timeout = app.config.get('SIGNALING_IDLE_TIMEOUT', self.idle_timeout)
+        self.ice_servers = app.json.loads(app.config.get('SIGNALING_ICE_SERVERS') or '[]')
+        app.extensions['signaling'] = self
+
+    def count(self, key, amount=1):
+        self._stats[key] += amount
+
+    def stats(self):
+        return {**self._stats, 'room_size': self.room_size, 'idle_timeout': self.idle_timeout}
+
+
+signaling = Signaling()
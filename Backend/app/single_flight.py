@@ -0,0 +1,208 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+from .metrics import UPSTREAM_COALESCED
+
+try:
+    import fcntl
+except ImportError:  # Windows: coalesce within a worker only
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# How often leaders sweep old lock/result files out of the shared directory
+PRUNE_EVERY = 512
+PRUNE_AGE = 60
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Lets concurrent identical calls share one execution and its result.
+
+    Within a worker, the first caller for a key runs the call and everyone
+    else who asks for the same key meanwhile waits for its result. With a
+    directory configured, the leader also takes an flock on a per-key file
+    so leaders in other workers on the host wait for it, then read the
+    result it leaves next to the lock instead of repeating the call.
+    """
+
+    def __init__(self, directory=None, timeout=10):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._stats = {'coalesced': 0, 'coalesced_workers': 0}
+        self._leaders = 0
+        self.configure(directory, timeout)
+
+    def configure(self, directory=None, timeout=10):
+        self.timeout = timeout
+        self.directory = None
+        if directory and fcntl is not None:
+            try:
+                os.makedirs(directory, mode=0o700, exist_ok=True)
+                self.directory = directory
+            except OSError as e:
+                logger.warning(f"Single-flight directory unavailable ({e}), coalescing per worker only")
+
+    def _count(self, name, scope):
+        with self._lock:
+            self._stats[name] += 1
+        UPSTREAM_COALESCED.labels(scope).inc()
+
+    def do(self, key, fn, dump=None, load=None):
+        """Run fn() once for all concurrent callers of key.
+
+        dump/load turn the result into bytes and back; without them the
+        call is only shared within this worker.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            self._count('coalesced', 'worker')
+            if not call.done.wait(self.timeout):
+                return fn()  # the leader is stuck; don't hold this request hostage
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            if self.directory and dump is not None:
+                call.result = self._across_workers(key, fn, dump, load)
+            else:
+                call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def _across_workers(self, key, fn, dump, load):
+        name = hashlib.sha256(repr(key).encode()).hexdigest()[:32]
+        lock_path = os.path.join(self.directory, f'{name}.lock')
+        result_path = os.path.join(self.directory, f'{name}.result')
+        started = time.time()
+
+        deadline = time.monotonic() + self.timeout
+        fd, waited = self._lock_file(lock_path, deadline)
+        if fd is None:
+            return fn()
+        try:
+            if waited:
+                shared = self._read_result(result_path, started)
+                if shared is not None:
+                    self._count('coalesced_workers', 'host')
+                    return load(shared)
+
+            result = fn()
+            self._write_result(result_path, dump(result))
+            return result
+        finally:
+            os.close(fd)  # releases the flock
+
+    def _lock_file(self, path, deadline):
+        """flock path; returns (fd, waited), or (None, waited) past deadline.
+
+        Another worker is making the call while the lock is held, so poll
+        rather than block to keep gevent workers serving other greenlets.
+        A pruner may unlink the file between our open and flock; a lock on
+        the unlinked inode excludes nobody, so retry until the locked file
+        is still the one at path.
+        """
+        waited = False
+        while True:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            while not self._try_lock(fd):
+                waited = True
+                if time.monotonic() > deadline:
+                    os.close(fd)
+                    return None, waited
+                time.sleep(0.005)
+            if self._still_linked(fd, path):
+                return fd, waited
+            os.close(fd)
+
+    def _still_linked(self, fd, path):
+        try:
+            return os.stat(path).st_ino == os.fstat(fd).st_ino
+        except OSError:
+            return False
+
+    def _try_lock(self, fd):
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+
+    def _read_result(self, path, since):
+        try:
+            with open(path, 'rb') as f:
+                if os.fstat(f.fileno()).st_mtime < since:
+                    return None  # left over from an earlier call
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_result(self, path, data):
+        if data is None:
+            return
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}'
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not share single-flight result: {str(e)}")
+            return
+
+        with self._lock:
+            self._leaders += 1
+            prune = self._leaders % PRUNE_EVERY == 0
+        if prune:
+            self._prune()
+
+    def _prune(self):
+        cutoff = time.time() - PRUNE_AGE
+        try:
+            entries = list(os.scandir(self.directory))
+        except OSError:
+            return
+        for entry in entries:
+            try:
+                if entry.stat().st_mtime >= cutoff:
+                    continue
+                if entry.name.endswith('.lock'):
+                    self._remove_lock(entry.path)
+                else:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+    def _remove_lock(self, path):
+        """Unlink a lock file nobody holds. Opening it never updates its
+        mtime, so age alone says nothing about whether a leader has it."""
+        fd = os.open(path, os.O_RDWR)
+        try:
+            if self._try_lock(fd) and self._still_linked(fd, path):
+                os.remove(path)
+        finally:
+            os.close(fd)
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, 'in_flight': len(self._calls)}
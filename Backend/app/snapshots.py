@@ -0,0 +1,70 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from sqlalchemy.exc import SQLAlchemyError
+from .models import db, GitHubSnapshot, RepositoryIndex
+
+logger = logging.getLogger(__name__)
+
+
+def save_snapshot(user_id, resource, payload, fetched_at=None):
+    """Store formatted GitHub data for a user, replacing any older copy.
+
+    fetched_at (epoch seconds, default now) is when GitHub last vouched for
+    the data, which for a cached response is earlier than the call. A
+    repository's resources ('commits:<repo_id>') aren't saved if a webhook
+    for the repo arrived after that, since its delivery already dropped
+    them as stale; returns whether the snapshot was saved.
+    """
+    fetched = datetime.fromtimestamp(fetched_at, timezone.utc).replace(tzinfo=None) if fetched_at else datetime.utcnow()
+    _, _, repo_id = resource.partition(':')
+    try:
+        if repo_id and _hooked_after(int(repo_id), fetched):
+            return False
+        db.session.merge(GitHubSnapshot(
+            user_id=user_id,
+            resource=resource,
+            payload=current_app.json.dumps(payload),
+            fetched_at=fetched
+        ))
+        db.session.commit()
+        # A delivery committing between the check and our write deleted nothing; undo it ourselves
+        if repo_id and _hooked_after(int(repo_id), fetched):
+            GitHubSnapshot.query.filter_by(user_id=user_id, resource=resource, fetched_at=fetched).delete()
+            db.session.commit()
+            return False
+        return True
+    except SQLAlchemyError as e:
+        # A concurrent prefetch for the same user won the insert; its copy is as good
+        db.session.rollback()
+        logger.warning(f"Snapshot {resource} not saved: {e.__class__.__name__}")
+        return False
+
+
+def _hooked_after(repo_id, fetched):
+    hooked_at = db.session.query(RepositoryIndex.hooked_at).filter_by(repo_id=repo_id).scalar()
+    return hooked_at is not None and hooked_at > fetched
+
+
+def load_snapshot(user_id, resource, max_age):
+    """Return a snapshot's payload if it is at most max_age seconds old."""
+    if not max_age:
+        return None
+    snapshot = db.session.get(GitHubSnapshot, (user_id, resource))
+    if snapshot is None or snapshot.fetched_at + timedelta(seconds=max_age) < datetime.utcnow():
+        return None
+    return current_app.json.loads(snapshot.payload)
+
+
+def repository_snapshot_ttl(repo_id):
+    """How long a repository's snapshots may be served.
+
+    While its webhook is delivering, a push or member event drops them, so
+    they can live for GITHUB_WEBHOOK_SNAPSHOT_TTL; otherwise the short
+    prefetch TTL applies.
+    """
+    webhook_ttl = current_app.config['GITHUB_WEBHOOK_SNAPSHOT_TTL']
+    entry = db.session.get(RepositoryIndex, repo_id)
+    if entry is not None and entry.hooked_at and entry.hooked_at + timedelta(seconds=webhook_ttl) > datetime.utcnow():
+        return webhook_ttl
+    return current_app.config['GITHUB_PREFETCH_TTL']
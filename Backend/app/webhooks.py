@@ -0,0 +1,68 @@
+import hmac
+import hashlib
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from .models import db, GitHubSnapshot, RepositoryIndex, WebhookDelivery, RepositoryCommit, CommitSync
+
+logger = logging.getLogger(__name__)
+
+# Snapshot resources each event makes stale, per action (None = any action)
+INVALIDATES = {
+    'push': {None: ('commits',)},
+    'member': {None: ('collaborators',), 'removed': ('collaborators', 'commits')},
+    'repository': {None: (), 'deleted': ('collaborators', 'commits'),
+                   'transferred': ('collaborators', 'commits'), 'privatized': ('collaborators', 'commits')}
+}
+
+
+def verify_signature(secret, body, signature):
+    """Check an X-Hub-Signature-256 header against the raw request body."""
+    expected = 'sha256=' + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(signature or '', expected)
+
+
+def apply_delivery(delivery_id, event, action, repo):
+    """Record a delivery and drop the data it makes stale, in one transaction.
+
+    Returns {resource: [user ids whose snapshot was dropped]}, or None if
+    this delivery id was handled before.
+    """
+    resources = INVALIDATES[event].get(action, INVALIDATES[event][None])
+    now = datetime.utcnow()
+    repo_id = repo['id']
+
+    try:
+        db.session.add(WebhookDelivery(delivery_id=delivery_id, event=event, received_at=now))
+        db.session.flush()
+
+        dropped = {}
+        for resource in resources:
+            snapshots = GitHubSnapshot.query.filter_by(resource=f'{resource}:{repo_id}')
+            dropped[resource] = [user_id for (user_id,) in snapshots.with_entities(GitHubSnapshot.user_id)]
+            snapshots.delete(synchronize_session=False)
+
+        index = RepositoryIndex.query.filter_by(repo_id=repo_id)
+        if event == 'repository':
+            # Listings embed name, visibility and description; they are short-lived anyway
+            GitHubSnapshot.query.filter_by(resource='repositories').delete(synchronize_session=False)
+            if action == 'deleted':
+                index.delete(synchronize_session=False)
+                RepositoryCommit.query.filter_by(repo_id=repo_id).delete(synchronize_session=False)
+                CommitSync.query.filter_by(repo_id=repo_id).delete(synchronize_session=False)
+            elif action in ('renamed', 'transferred'):
+                index.update({'name': repo['name'], 'full_name': repo['full_name']}, synchronize_session=False)
+        index.update({'hooked_at': now}, synchronize_session=False)
+
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return None
+    return dropped
+
+
+def prune_deliveries(retention):
+    """Forget delivery ids older than retention seconds."""
+    cutoff = datetime.utcnow() - timedelta(seconds=retention)
+    WebhookDelivery.query.filter(WebhookDelivery.received_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
@@ -0,0 +1,145 @@
+"""Broadcast latency of the collaboration WebSocket with many clients per room.
+
+Usage (from Backend/):
+    python benchmarks/bench_collab.py [--rooms 4] [--clients 50] [--messages 20] [--rate 5]
+
+Runs gunicorn with gevent workers and connects --clients WebSocket
+clients to each of --rooms documents. Every client sends --messages
+edits at --rate per second plus a cursor update after each edit; every
+other client in the room should receive each edit. Reports end-to-end
+edit latency (send to receive), delivery ratio and messages per frame.
+With --slow, one extra client per room never reads; once the socket
+buffers fill it should be disconnected (slow_disconnects) without
+holding up the rest. Loopback buffers are several MB, so pair it with
+a large --padding.
+
+Cross-worker fan-out needs Postgres (DATABASE_URL=postgresql://...);
+with the default SQLite database the run uses one worker.
+"""
+import os
+import time
+import json
+import socket
+import base64
+import argparse
+import threading
+from collections import Counter
+import requests
+from simple_websocket import Client, ConnectionClosed
+from common import make_app, make_user, summarize, gunicorn
+
+
+class BenchClient:
+    def __init__(self, url, headers):
+        self.ws = Client.connect(url, headers=headers)
+        self.latencies = []
+        self.frames = 0
+        self.received = Counter()
+        self.closed = None
+        self.thread = threading.Thread(target=self._read, daemon=True)
+        self.thread.start()
+
+    def _read(self):
+        try:
+            while True:
+                frame = self.ws.receive()
+                now = time.time()
+                self.frames += 1
+                for message in json.loads(frame):
+                    self.received[message['type']] += 1
+                    if message['type'] == 'edit':
+                        self.latencies.append(now - message['sent'])
+        except ConnectionClosed:
+            self.closed = self.ws.close_reason
+
+    def send(self, message):
+        self.ws.send(json.dumps(message))
+
+
+def slow_client(url, headers):
+    """Handshake on a raw socket with a tiny receive buffer, then never read."""
+    host, port_path = url[len('ws://'):].split(':', 1)
+    port, path = port_path.split('/', 1)
+    sock = socket.socket()
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    sock.connect((host, int(port)))
+    key = base64.b64encode(os.urandom(16)).decode()
+    sock.sendall((f'GET /{path} HTTP/1.1\r\nHost: {host}\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+                  f'Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n'
+                  f'Authorization: {headers["Authorization"]}\r\n\r\n').encode())
+    sock.recv(1024)
+    return sock
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rooms', type=int, default=4)
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--messages', type=int, default=20)
+    parser.add_argument('--rate', type=float, default=5)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--tick', type=float, default=0.025)
+    parser.add_argument('--padding', type=int, default=200, help='bytes of edit text per message')
+    parser.add_argument('--slow', action='store_true')
+    parser.add_argument('--send-timeout', type=float, default=2)
+    args = parser.parse_args()
+
+    app = make_app()
+    workers = args.workers if os.environ['DATABASE_URL'].startswith('postgres') else 1
+    users = [make_user(app) for _ in range(args.clients)]
+
+    with gunicorn('--workers', str(workers), '--worker-class', 'gevent',
+                  '--worker-connections', str(args.rooms * args.clients * 2 + 100),
+                  COLLAB_TICK=args.tick, COLLAB_SEND_TIMEOUT=args.send_timeout, SKIP_DB_BOOTSTRAP='true', INTERNAL_STATS_TOKEN='bench') as base:
+        ws_base = base.replace('http://', 'ws://')
+        rooms = []
+        for room in range(args.rooms):
+            url = f'{ws_base}/collab/ws/bench/doc-{room}'
+            rooms.append([BenchClient(url, users[i]) for i in range(args.clients)])
+        slow = [slow_client(f'{ws_base}/collab/ws/bench/doc-{room}', users[0]) for room in range(args.rooms)] if args.slow else []
+        time.sleep(1)  # joins and welcomes settle
+
+        text = 'x' * args.padding
+
+        def run_sender(client):
+            for n in range(args.messages):
+                client.send({'type': 'edit', 'seq': n, 'sent': time.time(), 'op': {'insert': text, 'at': n}})
+                client.send({'type': 'cursor', 'line': n, 'ch': 0})
+                time.sleep(1 / args.rate)
+
+        start = time.perf_counter()
+        senders = [threading.Thread(target=run_sender, args=(client,))
+                   for clients in rooms for client in clients]
+        for thread in senders:
+            thread.start()
+        for thread in senders:
+            thread.join()
+        time.sleep(1)  # let the last ticks flush
+        elapsed = time.perf_counter() - start
+
+        clients = [client for clients in rooms for client in clients]
+        latencies = [sample for client in clients for sample in client.latencies]
+        expected = args.rooms * args.clients * args.messages * (args.clients - 1)
+        received = sum(client.received['edit'] for client in clients)
+        messages = sum(sum(client.received.values()) for client in clients)
+        frames = sum(client.frames for client in clients)
+        print({
+            'workers': workers, 'rooms': args.rooms, 'clients_per_room': args.clients, 'tick_ms': args.tick * 1000,
+            'edits_sent': args.rooms * args.clients * args.messages, 'edits_delivered': received,
+            'delivery_ratio': round(received / expected, 4), 'messages_per_frame': round(messages / max(frames, 1), 1),
+            'deliveries_per_s': round(received / elapsed), 'disconnected': sum(1 for c in clients if c.closed),
+            **summarize(latencies)
+        })
+        stats = requests.get(f'{base}/internal/stats', headers={'X-Internal-Token': 'bench'}).json()['collab']
+        print({k: stats[k] for k in ('frames', 'messages_out', 'notifies', 'received_remote', 'slow_disconnects')})
+        for client in clients:
+            try:
+                client.ws.close()
+            except ConnectionClosed:
+                pass
+        for sock in slow:
+            sock.close()
+
+
+if __name__ == '__main__':
+    main()
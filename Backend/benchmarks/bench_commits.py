@@ -0,0 +1,175 @@
+"""Commit mirror: sync throughput, delta cost and query latency at 50k commits.
+
+Usage (from Backend/):
+    python benchmarks/bench_commits.py [--commits 50000] [--push 250] [--merge-depth 5000] [--queries 200] [--latency 0.0]
+
+1. Sync: the first GET /api/github/repository/1/commits mirrors one page
+   inline and queues the backfill job; reports time to first page, time
+   until the mirror is complete, commits/s and upstream calls.
+2. Delta: --push new commits appear upstream; the next read mirrors them
+   (inline, then the job). Then unchanged reads are counted for upstream
+   calls, which are conditional (304) requests.
+3. Merge: a 20-commit branch forked --merge-depth commits back is merged
+   upstream. Its commits keep their old dates, so they sort far below the
+   previous head; checks every one of them and the merge commit are
+   mirrored, and counts upstream calls.
+4. Queries: endpoint and raw query latency for the first page, pages deep
+   in history via the keyset cursor, an author filter and a date window.
+   Also walks every page once to check no commit is repeated or skipped.
+"""
+import time
+import random
+import argparse
+from datetime import timedelta
+from common import make_app, make_user, summarize
+from github_stub import start_stub, commit_sha, COMMIT_EPOCH
+
+URL = '/api/github/repository/1/commits'
+
+
+def wait_complete(client, headers, timeout=600):
+    from app.jobs import jobs
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if not jobs.stats()['active']:
+            body = client.get(URL, headers=headers).get_json()
+            if body['complete'] and not jobs.stats()['active']:
+                return body
+        time.sleep(0.1)
+    raise RuntimeError('Mirror did not complete')
+
+
+def timed(client, headers, params, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        resp = client.get(URL, headers=headers, query_string=params() if callable(params) else params)
+        samples.append(time.perf_counter() - start)
+        assert resp.status_code == 200, resp.get_json()
+    return summarize(samples)
+
+
+def walk(client, headers, limit=100):
+    seen, cursor, pages = [], None, 0
+    while True:
+        params = {'limit': limit, 'fields': 'sha'}
+        if cursor:
+            params['cursor'] = cursor
+        body = client.get(URL, headers=headers, query_string=params).get_json()
+        seen.extend(c['sha'] for c in body['commits'])
+        pages += 1
+        cursor = body['next_cursor']
+        if not cursor:
+            return seen, pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--commits', type=int, default=50000)
+    parser.add_argument('--push', type=int, default=250)
+    parser.add_argument('--merge-depth', type=int, default=5000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.0)
+    args = parser.parse_args()
+
+    stub, stub_url = start_stub(repo_count=1, latency=args.latency, commit_count=args.commits)
+    app = make_app(GITHUB_API_URL=stub_url)
+    client = app.test_client()
+    headers = make_user(app, github_token='mirror-token')
+
+    start = time.perf_counter()
+    resp = client.get(URL, headers=headers)
+    first_page = time.perf_counter() - start
+    assert resp.status_code == 200, resp.get_json()
+    wait_complete(client, headers)
+    elapsed = time.perf_counter() - start
+
+    from app.models import RepositoryCommit
+    from app.commit_mirror import query_commits
+    from app.routes.github import encode_commit_cursor
+    with app.app_context():
+        mirrored = RepositoryCommit.query.filter_by(repo_id=1).count()
+    print({'phase': 'sync', 'commits': mirrored, 'first_page_ms': round(first_page * 1000, 1),
+           'complete_s': round(elapsed, 2), 'commits_per_s': round(mirrored / elapsed),
+           'upstream_calls': stub.state.requests})
+
+    before = stub.state.requests
+    stub.state.commit_count += args.push
+    resp = client.get(URL, headers=headers, query_string={'limit': 1}).get_json()
+    inline_head = resp['commits'][0]['sha']
+    final = wait_complete(client, headers)
+    with app.app_context():
+        mirrored = RepositoryCommit.query.filter_by(repo_id=1).count()
+    print({'phase': 'delta', 'pushed': args.push, 'commits': mirrored,
+           'upstream_calls': stub.state.requests - before, 'head_after_first_read_is_newest':
+           inline_head == final['commits'][0]['sha']})
+
+    before, length = stub.state.requests, 20
+    stub.state.merge_branch(stub.state.commit_count - 1 - args.merge_depth, length)
+    merge = stub.state.commit_count - 1
+    client.get(URL, headers=headers)
+    wait_complete(client, headers)
+    merged = [commit_sha(1, merge)] + [commit_sha(1, (merge, n)) for n in range(length)]
+    with app.app_context():
+        mirrored = RepositoryCommit.query.filter(RepositoryCommit.repo_id == 1, RepositoryCommit.sha.in_(merged)).count()
+    print({'phase': 'merge', 'branch_commits': length, 'forked_commits_back': args.merge_depth,
+           'mirrored': mirrored, 'expected': len(merged), 'upstream_calls': stub.state.requests - before})
+
+    before, not_modified = stub.state.requests, stub.state.not_modified
+    timed(client, headers, {}, 50)
+    print({'phase': 'unchanged reads', 'reads': 50, 'upstream_calls': stub.state.requests - before,
+           'of_which_304': stub.state.not_modified - not_modified})
+
+    total = stub.state.commit_count
+    window = COMMIT_EPOCH + timedelta(minutes=total // 3)
+
+    def at(index):
+        return COMMIT_EPOCH + timedelta(minutes=index)
+
+    def random_keyset():
+        index = random.randrange(total)
+        return at(index), commit_sha(1, index)
+
+    cases = {
+        'first_page': lambda: {},
+        'deep_cursor': lambda: {'after': random_keyset()},
+        'author': lambda: {'author': 'dev3'},
+        'author_email_deep': lambda: {'author': 'dev1@example.com', 'until': at(random.randrange(total))},
+        'date_window': lambda: {'since': window, 'until': window + timedelta(hours=6)}
+    }
+
+    def query_string(kwargs):
+        params = {}
+        if 'after' in kwargs:
+            params['cursor'] = encode_commit_cursor(kwargs['after'])
+        for key in ('since', 'until'):
+            if key in kwargs:
+                params[key] = kwargs[key].isoformat() + 'Z'
+        if 'author' in kwargs:
+            params['author'] = kwargs['author']
+        return params
+
+    for name, case in cases.items():
+        print({'phase': 'endpoint', 'query': name,
+               **timed(client, headers, lambda: query_string(case()), args.queries)})
+
+    with app.app_context():
+        for name, case in cases.items():
+            samples = []
+            for _ in range(args.queries):
+                kwargs = case()
+                start = time.perf_counter()
+                query_commits(1, 30, **kwargs)
+                samples.append(time.perf_counter() - start)
+            print({'phase': 'query', 'query': name, **summarize(samples)})
+
+    start = time.perf_counter()
+    shas, pages = walk(client, headers)
+    print({'phase': 'walk', 'pages': pages, 'commits': len(shas), 'unique': len(set(shas)),
+           'expected': total + length, 's': round(time.perf_counter() - start, 2)})
+    stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Compare gthread and gevent workers against a slow GitHub stub.
+
+Usage (from Backend/):
+    python benchmarks/bench_concurrency.py [--requests 200] [--latency 1.0]
+
+Runs one gunicorn worker per mode and fires --requests concurrent calls at
+/api/github/repository/<id>/collaborators. The stub records how many
+upstream calls were in flight at once, i.e. how many requests one worker
+kept going concurrently.
+
+The burst is the fresh worker's first authenticated traffic, so it also
+races the per-process set-up (session flusher, GitHub pools). A worker
+that stalls there shows up as failed requests and 'WORKER TIMEOUT' lines
+in gunicorn's log, counted here with a --worker-timeout second timeout.
+"""
+import os
+import time
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from common import make_app, make_user, summarize, gunicorn
+from github_stub import start_stub
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=1.0)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--worker-timeout', type=int, default=10)
+    args = parser.parse_args()
+
+    stub, stub_url = start_stub(latency=args.latency)
+    app = make_app(GITHUB_API_URL=stub_url)
+    headers = make_user(app, github_token='stub-token')
+
+    for mode in ('gthread', 'gevent'):
+        stub.state.peak_in_flight = 0
+        log = os.path.join(tempfile.mkdtemp(), 'gunicorn.log')
+        with gunicorn('--workers', '1', '--threads', str(args.threads), '--timeout', str(args.worker_timeout),
+                      '--error-logfile', log,
+                      GUNICORN_WORKER_CLASS=mode, GITHUB_API_URL=stub_url, BCRYPT_WORKERS=0) as base:
+            # Distinct repos so responses can't be served from the ETag cache
+            urls = [f'{base}/github/repository/{i + 1}/collaborators' for i in range(args.requests)]
+
+            def call(url):
+                start = time.perf_counter()
+                try:
+                    status = requests.get(url, headers=headers, timeout=120).status_code
+                except requests.RequestException:
+                    status = None
+                return status, time.perf_counter() - start
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.requests) as pool:
+                results = list(pool.map(call, urls))
+            wall = time.perf_counter() - start
+
+        print({
+            'mode': mode,
+            'wall_s': round(wall, 2),
+            'peak_upstream_in_flight': stub.state.peak_in_flight,
+            'ok': sum(1 for status, _ in results if status == 200),
+            'failed': sum(1 for status, _ in results if status != 200),
+            'worker_timeouts': open(log).read().count('WORKER TIMEOUT'),
+            **summarize([elapsed for _, elapsed in results])
+        })
+    stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
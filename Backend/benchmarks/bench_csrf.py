@@ -0,0 +1,67 @@
+"""Mutation latency with a CSRF fetch per request vs one token per session.
+
+Usage (from Backend/):
+    python benchmarks/bench_csrf.py [--requests 200] [--rtt 0.05]
+
+Drives POST /auth/sessions/invalidate-others (a cheap mutating route)
+the way api.js used to (GET /auth/csrf-token before every mutation) and
+the way it does now (token fetched once). --rtt adds a simulated network
+round trip per HTTP request. Also checks that missing, mismatched and
+forged tokens are refused with 403.
+"""
+import time
+import argparse
+import threading
+import requests
+from werkzeug.serving import make_server
+from common import make_app, make_user, csrf_session, summarize, free_port
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--rtt', type=float, default=0.05)
+    args = parser.parse_args()
+
+    app = make_app()
+    port = free_port()
+    server = make_server('127.0.0.1', port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{port}/api'
+    headers = make_user(app)
+    url = f'{base}/auth/sessions/invalidate-others'
+
+    def call(session, method, target, **kwargs):
+        time.sleep(args.rtt)
+        return session.request(method, target, **kwargs)
+
+    for mode in ('per request', 'per session'):
+        session, samples = requests.Session(), []
+        token = None
+        for _ in range(args.requests):
+            start = time.perf_counter()
+            if mode == 'per request' or token is None:
+                token = call(session, 'GET', f'{base}/auth/csrf-token').json()['csrfToken']
+            resp = call(session, 'POST', url, headers=dict(headers, **{'X-CSRFToken': token}))
+            samples.append(time.perf_counter() - start)
+            assert resp.status_code == 200, resp.text
+        print({'csrf_fetch': mode, **summarize(samples)})
+
+    session = csrf_session(base)
+    other = csrf_session(base)
+    checks = {
+        'no_header': requests.post(url, headers=headers).status_code,
+        'header_without_cookie': requests.post(url, headers=dict(headers, **{'X-CSRFToken': session.headers['X-CSRFToken']})).status_code,
+        'mismatched_pair': session.post(url, headers=dict(headers, **{'X-CSRFToken': other.headers['X-CSRFToken']})).status_code,
+        'forged_pair': requests.post(url, headers=dict(headers, **{'X-CSRFToken': 'forged'}),
+                                     cookies={'csrf_token': 'forged'}).status_code,
+        'token_endpoint_cache': session.get(f'{base}/auth/csrf-token').headers.get('Cache-Control'),
+        'same_token_reissued': session.get(f'{base}/auth/csrf-token').json()['csrfToken'] == session.headers['X-CSRFToken'],
+        'valid_pair': session.post(url, headers=headers).status_code,
+    }
+    print(checks)
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""Document store: op ingest throughput and cold open time as history grows.
+
+Usage (from Backend/):
+    python benchmarks/bench_documents.py [--requests 1000] [--history 100000] [--writers 4]
+
+1. Ingest: one writer posts --requests batches of 1 and of 10 ops to
+   POST /api/documents/<id>/operations (compaction on, as deployed).
+2. Rebase: --writers clients post concurrently from stale base versions
+   through a real server, then the final text is checked to contain
+   every insert exactly once.
+3. Open: a document with --history ops (bulk-inserted) is opened with
+   GET /api/documents/<id> before and after compaction.
+"""
+import time
+import argparse
+import threading
+import requests
+from werkzeug.serving import make_server
+from common import make_app, make_user, summarize, free_port
+
+
+def ingest(client, headers, doc_id, requests_count, batch):
+    version, length, samples = 0, 0, []
+    start = time.perf_counter()
+    for _ in range(requests_count):
+        operations = []
+        for _ in range(batch):
+            operations.append([length, 'x'])
+            length += 1
+        t = time.perf_counter()
+        resp = client.post(f'/api/documents/{doc_id}/operations', headers=headers,
+                           json={'base_version': version, 'operations': operations})
+        samples.append(time.perf_counter() - t)
+        assert resp.status_code == 200, resp.get_json()
+        version = resp.get_json()['version']
+    elapsed = time.perf_counter() - start
+    return {'batch': batch, 'ops_per_s': round(requests_count * batch / elapsed),
+            'requests_per_s': round(requests_count / elapsed), **summarize(samples)}
+
+
+def concurrent_writers(app, headers, doc_id, writers, edits):
+    port = free_port()
+    server = make_server('127.0.0.1', port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{port}/api/documents/{doc_id}'
+    statuses, missed, errors = [], [], []
+
+    def write(writer):
+        session = requests.Session()
+        doc = session.get(url, headers=headers).json()
+        version = doc['version']
+        for n in range(edits):
+            # Every writer inserts at the start, as of the version it last saw
+            token = f'<{writer}:{n}>'
+            for _ in range(5):
+                resp = session.post(f'{url}/operations', headers=headers,
+                                    json={'base_version': version, 'operations': [[token, doc['length']]]})
+                statuses.append(resp.status_code)
+                if resp.status_code != 409:
+                    break
+                errors.append(resp.json()['error'])
+            if resp.status_code != 200:
+                continue
+            body = resp.json()
+            missed.append(len(body['missed']))
+            # Without transforming local state, keep the old base to force rebases
+            if n % 5 == 4:
+                doc = session.get(url, headers=headers).json()
+                version = doc['version']
+
+    threads = [threading.Thread(target=write, args=(w,)) for w in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    content = requests.get(url, headers=headers).json()['content']
+    server.shutdown()
+    expected = [f'<{w}:{n}>' for w in range(writers) for n in range(edits)]
+    return {
+        'writers': writers, 'statuses': {s: statuses.count(s) for s in set(statuses)},
+        'rebased_over_avg': round(sum(missed) / max(len(missed), 1), 1),
+        'conflicts': sorted(set(errors)),
+        'all_inserts_once': all(content.count(token) == 1 for token in expected)
+    }
+
+
+def seed_history(app, user_headers, client, history):
+    from app import db
+    from app.models import Document, DocumentOperation
+
+    doc_id = client.post('/api/documents', headers=user_headers, json={'title': 'history.py'}).get_json()['id']
+    with app.app_context():
+        rows = [{'document_id': doc_id, 'version': v + 1, 'operation': f'[{v},"x"]' if v else '["x"]'}
+                for v in range(history)]
+        for start in range(0, history, 10000):
+            db.session.execute(DocumentOperation.__table__.insert(), rows[start:start + 10000])
+        document = db.session.get(Document, doc_id)
+        document.version = document.length = history
+        db.session.commit()
+    return doc_id
+
+
+def open_times(client, headers, doc_id, runs=5):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        resp = client.get(f'/api/documents/{doc_id}', headers=headers)
+        samples.append(time.perf_counter() - start)
+        assert resp.status_code == 200, resp.get_json()
+    return {'first_ms': round(samples[0] * 1000, 2), **summarize(samples)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--history', type=int, default=100000)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--edits', type=int, default=25)
+    args = parser.parse_args()
+
+    app = make_app()
+    client = app.test_client()
+    headers = make_user(app)
+
+    for batch in (1, 10):
+        doc_id = client.post('/api/documents', headers=headers, json={'title': 'ingest.py'}).get_json()['id']
+        print({'phase': 'ingest', **ingest(client, headers, doc_id, args.requests, batch)})
+
+    doc_id = client.post('/api/documents', headers=headers, json={'title': 'shared.py', 'content': '|'}).get_json()['id']
+    print({'phase': 'rebase', **concurrent_writers(app, headers, doc_id, args.writers, args.edits)})
+
+    # Measure replay of the full history, then let compaction run as it would in the background
+    app.config['DOCUMENT_SNAPSHOT_EVERY'] = 0
+    doc_id = seed_history(app, headers, client, args.history)
+    print({'phase': 'open', 'history': args.history, 'snapshot': 'none', **open_times(client, headers, doc_id)})
+
+    from app.documents import compact
+    with app.app_context():
+        start = time.perf_counter()
+        result = compact(doc_id)
+        print({'phase': 'compact', **result, 'ms': round((time.perf_counter() - start) * 1000, 2)})
+    print({'phase': 'open', 'history': args.history, 'snapshot': 'head', **open_times(client, headers, doc_id)})
+
+
+if __name__ == '__main__':
+    main()
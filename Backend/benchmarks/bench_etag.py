@@ -0,0 +1,52 @@
+"""Polling cost with and without If-None-Match on our own API.
+
+Usage (from Backend/):
+    python benchmarks/bench_etag.py [--repos 300] [--polls 50]
+
+Polls /auth/verify and /github/repositories the way the frontend does,
+first ignoring ETags, then sending back the last ETag. Reports statuses,
+bytes received and latency for each, per Accept-Encoding.
+"""
+import time
+import argparse
+from collections import Counter
+from common import make_app, make_user, summarize
+from github_stub import start_stub
+
+PATHS = ['/api/auth/verify', '/api/github/repositories']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repos', type=int, default=300)
+    parser.add_argument('--polls', type=int, default=50)
+    args = parser.parse_args()
+
+    stub, stub_url = start_stub(repo_count=args.repos)
+    app = make_app(GITHUB_API_URL=stub_url)
+    client = app.test_client()
+    headers = make_user(app, github_token='etag-token')
+
+    for path in PATHS:
+        for encoding in ('identity', 'br'):
+            for conditional in (False, True):
+                etag, samples, sizes, statuses = None, [], [], Counter()
+                for _ in range(args.polls):
+                    request_headers = dict(headers, **{'Accept-Encoding': encoding})
+                    if conditional and etag:
+                        request_headers['If-None-Match'] = etag
+                    start = time.perf_counter()
+                    resp = client.get(path, headers=request_headers)
+                    samples.append(time.perf_counter() - start)
+                    statuses[resp.status_code] += 1
+                    sizes.append(len(resp.get_data()))
+                    etag = resp.headers.get('ETag', etag)
+                print({
+                    'path': path, 'encoding': encoding, 'if_none_match': conditional,
+                    'statuses': dict(statuses), 'bytes_total': sum(sizes), **summarize(samples)
+                })
+    stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
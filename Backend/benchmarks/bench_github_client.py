@@ -0,0 +1,47 @@
+"""Exercise the github blueprint against the local stub and report cache stats.
+
+Usage (from Backend/):
+    python benchmarks/bench_github_client.py [--rounds 50] [--latency 0.05]
+
+The first round is cold; later rounds revalidate with If-None-Match and
+should come back as 304s (or local hits while GitHub's max-age holds).
+"""
+import time
+import argparse
+from common import make_app, make_user, summarize
+from github_stub import start_stub
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.02)
+    args = parser.parse_args()
+
+    stub, base_url = start_stub(repo_count=30, latency=args.latency)
+    app = make_app(GITHUB_API_URL=base_url)
+    from app.github_client import github_client
+
+    client = app.test_client()
+    headers = make_user(app, github_token='stub-token')
+    paths = ['/api/github/repositories',
+             '/api/github/repository/1/collaborators',
+             '/api/github/repository/1/commits']
+
+    cold, warm = [], []
+    for round_no in range(args.rounds):
+        for path in paths:
+            start = time.perf_counter()
+            resp = client.get(path, headers=headers)
+            (cold if round_no == 0 else warm).append(time.perf_counter() - start)
+            assert resp.status_code == 200, resp.get_json()
+
+    print({'phase': 'cold', **summarize(cold)})
+    print({'phase': 'warm', **summarize(warm)})
+    print({'client': github_client.stats(),
+           'stub': {'requests': stub.state.requests, 'not_modified': stub.state.not_modified}})
+    stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
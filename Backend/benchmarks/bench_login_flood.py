@@ -0,0 +1,76 @@
+"""Measure /api/health latency while /api/auth/login is being flooded.
+
+Usage (from Backend/):
+    python benchmarks/bench_login_flood.py [--seconds 10] [--clients 32]
+
+Runs gunicorn (gthread, one worker) twice: once hashing inline
+(BCRYPT_WORKERS=0) and once on the bcrypt process pool with admission
+control. Health-check latency should stay flat in the second run, with
+excess logins shed as 503s (flood clients honour Retry-After).
+"""
+import os
+import time
+import argparse
+import threading
+from collections import Counter
+import requests
+from common import make_app, csrf_session, summarize, gunicorn
+
+
+def seed_user(email, password):
+    app = make_app(BCRYPT_WORKERS=0)
+    from app import db
+    from app.models import User
+    with app.app_context():
+        user = User(username=email.split('@')[0], email=email)
+        user.set_password(password)
+        db.session.add(user)
+        db.session.commit()
+
+
+def run(bcrypt_workers, args):
+    with gunicorn('--workers', '1', '--worker-class', 'gthread', '--threads', str(args.threads),
+                  BCRYPT_WORKERS=bcrypt_workers) as base:
+        stop = time.monotonic() + args.seconds
+        statuses = Counter()
+
+        def flood():
+            session = csrf_session(base)
+            while time.monotonic() < stop:
+                resp = session.post(f'{base}/auth/login', json={'email': args.email, 'password': 'flood-password'})
+                statuses[resp.status_code] += 1
+                if resp.status_code == 503:
+                    time.sleep(float(resp.headers.get('Retry-After', 1)))
+
+        flooders = [threading.Thread(target=flood) for _ in range(args.clients)]
+        for thread in flooders:
+            thread.start()
+
+        health = []
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            requests.get(f'{base}/health', timeout=30)
+            health.append(time.perf_counter() - start)
+            time.sleep(0.05)
+
+        for thread in flooders:
+            thread.join()
+        return {'bcrypt_workers': bcrypt_workers, 'health': summarize(health), 'login_statuses': dict(statuses)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--pool', type=int, default=os.cpu_count())
+    parser.add_argument('--email', default=f'flood{time.time_ns()}@example.com')
+    args = parser.parse_args()
+
+    seed_user(args.email, 'flood-password')
+    for workers in (0, args.pool):
+        print(run(workers, args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""Per-request cost of the metrics hooks.
+
+Usage (from Backend/):
+    python benchmarks/bench_metrics_overhead.py [--requests 5000]
+
+Times /api/auth/verify (one cached session, no upstream calls) through the
+test client with METRICS_ENABLED off and on.
+"""
+import time
+import argparse
+from common import make_app, make_user, summarize
+
+
+def run(enabled, n_requests):
+    app = make_app(METRICS_ENABLED='true' if enabled else 'false')
+    client = app.test_client()
+    headers = make_user(app)
+
+    samples = []
+    for _ in range(n_requests):
+        start = time.perf_counter()
+        client.get('/api/auth/verify', headers=headers)
+        samples.append(time.perf_counter() - start)
+    return {'metrics': 'on' if enabled else 'off', **summarize(samples)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=5000)
+    args = parser.parse_args()
+
+    for enabled in (False, True):
+        print(run(enabled, args.requests))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""First dashboard view after GitHub login, with and without the prefetch job.
+
+Usage (from Backend/):
+    python benchmarks/bench_prefetch.py [--repos 250] [--latency 0.2] [--redirect 0.5]
+
+Logs in through /auth/oauth/github against the stub, waits --redirect
+seconds (the browser's round trip back to the dashboard), then loads the
+repository list the way Dashboard.jsx does (?limit=100, following
+next_cursor) and the recent commits of the first repository. Reports how
+long that took and how many calls reached the stub meanwhile.
+"""
+import time
+import argparse
+import threading
+import requests
+from werkzeug.serving import make_server
+from common import make_app, csrf_session, free_port
+from github_stub import start_stub
+
+
+def dashboard(base, headers):
+    repos, cursor = [], None
+    while True:
+        params = {'cursor': cursor} if cursor else {'limit': 100}
+        data = requests.get(f'{base}/github/repositories', headers=headers, params=params).json()
+        repos += data['repositories']
+        cursor = data['next_cursor']
+        if not cursor:
+            break
+    commits = requests.get(f'{base}/github/repository/{repos[0]["id"]}/commits', headers=headers)
+    assert commits.status_code == 200, commits.text
+    return len(repos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repos', type=int, default=250)
+    parser.add_argument('--latency', type=float, default=0.2)
+    parser.add_argument('--redirect', type=float, default=0.5)
+    parser.add_argument('--logins', type=int, default=5)
+    args = parser.parse_args()
+
+    stub, stub_url = start_stub(repo_count=args.repos, latency=args.latency)
+    for ttl in (0, 120):
+        app = make_app(GITHUB_API_URL=stub_url, GITHUB_OAUTH_URL=stub_url,
+                       GITHUB_CLIENT_ID='bench', GITHUB_CLIENT_SECRET='bench',
+                       GITHUB_PREFETCH_TTL=ttl)
+        from app.jobs import jobs
+
+        port = free_port()
+        server = make_server('127.0.0.1', port, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f'http://127.0.0.1:{port}/api'
+
+        timings, upstream = [], []
+        session = csrf_session(base)
+        for n in range(args.logins):
+            login = session.post(f'{base}/auth/oauth/github', json={'code': f'prefetch{ttl}x{n}{time.time_ns()}'})
+            headers = {'Authorization': f'Bearer {login.json()["token"]}'}
+            time.sleep(args.redirect)
+
+            before = stub.state.requests
+            start = time.perf_counter()
+            count = dashboard(base, headers)
+            timings.append(time.perf_counter() - start)
+            upstream.append(stub.state.requests - before)
+
+        server.shutdown()
+        print({
+            'prefetch': bool(ttl),
+            'repos': count,
+            'dashboard_ms': [round(t * 1000, 1) for t in timings],
+            'upstream_calls_during_view': upstream,
+            'jobs': jobs.stats()
+        })
+    stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Dashboard refreshes against a rate-limited stub, with and without stale-while-revalidate.
+
+Usage (from Backend/):
+    python benchmarks/bench_rate_limit.py [--limit 60] [--rounds 40]
+
+The stub allows --limit requests per token and makes every response look
+changed, so each revalidation costs quota. The "off" run disables the
+thresholds (-1), so cached data is only used after GitHub rejects a call;
+the "swr" run uses --low/--reserve. Reports statuses, X-Data-Freshness counts, upstream
+requests and how many of them GitHub would have rejected.
+"""
+import time
+import argparse
+from collections import Counter
+from common import make_app, make_user
+from github_stub import start_stub
+
+PATHS = ['/api/github/repositories',
+         '/api/github/repository/1/collaborators',
+         '/api/github/repository/1/commits']
+
+
+def run(mode, stub_url, stub, args, low, reserve):
+    app = make_app(GITHUB_API_URL=stub_url, GITHUB_RATE_LIMIT_LOW=low, GITHUB_RATE_LIMIT_RESERVE=reserve)
+    from app.github_client import github_client
+
+    client = app.test_client()
+    headers = make_user(app, github_token=f'rate-{mode}')
+    before = (stub.state.requests, stub.state.rate_limited)
+    statuses, freshness = Counter(), Counter()
+    for _ in range(args.rounds):
+        for path in PATHS:
+            resp = client.get(path, headers=headers)
+            statuses[resp.status_code] += 1
+            freshness[resp.headers.get('X-Data-Freshness')] += 1
+        time.sleep(args.pause)
+
+    time.sleep(0.5)  # let queued background refreshes land
+    stats = github_client.stats()
+    print({
+        'mode': mode,
+        'statuses': dict(statuses),
+        'freshness': dict(freshness),
+        'upstream_requests': stub.state.requests - before[0],
+        'upstream_rejected': stub.state.rate_limited - before[1],
+        'served_stale': stats['stale'],
+        'refreshes': stats['refreshes'],
+        'refreshes_deferred': stats['refreshes_deferred']
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--limit', type=int, default=60, help='stub requests per token per window')
+    parser.add_argument('--rounds', type=int, default=40, help='dashboard refreshes (3 calls each)')
+    parser.add_argument('--low', type=int, default=30)
+    parser.add_argument('--reserve', type=int, default=10)
+    parser.add_argument('--pause', type=float, default=0.01)
+    args = parser.parse_args()
+
+    stub, stub_url = start_stub(repo_count=30, rate_limit=args.limit, volatile=True)
+    run('off', stub_url, stub, args, low=-1, reserve=-1)
+    run('swr', stub_url, stub, args, low=args.low, reserve=args.reserve)
+    stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
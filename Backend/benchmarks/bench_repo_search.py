@@ -0,0 +1,172 @@
+"""Repository search: index build time, query latency and LRU bounds at 5,000 repos.
+
+Usage (from Backend/):
+    python benchmarks/bench_repo_search.py [--repos 5000] [--queries 2000] [--users 50] [--latency 0.0]
+
+1. Build: the first GET /api/github/repositories/search lists every repo
+   from the stub and indexes it; reports that request, the index build
+   alone and the upstream calls. A second user's index is built from the
+   prefetched snapshot instead, with no upstream calls.
+2. Queries: raw index latency (p50/p95/p99) for exact names, name
+   prefixes, typos, multi-word and language queries over a corpus of
+   varied names, next to a linear substring scan of the same listing,
+   plus the endpoint latency, uncached per-word matches and whether the
+   intended repo ranked first. 'words' reverses a name's words, so a repo
+   already named in that order rightly outranks the intended one.
+3. LRU: --users users search with REPO_SEARCH_MAX_REPOS sized for half of
+   them; reports evictions and the repositories held.
+"""
+import time
+import random
+import argparse
+from common import make_app, make_user, summarize
+from github_stub import start_stub, make_repo
+
+WORDS = ['api', 'auth', 'billing', 'cache', 'client', 'dashboard', 'deploy', 'docs', 'engine', 'gateway',
+         'graph', 'infra', 'ingest', 'kafka', 'lambda', 'mobile', 'monitor', 'notify', 'payments', 'pipeline',
+         'proxy', 'queue', 'render', 'search', 'server', 'service', 'storage', 'stream', 'sync', 'voice', 'web']
+LANGUAGES = ['Python', 'JavaScript', 'TypeScript', 'Go', 'Rust', 'Java', None]
+
+
+def corpus(count, seed=7):
+    """count repositories with distinct names made of 2-3 words."""
+    rng = random.Random(seed)
+    repos, names = [], set()
+    while len(repos) < count:
+        name = '-'.join(rng.sample(WORDS, rng.choice((2, 3))))
+        if name in names:
+            name = f'{name}-{len(repos)}'
+        names.add(name)
+        repo = make_repo(len(repos) + 1, owner=rng.choice(['acme', 'acme-labs', 'octocat']))
+        repo.update(name=name, full_name=f"{repo['owner']['login']}/{name}",
+                    description=f"The {' '.join(rng.sample(WORDS, 4))} component",
+                    language=rng.choice(LANGUAGES), stargazers_count=rng.randrange(5000))
+        repos.append(repo)
+    return repos
+
+
+def typo(word, rng):
+    i = rng.randrange(1, len(word) - 1)
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def linear_scan(repositories, query, limit=20):
+    """What a client-side filter does: substring match on each field, no ranking by relevance."""
+    needle = query.lower()
+    hits = [repo for repo in repositories
+            if any(needle in (repo.get(field) or '').lower() for field in ('name', 'full_name', 'description', 'language'))]
+    return sorted(hits, key=lambda repo: -repo['stargazers_count'])[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repos', type=int, default=5000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.0)
+    args = parser.parse_args()
+
+    stub, stub_url = start_stub(repo_count=args.repos, latency=args.latency)
+    app = make_app(GITHUB_API_URL=stub_url, REPO_SEARCH_MAX_REPOS=args.repos * args.users // 2)
+    client = app.test_client()
+
+    from app import db
+    from app.repo_search import repo_search, RepositoryIndex
+    from app.snapshots import save_snapshot
+    from app.routes.github import format_repository
+
+    headers = make_user(app, github_token='search-token')
+    before = stub.state.requests
+    start = time.perf_counter()
+    resp = client.get('/api/github/repositories/search', headers=headers, query_string={'q': 'repo-42'})
+    cold = time.perf_counter() - start
+    assert resp.status_code == 200, resp.get_json()
+    print({'phase': 'build', 'source': 'github', 'repos': args.repos, 'first_search_ms': round(cold * 1000, 1),
+           'index_ms': round(repo_search.stats()['build_time'] * 1000, 1), 'upstream_calls': stub.state.requests - before,
+           'top': resp.get_json()['repositories'][0]['name']})
+
+    repositories = [format_repository(repo) for repo in corpus(args.repos)]
+    snapshot_headers = make_user(app, github_token='snapshot-token')
+    with app.app_context():
+        from app.models import User
+        user = User.query.order_by(User.id.desc()).first()
+        save_snapshot(user.id, 'repositories', repositories)
+        db.session.commit()
+    before, built = stub.state.requests, repo_search.stats()['build_time']
+    start = time.perf_counter()
+    resp = client.get('/api/github/repositories/search', headers=snapshot_headers, query_string={'q': 'voice'})
+    assert resp.status_code == 200, resp.get_json()
+    print({'phase': 'build', 'source': 'snapshot', 'repos': args.repos,
+           'first_search_ms': round((time.perf_counter() - start) * 1000, 1),
+           'index_ms': round((repo_search.stats()['build_time'] - built) * 1000, 1),
+           'upstream_calls': stub.state.requests - before})
+
+    index = RepositoryIndex(repositories)
+    rng = random.Random(1)
+
+    def pick():
+        return rng.choice(repositories)
+
+    def exact():
+        repo = pick()
+        return repo['name'], repo['name']
+
+    def prefix():
+        repo = pick()
+        return repo['name'][:max(3, len(repo['name']) // 2)], None
+
+    def misspelt():
+        repo = pick()
+        return '-'.join(typo(word, rng) if len(word) > 3 and word.isalpha() else word for word in repo['name'].split('-')), repo['name']
+
+    def words():
+        repo = pick()
+        return ' '.join(reversed(repo['name'].split('-'))), repo['name']
+
+    def language():
+        return rng.choice([l for l in LANGUAGES if l]), None
+
+    cases = {'exact': exact, 'prefix': prefix, 'typo': misspelt, 'words': words, 'language': language}
+    for name, case in cases.items():
+        queries = [case() for _ in range(args.queries)]
+        samples, cold, top = [], [], 0
+        for query, expected in queries:
+            start = time.perf_counter()
+            results = index.search(query)
+            samples.append(time.perf_counter() - start)
+            top += bool(expected and results and results[0]['name'] == expected)
+        for query, _ in queries[:200]:
+            index._matches.clear()
+            start = time.perf_counter()
+            index.search(query)
+            cold.append(time.perf_counter() - start)
+        scan = []
+        for query, _ in queries[:200]:
+            start = time.perf_counter()
+            linear_scan(repositories, query)
+            scan.append(time.perf_counter() - start)
+        ranked = {'top1': round(top / len(queries), 3)} if queries[0][1] else {}
+        print({'phase': 'query', 'query': name, **summarize(samples), **ranked,
+               'uncached_p50_ms': summarize(cold)['p50_ms'], 'linear_scan_p50_ms': summarize(scan)['p50_ms']})
+
+    samples = []
+    for _ in range(200):
+        query, _ = misspelt()
+        start = time.perf_counter()
+        resp = client.get('/api/github/repositories/search', headers=snapshot_headers,
+                          query_string={'q': query, 'fields': 'id,name,full_name'})
+        samples.append(time.perf_counter() - start)
+        assert resp.status_code == 200, resp.get_json()
+    print({'phase': 'endpoint', 'query': 'typo', **summarize(samples)})
+
+    all_headers = [make_user(app, github_token=f'lru-{n}') for n in range(args.users)]
+    for user_headers in all_headers:
+        client.get('/api/github/repositories/search', headers=user_headers, query_string={'q': 'repo'})
+    stats = repo_search.stats()
+    print({'phase': 'lru', 'users_searched': args.users + 2, 'max_repos': repo_search.max_repos,
+           'users_held': stats['users'], 'repositories_held': stats['repositories'], 'evictions': stats['evictions']})
+    stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""Time /api/github/repositories for a large account against the local stub.
+
+Usage (from Backend/):
+    python benchmarks/bench_repositories.py [--repos 1200] [--latency 0.1]
+
+Reports the full listing with serial (one page worker) and concurrent page
+fetching, and the time to the first page through the cursor API.
+"""
+import time
+import argparse
+from common import make_app, make_user, summarize
+from github_stub import start_stub
+
+
+def timed(client, path, headers, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        resp = client.get(path, headers=headers)
+        samples.append(time.perf_counter() - start)
+        assert resp.status_code == 200, resp.get_json()
+    return samples, resp.get_json()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repos', type=int, default=1200)
+    parser.add_argument('--latency', type=float, default=0.1)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    stub, base_url = start_stub(repo_count=args.repos, latency=args.latency)
+    for workers in (1, 8):
+        app = make_app(GITHUB_API_URL=base_url, GITHUB_PAGE_WORKERS=workers,
+                       GITHUB_CACHE_SIZE=0)
+        client = app.test_client()
+        headers = make_user(app, github_token='stub-token')
+
+        samples, body = timed(client, '/api/github/repositories', headers, args.runs)
+        assert body['total_count'] == args.repos
+        print({'mode': f'full listing, {workers} page worker(s)', **summarize(samples)})
+
+    samples, body = timed(client, '/api/github/repositories?limit=100', headers, args.runs)
+    print({'mode': 'first page via cursor API', 'next_cursor': bool(body['next_cursor']), **summarize(samples)})
+    stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
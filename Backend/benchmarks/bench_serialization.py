@@ -0,0 +1,88 @@
+"""Serialization time and payload size of a 1,000-repository listing.
+
+Usage (from Backend/):
+    python benchmarks/bench_serialization.py [--repos 1000] [--iterations 200]
+
+Part one times building the JSON response for --repos formatted
+repositories with Flask's default provider and with orjson. It also
+reports body size with ?fields= projection and with gzip/br. Part two
+calls /api/github/repositories end to end with each provider and
+encoding, served from a stored snapshot so GitHub round trips and the
+repository index upsert don't drown out the encoding cost.
+"""
+import gzip
+import time
+import argparse
+import statistics
+from common import make_app, make_user, summarize
+from github_stub import start_stub, make_repo
+
+DASHBOARD_FIELDS = 'id,name,private,description,stargazers_count,forks_count,language,updated_at'
+
+
+def timed(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return round(statistics.median(samples) * 1000, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repos', type=int, default=1000)
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    stub, stub_url = start_stub(repo_count=args.repos)
+    app = make_app(GITHUB_API_URL=stub_url)
+    import brotli
+    from flask.json.provider import DefaultJSONProvider
+    from app.json_provider import OrjsonProvider
+    from app.routes.github import format_repository, parse_fields, project
+
+    repos = [format_repository(make_repo(i)) for i in range(1, args.repos + 1)]
+    trimmed = [project(repo, parse_fields(DASHBOARD_FIELDS)) for repo in repos]
+    document = {'repositories': repos, 'total_count': len(repos), 'next_cursor': None}
+
+    with app.app_context():
+        for name, provider in (('default', DefaultJSONProvider(app)), ('orjson', OrjsonProvider(app))):
+            print({'provider': name, 'response_ms': timed(lambda: provider.response(document), args.iterations)})
+
+        body = app.json.response(document).get_data()
+        small = app.json.response({'repositories': trimmed}).get_data()
+        for label, payload in (('all fields', body), ('?fields=dashboard', small)):
+            print({
+                'payload': label,
+                'raw_bytes': len(payload),
+                'gzip_bytes': len(gzip.compress(payload, 6)),
+                'br_bytes': len(brotli.compress(payload, quality=4)),
+                'gzip_ms': timed(lambda: gzip.compress(payload, 6), 50),
+                'br_ms': timed(lambda: brotli.compress(payload, quality=4), 50)
+            })
+
+    for provider in ('default', 'orjson'):
+        app = make_app(GITHUB_API_URL=stub_url, JSON_PROVIDER=provider, GITHUB_PREFETCH_TTL=3600)
+        from app.models import User
+        from app.snapshots import save_snapshot
+        headers = make_user(app, github_token='serialize-token')
+        with app.app_context():
+            save_snapshot(User.query.order_by(User.id.desc()).first().id, 'repositories', repos)
+        client = app.test_client()
+        for encoding, fields in (('identity', None), ('gzip', None), ('br', None), ('br', DASHBOARD_FIELDS)):
+            request_headers = dict(headers, **{'Accept-Encoding': encoding})
+            query = {'fields': fields} if fields else {}
+            samples, size = [], 0
+            for _ in range(20):
+                start = time.perf_counter()
+                resp = client.get('/api/github/repositories', headers=request_headers, query_string=query)
+                samples.append(time.perf_counter() - start)
+                size = len(resp.get_data())
+            print({'provider': provider, 'encoding': encoding, 'fields': bool(fields), 'wire_bytes': size,
+                   **summarize(samples)})
+    stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
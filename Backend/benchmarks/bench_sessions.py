@@ -0,0 +1,143 @@
+"""Sessions table: write load of last-seen tracking, flush cost, revocation.
+
+Usage (from Backend/):
+    python benchmarks/bench_sessions.py [--users 200] [--devices 3] [--requests 20000] [--flush-rows 10000]
+
+1. Requests: --requests GET /api/auth/verify spread over --users x
+   --devices sessions, first with an after_request hook that writes
+   last_seen_at on every request (what naive bookkeeping costs), then
+   with the write-behind tracker and one flush at the end. Reports
+   requests/s and the SQL writes each run issued.
+2. Flush: --flush-rows distinct sessions touched, then one flush() timed.
+3. Revocation: one device revoked, then all others, checking which
+   tokens still authenticate (through the verified-session cache).
+"""
+import time
+import argparse
+from datetime import datetime
+from sqlalchemy import event
+from common import make_app, make_user
+
+
+def add_devices(app, headers, devices):
+    """Extra sessions for the user behind headers; returns all their headers."""
+    import jwt
+    from app import db
+    from app.models import User
+    from app.routes.auth import generate_token, SECRET_KEY
+    from app.sessions import open_session
+
+    user_id = jwt.decode(headers['Authorization'].split(' ')[1], SECRET_KEY, algorithms=['HS256'])['sub']
+    result = [headers]
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        for n in range(devices - 1):
+            session_id = open_session(user, f'device-{n}')
+            db.session.commit()
+            result.append({'Authorization': f'Bearer {generate_token(user_id, session_id)}'})
+    return result
+
+
+def count_writes(app):
+    from app import db
+
+    counts = {'writes': 0}
+    with app.app_context():
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def count(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith(('UPDATE', 'INSERT', 'DELETE')):
+                # An executemany is one round trip carrying many rows
+                counts['writes'] += 1
+    return counts
+
+
+def run_requests(client, tokens, requests_count):
+    start = time.perf_counter()
+    for n in range(requests_count):
+        resp = client.get('/api/auth/verify', headers=tokens[n % len(tokens)])
+        assert resp.status_code == 200, resp.get_json()
+    return time.perf_counter() - start
+
+
+def naive_hook(app):
+    from app import db
+    from flask import g
+    from app.models import UserSession
+
+    def write_last_seen(response):
+        session_id = getattr(g, 'session_id', None)
+        if session_id:
+            UserSession.query.filter_by(id=session_id).update({'last_seen_at': datetime.utcnow()})
+            db.session.commit()
+        return response
+    return write_last_seen
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--devices', type=int, default=3)
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--flush-rows', type=int, default=10000)
+    args = parser.parse_args()
+
+    app = make_app(CSRF_ENABLED='false', SESSION_TOUCH_INTERVAL=3600)
+    from app.sessions import session_tracker
+
+    client = app.test_client()
+    tokens = [h for _ in range(args.users) for h in add_devices(app, make_user(app), args.devices)]
+    writes = count_writes(app)
+
+    hook = naive_hook(app)
+    app.after_request_funcs.setdefault(None, []).append(hook)
+    elapsed = run_requests(client, tokens, args.requests)
+    app.after_request_funcs[None].remove(hook)
+    print({'phase': 'requests', 'last_seen': 'per-request UPDATE', 'sessions': len(tokens),
+           'requests_per_s': round(args.requests / elapsed), 'sql_writes': writes['writes']})
+
+    with app.app_context():
+        session_tracker.flush()  # drop touches from the naive run
+    writes['writes'] = 0
+    elapsed = run_requests(client, tokens, args.requests)
+    with app.app_context():
+        start = time.perf_counter()
+        rows = session_tracker.flush()
+        flush_ms = (time.perf_counter() - start) * 1000
+    print({'phase': 'requests', 'last_seen': 'write-behind', 'sessions': len(tokens),
+           'requests_per_s': round(args.requests / elapsed), 'sql_writes': writes['writes'],
+           'rows_flushed': rows, 'flush_ms': round(flush_ms, 2)})
+
+    from app import db
+    from app.models import User
+    from app.sessions import open_session
+    with app.app_context():
+        owner = User.query.first()
+        ids = [open_session(owner, f'flush-{n}') for n in range(args.flush_rows)]
+        db.session.commit()
+        for session_id in ids:
+            session_tracker.touch(session_id)
+        writes['writes'] = 0
+        start = time.perf_counter()
+        rows = session_tracker.flush()
+        print({'phase': 'flush', 'rows': rows, 'sql_writes': writes['writes'],
+               'ms': round((time.perf_counter() - start) * 1000, 2)})
+
+    devices = add_devices(app, make_user(app), 4)
+    for headers in devices:
+        client.get('/api/auth/verify', headers=headers)  # warm the verified-session cache
+    current = devices[0]
+    listed = client.get('/api/auth/sessions', headers=current).get_json()['sessions']
+    other = next(s['id'] for s in listed if not s['current'])
+    revoked_one = client.delete(f'/api/auth/sessions/{other}', headers=current).status_code
+    after_one = [client.get('/api/auth/verify', headers=h).status_code for h in devices]
+    bulk = client.post('/api/auth/sessions/invalidate-others', headers=current).get_json()
+    after_bulk = [client.get('/api/auth/verify', headers=h).status_code for h in devices]
+    logout = client.post('/api/auth/logout', headers=current).status_code
+    after_logout = client.get('/api/auth/verify', headers=current).status_code
+    print({'phase': 'revoke', 'listed': len(listed), 'revoke_one': revoked_one, 'verify_after_one': after_one,
+           'bulk_revoked': bulk['revoked'], 'verify_after_bulk': after_bulk,
+           'logout': logout, 'verify_after_logout': after_logout})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+"""Headless WebRTC signaling harness: hundreds of peers in small voice rooms.
+
+Usage (from Backend/):
+    python benchmarks/bench_signaling.py [--peers 300] [--room-size 3] [--candidates 8]
+
+Runs gunicorn (gevent) and drives --peers asyncio WebSocket peers that
+join /api/signaling/ws/documents/<id> in rooms of --room-size, one
+document per room with its peers as members. Each joiner sends an SDP
+offer to every peer already in the room; the receiver answers at once
+and the offerer records the offer -> answer round trip. Both sides then
+trickle --candidates ICE candidates per pair a few ms apart, and the
+harness counts how many 'candidates' messages carried them.
+
+Offers sent on joining wait behind the rest of their wave's handshakes
+and authentication (a hundred sockets at once on one worker), so
+'joining' round trips measure the join storm. Once every room is
+settled, the last joiner of each room renegotiates with its peers, and
+'settled' times the relay alone: about one COLLAB_TICK per direction.
+
+It also checks that a joiner beyond SIGNALING_ROOM_SIZE is refused (4409),
+that a non-member and a room that isn't a document are refused (1008),
+and that a peer that never pings is expired (4408) after --idle seconds.
+"""
+import json
+import time
+import random
+import asyncio
+import argparse
+from collections import Counter
+from simple_websocket import AioClient, ConnectionClosed
+from common import make_app, make_user, summarize, gunicorn
+
+SDP = 'v=0\r\no=- 0 0 IN IP4 127.0.0.1\r\ns=-\r\n' + 'a=candidate-padding\r\n' * 80
+
+
+class Peer:
+    def __init__(self, url, headers, candidates, ping_every=1.0):
+        self.url = url
+        self.room = url.rsplit('/', 1)[-1]
+        self.headers = headers
+        self.candidates = candidates
+        self.ping_every = ping_every
+        self.id = None
+        self.rtts = []
+        self.received = Counter()
+        self.candidates_received = 0
+        self.close_reason = None
+        self.welcomed = asyncio.Event()
+        self.tasks = []
+
+    async def start(self, ping=True):
+        self.ws = await AioClient.connect(self.url, headers=self.headers)
+        self.tasks.append(asyncio.create_task(self._read()))
+        if ping:
+            self.tasks.append(asyncio.create_task(self._ping()))
+        await self.welcomed.wait()
+
+    async def send(self, message):
+        await self.ws.send(json.dumps(message))
+
+    async def trickle(self, to):
+        for n in range(self.candidates):
+            await self.send({'type': 'candidate', 'to': to,
+                             'candidate': {'candidate': f'candidate:{n} 1 udp 2122260223 10.0.0.1 {50000 + n} typ host',
+                                           'sdpMid': '0', 'sdpMLineIndex': 0}})
+            await asyncio.sleep(random.uniform(0.001, 0.005))
+        await self.send({'type': 'candidate', 'to': to, 'candidate': None})
+
+    async def _ping(self):
+        try:
+            while True:
+                await asyncio.sleep(self.ping_every)
+                await self.send({'type': 'ping'})
+        except ConnectionClosed:
+            pass
+
+    async def _read(self):
+        try:
+            while True:
+                frame = await self.ws.receive()
+                now = time.time()
+                for message in json.loads(frame):
+                    kind = message['type']
+                    self.received[kind] += 1
+                    if kind == 'welcome':
+                        self.id = message['id']
+                        self.welcomed.set()
+                        for peer in message['peers']:
+                            await self.send({'type': 'offer', 'to': peer['id'], 'sdp': {'sdp': SDP, 'sent': now}})
+                            asyncio.create_task(self.trickle(peer['id']))
+                    elif kind == 'offer':
+                        await self.send({'type': 'answer', 'to': message['from'], 'sdp': message['sdp']})
+                        if not message['sdp'].get('renegotiate'):
+                            asyncio.create_task(self.trickle(message['from']))
+                    elif kind == 'answer':
+                        self.rtts.append(now - message['sdp']['sent'])
+                    elif kind == 'candidates':
+                        self.candidates_received += len(message['candidates'])
+        except ConnectionClosed:
+            self.close_reason = self.ws.close_reason
+            self.welcomed.set()
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        try:
+            await self.ws.close()
+        except ConnectionClosed:
+            pass
+
+
+def make_rooms(app, args):
+    """A document per room, its peers as members, plus one for the idle check; returns their ids."""
+    from app import db
+    from app.models import User, DocumentMember
+    from app.documents import create_document
+
+    with app.app_context():
+        user_ids = [user.id for user in User.query.order_by(User.id).all()][-args.peers:]
+        groups = [user_ids[start:start + args.room_size] for start in range(0, args.peers, args.room_size)]
+        rooms = []
+        for room, members in enumerate(groups + [user_ids[1:2]]):
+            document = create_document(members[0], f'Voice room {room}')
+            for user_id in members[1:]:
+                db.session.add(DocumentMember(document_id=document.id, user_id=user_id))
+            rooms.append(document.id)
+        db.session.commit()
+    return rooms
+
+
+async def run(base, users, documents, args):
+    ws_base = base.replace('http://', 'ws://') + '/signaling/ws/documents'
+    rooms = args.peers // args.room_size
+    peers = []
+    start = time.perf_counter()
+    for member in range(args.room_size):
+        # Fill every room one seat at a time, so joiners find peers to call
+        joining = [Peer(f'{ws_base}/{documents[room]}', users[room * args.room_size + member], args.candidates)
+                   for room in range(rooms)]
+        await asyncio.gather(*(peer.start() for peer in joining))
+        peers.extend(joining)
+    joined = time.perf_counter() - start
+    await asyncio.sleep(2)  # answers and trickled candidates land
+
+    # Offers sent on 'welcome' queue behind the rest of their wave's handshakes
+    # and auth; renegotiating once every room is settled times the relay alone
+    join_rtts = [sample for peer in peers for sample in peer.rtts]
+    candidate_messages = sum(peer.received['candidates'] for peer in peers)
+    candidates = sum(peer.candidates_received for peer in peers)
+    for peer in peers:
+        peer.rtts = []
+    for peer in peers[-rooms:]:
+        for other in peers:
+            if other.room == peer.room and other is not peer:
+                await peer.send({'type': 'offer', 'to': other.id,
+                                 'sdp': {'sdp': SDP, 'sent': time.time(), 'renegotiate': True}})
+        await asyncio.sleep(args.renegotiate_gap)
+    await asyncio.sleep(1)
+
+    overflow = Peer(f'{ws_base}/{documents[0]}', users[0], 0)
+    await overflow.start()
+    outsider = Peer(f'{ws_base}/{documents[1]}', users[0], 0)
+    await outsider.start()
+    no_document = Peer(base.replace('http://', 'ws://') + '/signaling/ws/bench/room-0', users[0], 0)
+    await no_document.start()
+    idle = Peer(f'{ws_base}/{documents[-1]}', users[1], 0)
+    await idle.start(ping=False)
+    await asyncio.sleep(args.idle + 2)
+
+    pairs = rooms * args.room_size * (args.room_size - 1) // 2
+    rtts = [sample for peer in peers for sample in peer.rtts]
+    print({
+        'peers': len(peers), 'rooms': rooms, 'join_s': round(joined, 2), 'pairs': pairs,
+        'answers': len(join_rtts), 'candidates_sent': pairs * 2 * (args.candidates + 1),
+        'candidates_received': candidates, 'candidate_messages': candidate_messages,
+        'candidates_per_message': round(candidates / max(candidate_messages, 1), 1),
+        'errors': sum(peer.received['error'] for peer in peers),
+        'dropped': sum(1 for peer in peers if peer.close_reason),
+        'offer_answer_rtt_joining': summarize(join_rtts), 'offer_answer_rtt_settled': summarize(rtts)
+    })
+    print({'room_full_close': overflow.close_reason, 'non_member_close': outsider.close_reason,
+           'non_document_close': no_document.close_reason, 'idle_close': idle.close_reason})
+    await asyncio.gather(*(peer.stop() for peer in peers))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--peers', type=int, default=300)
+    parser.add_argument('--room-size', type=int, default=3)
+    parser.add_argument('--candidates', type=int, default=8)
+    parser.add_argument('--idle', type=int, default=3)
+    parser.add_argument('--renegotiate-gap', type=float, default=0.01)
+    args = parser.parse_args()
+
+    app = make_app()
+    users = [make_user(app) for _ in range(args.peers)]
+    documents = make_rooms(app, args)
+    with gunicorn('--workers', '1', '--worker-class', 'gevent', '--worker-connections', str(args.peers * 2 + 100),
+                  SIGNALING_ROOM_SIZE=args.room_size, SIGNALING_IDLE_TIMEOUT=args.idle,
+                  SKIP_DB_BOOTSTRAP='true') as base:
+        asyncio.run(run(base, users, documents, args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Upstream calls made for bursts of identical requests (single-flight coalescing).
+
+Usage (from Backend/):
+    python benchmarks/bench_single_flight.py [--burst 16] [--rounds 3] [--workers 4]
+
+Fires --burst concurrent /api/github/repositories calls for one token, as
+several dashboard tabs would, and counts how many reached the stub. Runs
+once on a threaded in-process server, then under gunicorn with --workers
+workers, without and with GITHUB_SINGLE_FLIGHT_DIR.
+"""
+import tempfile
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from werkzeug.serving import make_server
+from common import make_app, make_user, free_port, gunicorn
+from github_stub import start_stub
+
+
+def burst(url, headers, size):
+    with ThreadPoolExecutor(max_workers=size) as pool:
+        return list(pool.map(lambda _: requests.get(url, headers=headers, timeout=60).status_code, range(size)))
+
+
+def measure(mode, base, headers, stub, args):
+    upstream = []
+    for _ in range(args.rounds):
+        before = stub.state.requests
+        statuses = burst(f'{base}/github/repositories', headers, args.burst)
+        assert all(status == 200 for status in statuses), statuses
+        upstream.append(stub.state.requests - before)
+    print({'mode': mode, 'client_requests_per_round': args.burst, 'upstream_per_round': upstream})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--burst', type=int, default=16)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.3)
+    args = parser.parse_args()
+
+    stub, stub_url = start_stub(repo_count=30, latency=args.latency)
+    app = make_app(GITHUB_API_URL=stub_url)
+    from app.github_client import github_client
+
+    port = free_port()
+    server = make_server('127.0.0.1', port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    measure('threaded, 1 process', f'http://127.0.0.1:{port}/api', make_user(app, github_token='sf-local'), stub, args)
+    print({'single_flight': github_client.stats()['single_flight']})
+    server.shutdown()
+
+    for shared in (False, True):
+        env = {'GITHUB_API_URL': stub_url, 'BCRYPT_WORKERS': 0}
+        if shared:
+            env['GITHUB_SINGLE_FLIGHT_DIR'] = tempfile.mkdtemp()
+        with gunicorn('--workers', str(args.workers), '--threads', str(args.burst), **env) as base:
+            mode = f'gunicorn x{args.workers}, ' + ('shared dir' if shared else 'per worker')
+            measure(mode, base, make_user(app, github_token=f'sf-{shared}'), stub, args)
+    stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""Compare /api/auth/verify latency with the verified-session cache on and off.
+
+Usage (from Backend/):
+    python benchmarks/bench_verify.py [--requests 2000]
+
+Uses DATABASE_URL when set, otherwise a throwaway SQLite file. Point it at a
+real Postgres to see the round trip the cache saves.
+"""
+import time
+import argparse
+from common import make_app, make_user, summarize
+
+
+def run(enabled, n_requests):
+    app = make_app(SESSION_CACHE_ENABLED='true' if enabled else 'false')
+    from app.session_cache import session_cache
+
+    client = app.test_client()
+    headers = make_user(app)
+
+    samples = []
+    for _ in range(n_requests):
+        start = time.perf_counter()
+        resp = client.get('/api/auth/verify', headers=headers)
+        samples.append(time.perf_counter() - start)
+        assert resp.status_code == 200, resp.get_json()
+
+    stats = session_cache.stats()
+    return {'cache': 'on' if enabled else 'off', **summarize(samples),
+            'hits': stats['hits'], 'misses': stats['misses']}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    for enabled in (False, True):
+        print(run(enabled, args.requests))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Webhook-driven snapshots: upstream calls per read, ack latency and dedup.
+
+Usage (from Backend/):
+    python benchmarks/bench_webhooks.py [--reads 50] [--deliveries 200]
+
+Reads /repository/1/commits and /collaborators --reads times before and
+after repo 1 starts receiving (signed) webhook deliveries and counts the
+calls that reached the stub. Then times --deliveries push deliveries,
+checks a member added upstream shows up after its delivery even while
+GitHub's max-age=60 would keep the old body cached, replays a delivery
+and checks a bad signature is refused.
+"""
+import json
+import hmac
+import time
+import uuid
+import hashlib
+import argparse
+from common import make_app, make_user, summarize
+from github_stub import start_stub
+
+SECRET = 'bench-webhook-secret'
+
+
+def deliver(client, event, payload, delivery_id=None, secret=SECRET):
+    body = json.dumps(payload).encode()
+    signature = 'sha256=' + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return client.post('/api/github/webhook', data=body, content_type='application/json', headers={
+        'X-GitHub-Event': event,
+        'X-GitHub-Delivery': delivery_id or str(uuid.uuid4()),
+        'X-Hub-Signature-256': signature
+    })
+
+
+def reads(client, headers, stub, count):
+    before = stub.state.requests
+    for _ in range(count):
+        for resource in ('commits', 'collaborators'):
+            resp = client.get(f'/api/github/repository/1/{resource}', headers=headers)
+            assert resp.status_code == 200, resp.get_json()
+    return stub.state.requests - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--reads', type=int, default=50)
+    parser.add_argument('--deliveries', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.02)
+    args = parser.parse_args()
+
+    stub, stub_url = start_stub(repo_count=30, latency=args.latency)
+    app = make_app(GITHUB_API_URL=stub_url, GITHUB_WEBHOOK_SECRET=SECRET)
+    from app.jobs import jobs
+
+    client = app.test_client()
+    headers = make_user(app, github_token='hook-token')
+    repo = {'id': 1, 'name': 'repo-1', 'full_name': 'octocat/repo-1'}
+
+    print({'phase': 'no webhook', 'reads': args.reads * 2, 'upstream_calls': reads(client, headers, stub, args.reads)})
+    assert deliver(client, 'push', {'ref': 'refs/heads/main', 'repository': repo}).status_code == 202
+    print({'phase': 'webhook active', 'reads': args.reads * 2, 'upstream_calls': reads(client, headers, stub, args.reads)})
+
+    timings = []
+    for _ in range(args.deliveries):
+        start = time.perf_counter()
+        resp = deliver(client, 'push', {'ref': 'refs/heads/main', 'repository': repo})
+        timings.append(time.perf_counter() - start)
+        assert resp.status_code == 202, resp.get_json()
+    print({'phase': 'push ack', **summarize(timings)})
+
+    time.sleep(0.5)  # snapshot refresh jobs
+    print({'phase': 'after pushes', 'reads': args.reads * 2, 'upstream_calls': reads(client, headers, stub, args.reads)})
+
+    # api.github.com marks bodies fresh for 60s; a refetch right after the
+    # delivery must not save the cached pre-change body for a day
+    stub.state.max_age = 60
+    assert deliver(client, 'member', {'action': 'added', 'repository': repo}).status_code == 202
+    time.sleep(0.5)  # the refresh job caches the listing as fresh for max-age
+    stub.state.collaborator_count += 1
+    assert deliver(client, 'member', {'action': 'added', 'repository': repo}).status_code == 202
+    time.sleep(0.5)
+    after = client.get('/api/github/repository/1/collaborators', headers=headers).get_json()
+    print({'phase': 'member added', 'max_age': stub.state.max_age, 'collaborators_before': stub.state.collaborator_count - 1,
+           'collaborators_read': len(after['collaborators'])})
+
+    delivery_id = str(uuid.uuid4())
+    first = deliver(client, 'member', {'action': 'added', 'repository': repo}, delivery_id).get_json()
+    replay = deliver(client, 'member', {'action': 'added', 'repository': repo}, delivery_id).get_json()
+    forged = deliver(client, 'push', {'repository': repo}, secret='wrong').status_code
+    print({'first': first['status'], 'replay': replay['status'], 'bad_signature': forged, 'jobs': jobs.stats()})
+    stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
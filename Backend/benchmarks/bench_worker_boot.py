@@ -0,0 +1,53 @@
+"""Measure what a gunicorn worker pays to import wsgi:app.
+
+Usage (from Backend/):
+    python benchmarks/bench_worker_boot.py [--runs 5] [--backend-dir PATH]
+
+Each run imports wsgi in a fresh interpreter, as a worker does on boot, and
+reports the wall time and the number of SQL statements issued. Point
+--backend-dir at an older checkout to compare before/after. Uses
+DATABASE_URL when it is set and a throwaway SQLite file otherwise.
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from common import BACKEND_DIR, use_database
+
+PROBE = '''
+import sys, time, json
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+statements = []
+event.listen(Engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+start = time.perf_counter()
+import wsgi
+elapsed = time.perf_counter() - start
+print(json.dumps({'seconds': elapsed, 'statements': len(statements)}))
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--backend-dir', default=BACKEND_DIR)
+    args = parser.parse_args()
+
+    use_database()
+    results = []
+    for _ in range(args.runs):
+        out = subprocess.run([sys.executable, '-c', PROBE], cwd=args.backend_dir, env=os.environ,
+                             capture_output=True, text=True, check=True).stdout
+        results.append(json.loads(out.strip().splitlines()[-1]))
+
+    print({
+        'backend_dir': args.backend_dir,
+        'boot_p50_ms': round(statistics.median(r['seconds'] for r in results) * 1000, 1),
+        'sql_statements': results[-1]['statements']
+    })
+
+
+if __name__ == '__main__':
+    main()
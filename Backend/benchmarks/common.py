@@ -0,0 +1,109 @@
+"""Helpers shared by the benchmark scripts."""
+import os
+import sys
+import time
+import socket
+import tempfile
+import statistics
+import subprocess
+from contextlib import contextmanager
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def use_database():
+    """Point DATABASE_URL at a throwaway SQLite file unless it is already set."""
+    if not os.getenv('DATABASE_URL'):
+        db_path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+        os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+
+
+def make_app(**env):
+    """Create the app against DATABASE_URL, or a throwaway SQLite file."""
+    use_database()
+    # The benchmarks talk plain HTTP, where clients drop Secure cookies
+    os.environ.setdefault('CSRF_COOKIE_SECURE', 'false')
+    os.environ.update({k: str(v) for k, v in env.items()})
+
+    from app import create_app
+    from app.bootstrap import bootstrap_database
+    app = create_app()
+    # Migrate rather than create_all(), so gunicorn's own bootstrap finds nothing to do
+    bootstrap_database(app)
+    return app
+
+
+def make_user(app, github_token=None):
+    """Insert a user and return Authorization headers for it."""
+    from app import db
+    from app.models import User
+    from app.routes.auth import generate_token
+    from app.sessions import open_session
+
+    with app.app_context():
+        name = f'bench{time.time_ns()}'
+        user = User(username=name, email=f'{name}@example.com', github_access_token=github_token)
+        db.session.add(user)
+        session_id = open_session(user, 'benchmark')
+        db.session.commit()
+        token = generate_token(user.id, session_id)
+    return {'Authorization': f'Bearer {token}'}
+
+
+def csrf_session(base):
+    """requests.Session carrying the double-submit CSRF cookie and header."""
+    import requests
+
+    session = requests.Session()
+    session.headers['X-CSRFToken'] = session.get(f'{base}/auth/csrf-token').json()['csrfToken']
+    return session
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(samples):
+    """p50/p95/p99 in milliseconds for a list of second-based samples."""
+    ms = [s * 1000 for s in samples]
+    return {
+        'count': len(ms),
+        'p50_ms': round(statistics.median(ms), 3),
+        'p95_ms': round(percentile(ms, 95), 3),
+        'p99_ms': round(percentile(ms, 99), 3)
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def gunicorn(*args, **env):
+    """Run gunicorn wsgi:app with extra CLI args/env; yields the /api base URL."""
+    import requests
+
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'wsgi:app', '--bind', f'127.0.0.1:{port}',
+         '--log-level', 'warning', *args],
+        cwd=BACKEND_DIR, env=dict(os.environ, **{k: str(v) for k, v in env.items()}),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base = f'http://127.0.0.1:{port}/api'
+    try:
+        for _ in range(100):
+            try:
+                requests.get(f'{base}/health', timeout=1)
+                break
+            except (requests.ConnectionError, requests.Timeout):
+                time.sleep(0.1)
+        yield base
+    finally:
+        server.terminate()
+        server.wait()
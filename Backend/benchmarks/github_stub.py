@@ -0,0 +1,332 @@
+"""Local stand-in for api.github.com and the OAuth providers used by the benchmarks.
+
+Serves deterministic fake data for the endpoints the github blueprint calls,
+with ETag/304 support, Link pagination, configurable latency and payload
+size, and optionally GitHub's per-token rate limit (403 once a token has
+used rate_limit requests in the current window; 304s are free). It also answers the GitHub OAuth token exchange (/login/oauth/...)
+and Google's token/userinfo endpoints (/google/...), so one stub can back
+every outbound call the app makes.
+"""
+import re
+import json
+import heapq
+import time
+import zlib
+import hashlib
+import itertools
+import threading
+from datetime import datetime, timedelta
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_repo(repo_id, owner='octocat', pad=0):
+    name = f'repo-{repo_id}'
+    return {
+        'id': repo_id,
+        'name': name,
+        'full_name': f'{owner}/{name}',
+        'description': f'Stub repository number {repo_id}' + ' lorem' * (pad // 6),
+        'private': repo_id % 3 == 0,
+        'html_url': f'https://github.com/{owner}/{name}',
+        'clone_url': f'https://github.com/{owner}/{name}.git',
+        'ssh_url': f'git@github.com:{owner}/{name}.git',
+        'language': ['Python', 'JavaScript', 'Go', 'Rust', None][repo_id % 5],
+        'stargazers_count': repo_id * 7 % 1000,
+        'forks_count': repo_id * 3 % 100,
+        'updated_at': '2024-01-01T00:00:00Z',
+        'created_at': '2023-01-01T00:00:00Z',
+        'owner': {'login': owner, 'avatar_url': f'https://avatars.example/{owner}'}
+    }
+
+
+# Commit n of every stub repository is dated n minutes after this
+COMMIT_EPOCH = datetime(2024, 1, 1)
+
+
+def commit_sha(repo_id, index):
+    """SHA of main-line commit index, or of (merge, n), commit n of the branch merged by commit merge."""
+    if isinstance(index, tuple):
+        index = '%d.%d' % index
+    return hashlib.sha1(f'{repo_id}:{index}'.encode()).hexdigest()
+
+
+def commit_minute(value):
+    """Minutes after COMMIT_EPOCH for an ISO 8601 date."""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+    return (parsed - COMMIT_EPOCH).total_seconds() / 60
+
+
+def make_commit(repo_id, index, minute=None, parents=None):
+    if parents is None:
+        parents = [index - 1] if index else []
+    sha = commit_sha(repo_id, index)
+    date = (COMMIT_EPOCH + timedelta(minutes=index if minute is None else minute)).strftime('%Y-%m-%dT%H:%M:%SZ')
+    label, dev = (index, index % 5) if isinstance(index, int) else ('%d.%d' % index, sum(index) % 5)
+    person = {'name': f'dev{dev}', 'email': f'dev{dev}@example.com', 'date': date}
+    return {
+        'sha': sha,
+        'commit': {'message': f'Commit {label}', 'author': person, 'committer': person},
+        'parents': [{'sha': commit_sha(repo_id, parent)} for parent in parents],
+        'html_url': f'https://github.com/octocat/repo-{repo_id}/commit/{sha}',
+        'author': {'login': person['name'], 'avatar_url': 'https://avatars.example/dev'}
+    }
+
+
+class StubState:
+    def __init__(self, repo_count=30, latency=0.0, pad=0, rate_limit=None, window=3600, volatile=False,
+                 commit_count=30):
+        self.repo_count = repo_count
+        self.commit_count = commit_count  # main-line history per repo; raise it to simulate pushes
+        self.merges = {}  # merge commit index -> (fork index, branch length), see merge_branch()
+        self.collaborator_count = 5  # per repo; raise it to simulate a member being added
+        self.max_age = 0  # Cache-Control max-age on 200s, as api.github.com sends (60)
+        self.shas = {}
+        self.latency = latency
+        self.pad = pad
+        self.rate_limit = rate_limit
+        self.window = window
+        self.volatile = volatile
+        self.used = {}
+        self.rate_limited = 0
+        self.requests = 0
+        self.not_modified = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.lock = threading.Lock()
+
+    def enter(self):
+        with self.lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def leave(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def quota(self, token, charge):
+        """Charge one request to token; returns (allowed, rate limit headers)."""
+        now = time.time()
+        with self.lock:
+            used, reset = self.used.get(token, (0, now + self.window))
+            if reset <= now:
+                used, reset = 0, now + self.window
+            allowed = used < self.rate_limit
+            if allowed and charge:
+                used += 1
+            if not allowed:
+                self.rate_limited += 1
+            self.used[token] = (used, reset)
+        return allowed, {
+            'X-RateLimit-Limit': str(self.rate_limit),
+            'X-RateLimit-Remaining': str(self.rate_limit - used),
+            'X-RateLimit-Reset': str(int(reset))
+        }
+
+    def merge_branch(self, fork, length):
+        """Push a merge of a length-commit branch forked after main-line commit fork.
+
+        The branch's commits are dated seconds after the fork, as a branch
+        merged long after it was written keeps its commits' original dates.
+        """
+        assert 0 < length < 60
+        with self.lock:
+            self.merges[self.commit_count] = (fork, length)
+            self.commit_count += 1
+
+    def commit_index(self, repo_id, sha):
+        """Main-line index or (merge, n) branch key of sha, or None."""
+        with self.lock:
+            shas = self.shas.setdefault(repo_id, {})
+            for index in range(len(shas), self.commit_count):
+                shas[commit_sha(repo_id, index)] = index
+            if sha in shas:
+                return shas[sha]
+            for merge, (_, length) in self.merges.items():
+                for n in range(length):
+                    if commit_sha(repo_id, (merge, n)) == sha:
+                        return merge, n
+            return None
+
+    def parents(self, index):
+        if isinstance(index, tuple):
+            merge, n = index
+            return [(merge, n - 1)] if n else [self.merges[merge][0]]
+        if index in self.merges:
+            return [index - 1, (index, self.merges[index][1] - 1)]
+        return [index - 1] if index else []
+
+    def history(self, start, until=None, since=None):
+        """(minute, key) of the commits reachable from start, newest first, dated since..until."""
+        top, branch = start, []
+        if isinstance(start, tuple):
+            merge, n = start
+            top = self.merges[merge][0]
+            branch = [(merge, k) for k in range(n, -1, -1)]
+        branch += [(merge, k) for merge, (fork, length) in self.merges.items() if merge <= top
+                   for k in range(length)]
+        dated = [(self.merges[merge][0] + (k + 1) / 60, (merge, k)) for merge, k in branch]
+        dated = sorted((entry for entry in dated
+                        if (until is None or entry[0] <= until) and (since is None or entry[0] >= since)),
+                       key=lambda entry: entry[0], reverse=True)
+        if until is not None:
+            top = min(top, int(until // 1))
+        lowest = max(0, -int(-since // 1)) if since is not None else 0
+        main = ((index, index) for index in range(top, lowest - 1, -1))
+        return heapq.merge(main, dated, key=lambda entry: entry[0], reverse=True)
+
+    def count(self, not_modified=False):
+        with self.lock:
+            self.requests += 1
+            if not_modified:
+                self.not_modified += 1
+
+
+class GitHubStubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.handle_request({})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        self.handle_request({k: v[0] for k, v in parse_qs(self.rfile.read(length).decode()).items()})
+
+    def handle_request(self, form):
+        state = self.server.state
+        state.enter()
+        try:
+            self.respond(state, form)
+        finally:
+            state.leave()
+
+    def respond(self, state, form):
+        if state.latency:
+            time.sleep(state.latency)
+
+        parsed = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        status, body, headers = self.route(parsed.path, dict(query, **form))
+
+        payload = json.dumps(body).encode()
+        etag = '"%s"' % hashlib.md5(payload).hexdigest()
+        not_modified = (status == 200 and not state.volatile
+                        and self.headers.get('If-None-Match') == etag)
+
+        if state.rate_limit and not parsed.path.startswith(('/login/', '/google/')):
+            allowed, limit_headers = state.quota(self.bearer(), charge=not not_modified)
+            headers = dict(headers, **limit_headers)
+            if not allowed:
+                status, body = 403, {'message': 'API rate limit exceeded'}
+                payload, not_modified = json.dumps(body).encode(), False
+
+        if not_modified:
+            state.count(not_modified=True)
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            if state.max_age:
+                self.send_header('Cache-Control', f'private, max-age={state.max_age}')
+            for name, value in headers.items():
+                if name.startswith('X-RateLimit'):
+                    self.send_header(name, value)
+            self.end_headers()
+            return
+
+        state.count()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        if status == 200:
+            self.send_header('ETag', etag)
+            if state.max_age:
+                self.send_header('Cache-Control', f'private, max-age={state.max_age}')
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def bearer(self):
+        return self.headers.get('Authorization', '').split(' ')[-1]
+
+    def route(self, path, query):
+        state = self.server.state
+
+        # OAuth: every code maps to a stable fake identity
+        if path in ('/login/oauth/access_token', '/google/token'):
+            return 200, {'access_token': f"tok_{query.get('code', 'anon')}", 'token_type': 'bearer'}, {}
+        if path == '/user':
+            login = self.bearer().removeprefix('tok_')
+            return 200, {'id': zlib.crc32(login.encode()), 'login': login, 'email': f'{login}@example.com',
+                         'avatar_url': f'https://avatars.example/{login}'}, {}
+        if path == '/user/emails':
+            login = self.bearer().removeprefix('tok_')
+            return 200, [{'email': f'{login}@example.com', 'primary': True}], {}
+        if path == '/google/userinfo':
+            login = self.bearer().removeprefix('tok_')
+            return 200, {'sub': str(zlib.crc32(login.encode())), 'email': f'{login}@example.com',
+                         'name': login, 'picture': f'https://avatars.example/{login}'}, {}
+
+        if path == '/user/repos':
+            per_page = int(query.get('per_page', 30))
+            page = int(query.get('page', 1))
+            start = (page - 1) * per_page
+            repos = [make_repo(i, pad=state.pad) for i in range(start + 1, min(start + per_page, state.repo_count) + 1)]
+            last = max(1, -(-state.repo_count // per_page))
+            headers = {}
+            if last > 1:
+                base = f'http://{self.headers.get("Host")}{path}?per_page={per_page}'
+                links = [f'<{base}&page={last}>; rel="last"']
+                if page < last:
+                    links.insert(0, f'<{base}&page={page + 1}>; rel="next"')
+                headers['Link'] = ', '.join(links)
+            return 200, repos, headers
+
+        match = re.fullmatch(r'/repositories/(\d+)', path)
+        if match:
+            return 200, make_repo(int(match.group(1)), pad=state.pad), {}
+
+        match = re.fullmatch(r'/repos/[^/]+/repo-(\d+)/collaborators', path)
+        if match:
+            return 200, [{
+                'id': i, 'login': f'dev{i}', 'avatar_url': 'https://avatars.example/dev',
+                'html_url': f'https://github.com/dev{i}', 'permissions': {'push': True}
+            } for i in range(state.collaborator_count)], {}
+
+        match = re.fullmatch(r'/repos/[^/]+/repo-(\d+)/commits', path)
+        if match:
+            # Newest first by date from the tip (or ?sha=), filtered by ?since=/?until= like GitHub
+            repo_id = int(match.group(1))
+            start = state.commit_count - 1
+            if 'sha' in query:
+                start = state.commit_index(repo_id, query['sha'])
+                if start is None:
+                    return 404, {'message': 'No commit found for SHA'}, {}
+            until = commit_minute(query['until']) if 'until' in query else None
+            since = commit_minute(query['since']) if 'since' in query else None
+            per_page = int(query.get('per_page', 30))
+            offset = (int(query.get('page', 1)) - 1) * per_page
+            page = itertools.islice(state.history(start, until, since), offset, offset + per_page)
+            return 200, [make_commit(repo_id, index, minute, state.parents(index)) for minute, index in page], {}
+
+        return 404, {'message': 'Not Found'}, {}
+
+
+def start_stub(repo_count=30, latency=0.0, port=0, pad=0, rate_limit=None, window=3600, volatile=False,
+               commit_count=30):
+    """Start the stub on a background thread; returns (server, base_url).
+
+    pad adds roughly that many bytes to each repository description.
+    rate_limit enables per-token quotas over window seconds; volatile
+    makes every response look changed, so revalidation always costs quota.
+    commit_count is the length of each repository's commit history.
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), GitHubStubHandler)
+    server.daemon_threads = True
+    server.state = StubState(repo_count, latency, pad, rate_limit, window, volatile, commit_count)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
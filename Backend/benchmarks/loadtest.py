@@ -0,0 +1,212 @@
+"""Fixed-concurrency load test of the main API flows against local stubs.
+
+Usage (from Backend/):
+    python benchmarks/loadtest.py [--concurrency 8] [--duration 10]
+        [--scenarios verify,repositories] [--latency 0.05] [--output out.json]
+
+Starts the app from create_app (DATABASE_URL, or a throwaway SQLite file)
+on a threaded local server, points every GitHub/Google call at
+benchmarks/github_stub.py and drives each scenario with --concurrency
+clients for --duration seconds. Prints one JSON document with throughput
+and p50/p95/p99 per scenario; compare documents between commits to spot
+regressions.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import threading
+import subprocess
+from collections import Counter
+import requests
+from werkzeug.serving import make_server
+from common import make_app, make_user, csrf_session, summarize, free_port, BACKEND_DIR
+from github_stub import start_stub
+
+
+def scenario_register(ctx, client, n):
+    name = f'reg{ctx["run"]}c{client}n{n}'
+    return ctx['session'].post(f'{ctx["base"]}/auth/register',
+                               json={'username': name, 'email': f'{name}@example.com', 'password': 'load-password'})
+
+
+def scenario_login(ctx, client, n):
+    return ctx['session'].post(f'{ctx["base"]}/auth/login',
+                               json={'email': ctx['login_emails'][client], 'password': 'load-password'})
+
+
+def scenario_verify(ctx, client, n):
+    return ctx['session'].get(f'{ctx["base"]}/auth/verify', headers=ctx['headers'][client])
+
+
+def scenario_oauth_github(ctx, client, n):
+    return ctx['session'].post(f'{ctx["base"]}/auth/oauth/github', json={'code': f'gh{ctx["run"]}c{client}'})
+
+
+def scenario_oauth_google(ctx, client, n):
+    return ctx['session'].post(f'{ctx["base"]}/auth/oauth/google', json={'code': f'gg{ctx["run"]}c{client}'})
+
+
+def scenario_repositories(ctx, client, n):
+    return ctx['session'].get(f'{ctx["base"]}/github/repositories', headers=ctx['headers'][client])
+
+
+def scenario_collaborators(ctx, client, n):
+    repo_id = n % ctx['repos'] + 1
+    return ctx['session'].get(f'{ctx["base"]}/github/repository/{repo_id}/collaborators', headers=ctx['headers'][client])
+
+
+def scenario_commits(ctx, client, n):
+    repo_id = n % ctx['repos'] + 1
+    return ctx['session'].get(f'{ctx["base"]}/github/repository/{repo_id}/commits', headers=ctx['headers'][client])
+
+
+SCENARIOS = {
+    'register': scenario_register,
+    'login': scenario_login,
+    'verify': scenario_verify,
+    'oauth_github': scenario_oauth_github,
+    'oauth_google': scenario_oauth_google,
+    'repositories': scenario_repositories,
+    'collaborators': scenario_collaborators,
+    'commits': scenario_commits
+}
+
+
+def drive(fn, ctx, concurrency, duration):
+    """Run fn from `concurrency` client threads for `duration` seconds."""
+    samples, statuses = [], Counter()
+    lock = threading.Lock()
+    stop = time.monotonic() + duration
+
+    def client(index):
+        local = dict(ctx, session=csrf_session(ctx['base']))
+        n = 0
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            try:
+                status = fn(local, index, n).status_code
+            except requests.RequestException:
+                status = 'error'
+            elapsed = time.perf_counter() - start
+            with lock:
+                samples.append(elapsed)
+                statuses[status] += 1
+            n += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    ok = sum(count for status, count in statuses.items() if status in (200, 201, 304))
+    return {
+        'throughput_rps': round(len(samples) / wall, 2),
+        'success_ratio': round(ok / len(samples), 4) if samples else 0.0,
+        'statuses': {str(k): v for k, v in statuses.items()},
+        **summarize(samples)
+    }
+
+
+def seed_login_users(app, count, run):
+    from app import db
+    from app.models import User
+
+    emails = []
+    with app.app_context():
+        for i in range(count):
+            name = f'login{run}c{i}'
+            user = User(username=name, email=f'{name}@example.com')
+            user.set_password('load-password')
+            db.session.add(user)
+            emails.append(user.email)
+        db.session.commit()
+    return emails
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--latency', type=float, default=0.05, help='stub latency per upstream call (s)')
+    parser.add_argument('--repos', type=int, default=100, help='repositories in the stub account')
+    parser.add_argument('--pad', type=int, default=0, help='extra bytes per repository description')
+    parser.add_argument('--bcrypt-rounds', type=int, default=10)
+    parser.add_argument('--output', help='also write the JSON document here')
+    args = parser.parse_args()
+
+    scenarios = args.scenarios.split(',')
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f'unknown scenarios: {", ".join(sorted(unknown))}')
+
+    stub, stub_url = start_stub(repo_count=args.repos, latency=args.latency, pad=args.pad)
+    app = make_app(
+        GITHUB_API_URL=stub_url,
+        GITHUB_OAUTH_URL=stub_url,
+        GOOGLE_TOKEN_URL=f'{stub_url}/google/token',
+        GOOGLE_USERINFO_URL=f'{stub_url}/google/userinfo',
+        GITHUB_CLIENT_ID='load', GITHUB_CLIENT_SECRET='load',
+        GOOGLE_CLIENT_ID='load', GOOGLE_CLIENT_SECRET='load',
+        EMAIL_CHECK_DELIVERABILITY='false',
+        BCRYPT_LOG_ROUNDS=args.bcrypt_rounds
+    )
+
+    port = free_port()
+    server = make_server('127.0.0.1', port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    run = time.time_ns()
+    ctx = {
+        'base': f'http://127.0.0.1:{port}/api',
+        'run': run,
+        'repos': args.repos,
+        'headers': [make_user(app, github_token=f'load-{i}') for i in range(args.concurrency)],
+        'login_emails': seed_login_users(app, args.concurrency, run) if 'login' in scenarios else []
+    }
+
+    results = {}
+    for name in scenarios:
+        results[name] = drive(SCENARIOS[name], ctx, args.concurrency, args.duration)
+        print(f'{name}: {results[name]["throughput_rps"]} req/s, p99 {results[name]["p99_ms"]} ms', file=sys.stderr)
+
+    server.shutdown()
+    stub.shutdown()
+
+    document = {
+        'meta': {
+            'git_revision': git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'python': platform.python_version(),
+            'database': os.environ['DATABASE_URL'].split(':', 1)[0],
+            'concurrency': args.concurrency,
+            'duration_s': args.duration,
+            'stub_latency_s': args.latency,
+            'stub_repos': args.repos,
+            'bcrypt_rounds': args.bcrypt_rounds
+        },
+        'results': results
+    }
+    output = json.dumps(document, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+
+# Gunicorn picks this file up automatically from the working directory
+
+# Workers write Prometheus metrics here so /metrics can aggregate them
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'collabvoice-metrics'))
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+
+# Serving mode:
+#   gthread (default) - a fixed number of OS threads per worker
+#   gevent            - cooperative greenlets; a worker keeps hundreds of
+#                       upstream-bound requests (GitHub, OAuth) in flight
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 500))
+
+
+def on_starting(server):
+    """Reset metrics and run migrations once, before any worker is forked.
+
+    The migrations run in a child process so the master never imports the
+    app: anything it imports is inherited by the workers as is, and under
+    gevent that means threading locks and sockets created before the
+    worker monkey-patches the stdlib.
+    """
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+
+    if os.getenv('SKIP_DB_BOOTSTRAP', 'false').lower() == 'true':
+        return
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'wsgi', 'bootstrap-db'],
+                   cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+
+
+def post_fork(server, worker):
+    if worker_class == 'gevent':
+        # gunicorn monkey-patches the stdlib for us, but psycopg2 talks to
+        # libpq directly and needs a wait callback to yield while querying
+        try:
+            from psycogreen.gevent import patch_psycopg
+        except ImportError:  # local SQLite setups without psycopg2
+            return
+        patch_psycopg()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,40 @@
+"""create users
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('username', sa.String(length=50), nullable=False),
+    sa.Column('email', sa.String(length=120), nullable=False),
+    sa.Column('password_hash', sa.String(length=255), nullable=True),
+    sa.Column('github_id', sa.String(length=50), nullable=True),
+    sa.Column('google_id', sa.String(length=50), nullable=True),
+    sa.Column('avatar_url', sa.String(length=255), nullable=True),
+    sa.Column('github_access_token', sa.String(length=255), nullable=True),
+    sa.Column('current_session_id', sa.String(length=255), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('email'),
+    sa.UniqueConstraint('github_id'),
+    sa.UniqueConstraint('google_id'),
+    sa.UniqueConstraint('username')
+    )
+
+
+def downgrade():
+    op.drop_table('users')
@@ -0,0 +1,33 @@
+"""add repository_index
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Deploys that predate migrations may already have it from db.create_all()
+    if sa.inspect(op.get_bind()).has_table('repository_index'):
+        return
+    op.create_table('repository_index',
+    sa.Column('repo_id', sa.BigInteger(), autoincrement=False, nullable=False),
+    sa.Column('name', sa.String(length=255), nullable=False),
+    sa.Column('full_name', sa.String(length=255), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('repo_id')
+    )
+
+
+def downgrade():
+    op.drop_table('repository_index')
@@ -0,0 +1,31 @@
+"""add github_snapshots
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('github_snapshots',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('resource', sa.String(length=64), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('fetched_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'resource')
+    )
+
+
+def downgrade():
+    op.drop_table('github_snapshots')
@@ -0,0 +1,37 @@
+"""add webhook_deliveries and repository_index.hooked_at
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 10:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('webhook_deliveries',
+    sa.Column('delivery_id', sa.String(length=64), nullable=False),
+    sa.Column('event', sa.String(length=50), nullable=False),
+    sa.Column('received_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('delivery_id')
+    )
+    op.create_index(op.f('ix_webhook_deliveries_received_at'), 'webhook_deliveries', ['received_at'], unique=False)
+    op.create_index(op.f('ix_github_snapshots_resource'), 'github_snapshots', ['resource'], unique=False)
+    with op.batch_alter_table('repository_index') as batch_op:
+        batch_op.add_column(sa.Column('hooked_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('repository_index') as batch_op:
+        batch_op.drop_column('hooked_at')
+    op.drop_index(op.f('ix_github_snapshots_resource'), table_name='github_snapshots')
+    op.drop_index(op.f('ix_webhook_deliveries_received_at'), table_name='webhook_deliveries')
+    op.drop_table('webhook_deliveries')
@@ -0,0 +1,41 @@
+"""add sessions, seeded from users.current_session_id
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('sessions',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('device', sa.String(length=255), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('last_seen_at', sa.DateTime(), nullable=False),
+    sa.Column('revoked_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_sessions_user_id'), 'sessions', ['user_id'], unique=False)
+    # Tokens issued before this migration carry the user's single session id; keep them valid
+    op.execute(
+        "INSERT INTO sessions (id, user_id, created_at, last_seen_at) "
+        "SELECT current_session_id, id, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP FROM users "
+        "WHERE current_session_id IS NOT NULL"
+    )
+
+
+def downgrade():
+    op.drop_index(op.f('ix_sessions_user_id'), table_name='sessions')
+    op.drop_table('sessions')
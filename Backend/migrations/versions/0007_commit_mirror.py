@@ -0,0 +1,54 @@
+"""add repository_commits and commit_syncs
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('repository_commits',
+    sa.Column('repo_id', sa.BigInteger(), autoincrement=False, nullable=False),
+    sa.Column('sha', sa.String(length=40), nullable=False),
+    sa.Column('message', sa.Text(), nullable=False),
+    sa.Column('author_name', sa.String(length=255), nullable=True),
+    sa.Column('author_email', sa.String(length=255), nullable=True),
+    sa.Column('author_login', sa.String(length=100), nullable=True),
+    sa.Column('author_avatar_url', sa.String(length=255), nullable=True),
+    sa.Column('authored_at', sa.DateTime(), nullable=True),
+    sa.Column('committer_name', sa.String(length=255), nullable=True),
+    sa.Column('committed_at', sa.DateTime(), nullable=False),
+    sa.Column('html_url', sa.String(length=255), nullable=True),
+    sa.PrimaryKeyConstraint('repo_id', 'sha')
+    )
+    op.create_index('ix_repository_commits_repo_committed', 'repository_commits', ['repo_id', 'committed_at', 'sha'], unique=False)
+    op.create_index('ix_repository_commits_repo_login', 'repository_commits', ['repo_id', 'author_login', 'committed_at'], unique=False)
+    op.create_index('ix_repository_commits_repo_email', 'repository_commits', ['repo_id', 'author_email', 'committed_at'], unique=False)
+    op.create_table('commit_syncs',
+    sa.Column('repo_id', sa.BigInteger(), autoincrement=False, nullable=False),
+    sa.Column('head_sha', sa.String(length=40), nullable=True),
+    sa.Column('head_at', sa.DateTime(), nullable=True),
+    sa.Column('base_sha', sa.String(length=40), nullable=True),
+    sa.Column('oldest_at', sa.DateTime(), nullable=True),
+    sa.Column('complete', sa.Boolean(), nullable=False),
+    sa.Column('synced_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('repo_id')
+    )
+
+
+def downgrade():
+    op.drop_table('commit_syncs')
+    op.drop_index('ix_repository_commits_repo_email', table_name='repository_commits')
+    op.drop_index('ix_repository_commits_repo_login', table_name='repository_commits')
+    op.drop_index('ix_repository_commits_repo_committed', table_name='repository_commits')
+    op.drop_table('repository_commits')
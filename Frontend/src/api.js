@@ -10,6 +10,29 @@ const api = axios.create({
     },
 });
 
+// CSRF token for mutating requests. The backend token is long-lived and
+// cacheable, so it is fetched once per session and only refreshed when
+// the server rejects it.
+let csrfToken = sessionStorage.getItem('csrfToken');
+let csrfRequest = null;
+
+const fetchCsrfToken = (force = false) => {
+    if (!csrfRequest) {
+        csrfRequest = axios.get(`${API_BASE_URL}/auth/csrf-token`, {
+            withCredentials: true,
+            // A distinct URL skips the cached copy when the token was rejected
+            params: force ? { t: Date.now() } : undefined
+        }).then((res) => {
+            csrfToken = res.data.csrfToken;
+            sessionStorage.setItem('csrfToken', csrfToken);
+            return csrfToken;
+        }).finally(() => {
+            csrfRequest = null;
+        });
+    }
+    return csrfRequest;
+};
+
 // Interceptor to add JWT token to every request
 api.interceptors.request.use(async (config) => {
     // Add JWT token
@@ -20,13 +43,8 @@ api.interceptors.request.use(async (config) => {
 
     // Add CSRF token for mutating requests
     if (['post', 'put', 'delete', 'patch'].includes(config.method)) {
-        // If we don't have a CSRF token yet, or for every request to be safe
         try {
-            // We exclude the csrf-token endpoint itself from this to avoid recursion
-            if (!config.url.includes('/auth/csrf-token')) {
-                const csrfRes = await axios.get(`${API_BASE_URL}/auth/csrf-token`, { withCredentials: true });
-                config.headers['X-CSRFToken'] = csrfRes.data.csrfToken;
-            }
+            config.headers['X-CSRFToken'] = csrfToken || await fetchCsrfToken();
         } catch (e) {
             console.error('Could not fetch CSRF token', e);
         }
@@ -40,7 +58,15 @@ api.interceptors.request.use(async (config) => {
 // Response interceptor to handle token expiration
 api.interceptors.response.use(
     (response) => response,
-    (error) => {
+    async (error) => {
+        const { config, response } = error;
+        if (response?.status === 403 && response.data?.code === 'csrf_failed' && config && !config._csrfRetried) {
+            // Expired or cookie cleared: get a fresh token and retry once
+            config._csrfRetried = true;
+            config.headers['X-CSRFToken'] = await fetchCsrfToken(true);
+            return api(config);
+        }
+
         if (error.response?.status === 401) {
             // Token expired or invalid
             localStorage.removeItem('token');
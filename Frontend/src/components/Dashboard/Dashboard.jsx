@@ -19,6 +19,9 @@ import {
 import api from '../../api';
 import './Dashboard.css';
 
+// Only the repository fields the cards render
+const REPO_FIELDS = 'id,name,private,description,stargazers_count,forks_count,language,updated_at';
+
 const Dashboard = () => {
   const navigate = useNavigate();
   const { user, logout } = useAuth();
@@ -45,15 +48,28 @@ const Dashboard = () => {
         throw new Error('No authentication token');
       }
 
+      // Render the first page right away, then page through the rest
       const response = await api.get('/github/repositories', {
-        headers: { Authorization: `Bearer ${token}` }
+        headers: { Authorization: `Bearer ${token}` },
+        params: { limit: 100, fields: REPO_FIELDS }
       });
       
       setRepositories(response.data.repositories);
+      setLoading(false);
       if (response.data.repositories.length > 0) {
         setSelectedRepo(response.data.repositories[0]);
         loadRepoDetails(response.data.repositories[0].id);
       }
+
+      let cursor = response.data.next_cursor;
+      while (cursor) {
+        const page = await api.get('/github/repositories', {
+          headers: { Authorization: `Bearer ${token}` },
+          params: { cursor, fields: REPO_FIELDS }
+        });
+        setRepositories((repos) => [...repos, ...page.data.repositories]);
+        cursor = page.data.next_cursor;
+      }
     } catch (error) {
       console.error('Failed to load repositories:', error);
       
@@ -84,17 +100,16 @@ const Dashboard = () => {
         return;
       }
       
-      // Load collaborators
-      const collabResponse = await api.get(`/github/repository/${repoId}/collaborators`, {
-        headers: { Authorization: `Bearer ${token}` }
-      });
-      setCollaborators(collabResponse.data.collaborators);
-
-      // Load recent commits
-      const commitsResponse = await api.get(`/github/repository/${repoId}/commits`, {
+      // Load collaborators and recent commits in one batched request
+      const response = await api.post('/github/batch', {
+        repo_ids: [repoId],
+        resources: ['collaborators', 'commits']
+      }, {
         headers: { Authorization: `Bearer ${token}` }
       });
-      setRecentCommits(commitsResponse.data.commits);
+      const details = response.data.results[repoId];
+      setCollaborators(details.collaborators || []);
+      setRecentCommits(details.commits || []);
     } catch (error) {
       console.error('Failed to load repository details:', error);
       